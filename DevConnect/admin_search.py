@@ -0,0 +1,24 @@
+# ============================================================================
+# DevConnect/admin_search.py
+# ============================================================================
+
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+
+
+class RankedSearchChangeList(ChangeList):
+    """
+    Orders search results by the `search_rank` annotation that the admin's
+    get_search_results adds, unless a column header was clicked
+    """
+    
+    def get_ordering(self, request, queryset):
+        if self.query and ORDER_VAR not in self.params:
+            return ['-search_rank', '-pk']
+        return super().get_ordering(request, queryset)
+
+
+class RankedSearchMixin:
+    """ModelAdmin mixin for index-backed search with ranked results"""
+    
+    def get_changelist(self, request, **kwargs):
+        return RankedSearchChangeList
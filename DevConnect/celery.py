@@ -27,6 +27,14 @@ app.conf.beat_schedule = {
         'task': 'apps.notifications.tasks.cleanup_old_notifications',
         'schedule': crontab(hour=0, minute=0, day_of_week=0),  # Weekly on Sunday
     },
+    'maintain-notification-partitions': {
+        'task': 'apps.notifications.tasks.maintain_notification_partitions',
+        'schedule': crontab(hour=3, minute=0),  # Daily
+    },
+    'flush-presence': {
+        'task': 'apps.users.tasks.flush_presence',
+        'schedule': 60.0,  # Every minute
+    },
 }
 
 @app.task(bind=True, ignore_result=True)
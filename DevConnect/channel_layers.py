@@ -0,0 +1,84 @@
+# ============================================================================
+# DevConnect/channel_layers.py
+# ============================================================================
+
+"""
+Channel layer that spreads WebSocket traffic over several Redis shards.
+
+channels-redis already talks to multiple hosts, but it picks a host with
+crc32 modulo the number of hosts, so adding a shard reshuffles almost every
+group and channel. This layer places each host on a hash ring with virtual
+nodes instead: adding or removing a shard only moves the keys that land on
+it, and the placement doesn't depend on the order hosts are listed in.
+
+Every process must be configured with the same shard list (settings
+CHANNEL_REDIS_HOSTS), otherwise senders and receivers disagree on where a
+group lives.
+"""
+
+import bisect
+import hashlib
+
+from channels_redis.core import RedisChannelLayer
+
+DEFAULT_VIRTUAL_NODES = 160
+
+
+def _ring_position(value):
+    if isinstance(value, str):
+        value = value.encode('utf8')
+    return int.from_bytes(hashlib.md5(value).digest()[:8], 'big')
+
+
+def host_identity(host):
+    """Stable name for a decoded channels-redis host entry"""
+    if 'address' in host:
+        return host['address']
+    if 'master_name' in host:
+        return f"sentinel:{host['master_name']}"
+    return f"{host.get('host', 'localhost')}:{host.get('port', 6379)}"
+
+
+class HashRing:
+    """Consistent hash ring mapping keys to host indexes"""
+    
+    def __init__(self, identities, virtual_nodes=DEFAULT_VIRTUAL_NODES):
+        if len(set(identities)) != len(identities):
+            raise ValueError("Channel layer shards must be unique")
+        
+        points = sorted(
+            (_ring_position(f'{identity}#{replica}'), index)
+            for index, identity in enumerate(identities)
+            for replica in range(virtual_nodes)
+        )
+        self.positions = [position for position, _ in points]
+        self.indexes = [index for _, index in points]
+    
+    def get_index(self, value):
+        slot = bisect.bisect(self.positions, _ring_position(value))
+        if slot == len(self.positions):
+            slot = 0
+        return self.indexes[slot]
+
+
+class ShardedRedisChannelLayer(RedisChannelLayer):
+    """
+    RedisChannelLayer with consistent hashing of group and channel names.
+    
+    Takes the same CONFIG as RedisChannelLayer plus an optional
+    "virtual_nodes" (points per shard on the ring).
+    """
+    
+    def __init__(self, hosts=None, virtual_nodes=DEFAULT_VIRTUAL_NODES, **kwargs):
+        super().__init__(hosts=hosts, **kwargs)
+        self.ring = HashRing(
+            [host_identity(host) for host in self.hosts],
+            virtual_nodes=virtual_nodes
+        )
+    
+    def consistent_hash(self, value):
+        # Used by channels-redis for groups, process-specific channels and
+        # the per-shard bucketing in group_send
+        if self.ring_size == 1:
+            return 0
+        return self.ring.get_index(value)
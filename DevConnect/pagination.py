@@ -0,0 +1,161 @@
+# ============================================================================
+# DevConnect/pagination.py
+# ============================================================================
+
+"""
+Pagination that doesn't COUNT(*) large tables.
+
+Page counts come from the planner: pg_class.reltuples for an unfiltered
+queryset, or the row estimate of EXPLAIN for a filtered one. Only when
+the estimate is below ESTIMATED_COUNT_THRESHOLD is an exact COUNT run, so
+small results stay exact while listing a big table costs the same as
+listing a small one.
+
+An estimate can be off either way, so it never decides which pages exist:
+an estimated page is served whenever it has rows, and whether there is a
+next page comes from reading one row past it. Responses flag an estimated
+count with count_is_estimate.
+"""
+
+import json
+import logging
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections, transaction
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+
+def _table_estimate(cursor, table):
+    # A partitioned parent has no rows of its own, so add up its partitions
+    cursor.execute(
+        """
+        SELECT COALESCE(SUM(GREATEST(reltuples, 0)), 0)
+        FROM pg_class
+        WHERE oid = %s::regclass
+           OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)
+        """,
+        [table, table]
+    )
+    return int(cursor.fetchone()[0])
+
+
+def estimate_count(queryset):
+    """Planner estimate of queryset.count(), or None if none is available"""
+    if not isinstance(queryset, QuerySet):
+        return None
+    
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    
+    query = queryset.query
+    unfiltered = (
+        not query.where
+        and not query.distinct
+        and query.group_by is None
+        and not query.is_sliced
+    )
+    
+    try:
+        # Savepoint, so a failed EXPLAIN doesn't abort the caller's transaction
+        with transaction.atomic(using=queryset.db), connection.cursor() as cursor:
+            if unfiltered:
+                return _table_estimate(cursor, queryset.model._meta.db_table)
+            
+            sql, params = query.sql_with_params()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+    except Exception as e:
+        logger.warning(f"Count estimate failed: {e}")
+        return None
+
+
+class EstimatedPage(Page):
+    """A page of an estimated count, which knows from its own rows whether another follows"""
+    
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+    
+    def has_next(self):
+        return self._has_next
+    
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator whose count is a planner estimate for large results"""
+    
+    count_is_estimate = False
+    
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is not None and estimate >= settings.ESTIMATED_COUNT_THRESHOLD:
+            self.count_is_estimate = True
+            return estimate
+        return super().count
+    
+    def validate_number(self, number):
+        self.count  # Settles whether the count is an estimate
+        if not self.count_is_estimate:
+            return super().validate_number(number)
+        
+        # Pages past an underestimate still exist; page() finds out from the rows
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_("That page number is not an integer"))
+        if number < 1:
+            raise EmptyPage(_("That page number is less than 1"))
+        return number
+    
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_estimate:
+            return super().page(number)
+        
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(_("That page contains no results"))
+        
+        # Rows seen past an underestimate raise the count to what is known to exist
+        if bottom + len(rows) > self.count:
+            self.count = bottom + len(rows)
+            self.__dict__.pop('num_pages', None)
+        return EstimatedPage(rows[:self.per_page], number, self, has_next=len(rows) > self.per_page)
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    """PageNumberPagination without an exact COUNT(*) on large tables"""
+    
+    django_paginator_class = EstimatedCountPaginator
+    
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_is_estimate', self.page.paginator.count_is_estimate),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+    
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_is_estimate'] = {'type': 'boolean', 'example': False}
+        return response_schema
@@ -136,12 +136,19 @@ CACHES = {
     }
 }
 
-# Channels configuration - use same Redis instance
+# Channels configuration - groups and channels are consistently hashed over
+# CHANNEL_REDIS_HOSTS (comma-separated URLs), which defaults to the cache Redis
+CHANNEL_REDIS_HOSTS = [
+    host.strip()
+    for host in config('CHANNEL_REDIS_HOSTS', default='').split(',')
+    if host.strip()
+] or [REDIS_URL]
+
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'BACKEND': 'DevConnect.channel_layers.ShardedRedisChannelLayer',
         'CONFIG': {
-            "hosts": [REDIS_URL],  # Use full URL instead of tuple
+            "hosts": CHANNEL_REDIS_HOSTS,  # Use full URLs instead of tuples
             "capacity": 1500,
             "expiry": 10,
         },
@@ -159,6 +166,41 @@ if not REDIS_URL or REDIS_URL == "redis://127.0.0.1:6379/1":
         }
         print("⚠️  Using in-memory channel layer (WebSockets won't work across workers)")
 
+# Notification replay - per-user Redis Stream used to resync reconnecting sockets
+NOTIFICATION_STREAM_MAXLEN = config('NOTIFICATION_STREAM_MAXLEN', default=200, cast=int)
+NOTIFICATION_STREAM_TTL = config('NOTIFICATION_STREAM_TTL', default=60 * 60 * 24 * 7, cast=int)  # 7 days
+NOTIFICATION_REPLAY_LIMIT = config('NOTIFICATION_REPLAY_LIMIT', default=100, cast=int)
+
+# Notification retention - weekly cleanup deletes read rows in id-range batches and
+# drops monthly partitions past the unread cap, optionally archiving to gzipped
+# NDJSON first (empty dir disables the archive)
+NOTIFICATION_READ_RETENTION_DAYS = config('NOTIFICATION_READ_RETENTION_DAYS', default=30, cast=int)
+NOTIFICATION_UNREAD_RETENTION_DAYS = config('NOTIFICATION_UNREAD_RETENTION_DAYS', default=180, cast=int)  # 0 keeps forever
+NOTIFICATION_CLEANUP_BATCH_SIZE = config('NOTIFICATION_CLEANUP_BATCH_SIZE', default=5000, cast=int)
+NOTIFICATION_CLEANUP_PAUSE = config('NOTIFICATION_CLEANUP_PAUSE', default=0.1, cast=float)  # seconds
+NOTIFICATION_ARCHIVE_DIR = config('NOTIFICATION_ARCHIVE_DIR', default='')
+
+# Read receipts sent over the socket are batched per connection
+NOTIFICATION_READ_DEBOUNCE = config('NOTIFICATION_READ_DEBOUNCE', default=0.5, cast=float)  # seconds
+NOTIFICATION_READ_BATCH_SIZE = config('NOTIFICATION_READ_BATCH_SIZE', default=200, cast=int)
+
+# Per-connection outbound queue - slow clients get 'resync_required' instead of an unbounded backlog
+NOTIFICATION_OUTBOX_SIZE = config('NOTIFICATION_OUTBOX_SIZE', default=100, cast=int)
+NOTIFICATION_OUTBOX_BATCH_SIZE = config('NOTIFICATION_OUTBOX_BATCH_SIZE', default=20, cast=int)
+NOTIFICATION_OUTBOX_BATCH_WINDOW = config('NOTIFICATION_OUTBOX_BATCH_WINDOW', default=0.05, cast=float)  # seconds
+NOTIFICATION_OUTBOX_MAX_OVERFLOWS = config('NOTIFICATION_OUTBOX_MAX_OVERFLOWS', default=3, cast=int)
+
+# Live post/snippet counters pushed to subscribed sockets, at most once per interval per topic
+LIVE_UPDATE_INTERVAL = config('LIVE_UPDATE_INTERVAL', default=1.0, cast=float)  # seconds
+LIVE_MAX_SUBSCRIPTIONS = config('LIVE_MAX_SUBSCRIPTIONS', default=20, cast=int)  # per connection
+
+# WebSocket JWT auth - verified tokens are kept in a per-process LRU, users in the cache
+WS_TOKEN_CACHE_SIZE = config('WS_TOKEN_CACHE_SIZE', default=10000, cast=int)
+WS_USER_CACHE_TIMEOUT = config('WS_USER_CACHE_TIMEOUT', default=60, cast=int)  # seconds
+
+# Presence - sockets heartbeat with 'ping', so this must exceed the client ping interval
+PRESENCE_TTL = config('PRESENCE_TTL', default=90, cast=int)  # seconds
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -205,7 +247,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'DevConnect.pagination.EstimatedCountPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -222,6 +264,9 @@ REST_FRAMEWORK = {
     },
 }
 
+# Lists estimated above this many rows report the planner's estimate instead of COUNT(*)
+ESTIMATED_COUNT_THRESHOLD = config('ESTIMATED_COUNT_THRESHOLD', default=10000, cast=int)
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -286,11 +331,62 @@ SOCIAL_AUTH_SANITIZE_REDIRECTS = False
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
 EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
-EMAIL_USE_TLS = True
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)  # False for a local SMTP stand-in
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Daily digest - recipients per Celery task (one SMTP connection each)
+DIGEST_BATCH_SIZE = config('DIGEST_BATCH_SIZE', default=200, cast=int)
+DIGEST_TOP_NOTIFICATIONS = config('DIGEST_TOP_NOTIFICATIONS', default=3, cast=int)
+
+# Newsletter - subscribers per Celery chunk, and messages per SMTP send/checkpoint
+NEWSLETTER_CHUNK_SIZE = config('NEWSLETTER_CHUNK_SIZE', default=1000, cast=int)
+NEWSLETTER_SEND_BATCH_SIZE = config('NEWSLETTER_SEND_BATCH_SIZE', default=100, cast=int)
+NEWSLETTER_TOP_POSTS = config('NEWSLETTER_TOP_POSTS', default=5, cast=int)
+
+# Snippet code search - per-query statement timeout, regex length cap, line numbers returned per hit
+CODE_SEARCH_TIMEOUT_MS = config('CODE_SEARCH_TIMEOUT_MS', default=3000, cast=int)
+CODE_SEARCH_MAX_PATTERN_LENGTH = config('CODE_SEARCH_MAX_PATTERN_LENGTH', default=200, cast=int)
+CODE_SEARCH_MAX_LINES = config('CODE_SEARCH_MAX_LINES', default=20, cast=int)
+
+# Snippet facets - tags returned, and seconds a filter's counts stay cached
+SNIPPET_FACETS_TAG_LIMIT = config('SNIPPET_FACETS_TAG_LIMIT', default=50, cast=int)
+SNIPPET_FACETS_CACHE_TTL = config('SNIPPET_FACETS_CACHE_TTL', default=300, cast=int)
+
+# Snippet syntax highlighting - default Pygments style, and how long renders stay cached
+SNIPPET_HIGHLIGHT_STYLE = config('SNIPPET_HIGHLIGHT_STYLE', default='default')
+SNIPPET_HIGHLIGHT_CACHE_TTL = config('SNIPPET_HIGHLIGHT_CACHE_TTL', default=7 * 24 * 3600, cast=int)
+
+# Snippet code blobs - zstd-compress code of at least this many bytes (0 = never; needs zstandard), and the level
+CODE_BLOB_COMPRESS_THRESHOLD = config('CODE_BLOB_COMPRESS_THRESHOLD', default=0, cast=int)
+CODE_BLOB_COMPRESS_LEVEL = config('CODE_BLOB_COMPRESS_LEVEL', default=3, cast=int)
+
+# Snippet fork trees - levels walked, forks kept per snippet, and how long a root's tree stays cached
+SNIPPET_FORK_TREE_MAX_DEPTH = config('SNIPPET_FORK_TREE_MAX_DEPTH', default=50, cast=int)
+SNIPPET_FORK_TREE_MAX_WIDTH = config('SNIPPET_FORK_TREE_MAX_WIDTH', default=100, cast=int)
+SNIPPET_FORK_TREE_CACHE_TTL = config('SNIPPET_FORK_TREE_CACHE_TTL', default=3600, cast=int)
+
+# Snippet revisions - full copy every N versions (deltas between), and how long rebuilt versions stay cached
+SNIPPET_REVISION_KEYFRAME_INTERVAL = config('SNIPPET_REVISION_KEYFRAME_INTERVAL', default=20, cast=int)
+SNIPPET_REVISION_CACHE_TTL = config('SNIPPET_REVISION_CACHE_TTL', default=7 * 24 * 3600, cast=int)
+
+# Snippet diffs - context lines around each change, and how long a diff stays cached
+SNIPPET_DIFF_CONTEXT = config('SNIPPET_DIFF_CONTEXT', default=3, cast=int)
+SNIPPET_DIFF_CACHE_TTL = config('SNIPPET_DIFF_CACHE_TTL', default=7 * 24 * 3600, cast=int)
+
+# Near-duplicate snippets - MinHash similarity that counts as a duplicate, similar snippets shown and
+# candidates scored per lookup, ids compared per LSH bucket in the moderator report, and its cache lifetime
+SNIPPET_DUPLICATE_THRESHOLD = config('SNIPPET_DUPLICATE_THRESHOLD', default=0.8, cast=float)
+SNIPPET_SIMILAR_LIMIT = config('SNIPPET_SIMILAR_LIMIT', default=10, cast=int)
+SNIPPET_SIMILAR_MAX_CANDIDATES = config('SNIPPET_SIMILAR_MAX_CANDIDATES', default=200, cast=int)
+SNIPPET_DUPLICATE_MAX_BUCKET = config('SNIPPET_DUPLICATE_MAX_BUCKET', default=1000, cast=int)
+SNIPPET_DUPLICATES_CACHE_TTL = config('SNIPPET_DUPLICATES_CACHE_TTL', default=600, cast=int)
+
+# Line comments - most lines loaded per request, and comments returned per line (the rest are only counted)
+SNIPPET_COMMENT_LINE_RANGE = config('SNIPPET_COMMENT_LINE_RANGE', default=200, cast=int)
+SNIPPET_COMMENTS_PER_LINE = config('SNIPPET_COMMENTS_PER_LINE', default=20, cast=int)
+
 # Security settings for production
 if not DEBUG:
     SECURE_SSL_REDIRECT = True
@@ -39,4 +39,44 @@ def redis_client():
 
     # Teardown: flush the test database
     client.flushdb()
-    client.close()
\ No newline at end of file
+    client.close()
+
+
+@pytest.fixture
+def query_plan():
+    """
+    Fixture that runs a request and returns the EXPLAIN output of every
+    SELECT it issued against `table`. Sequential scans are disabled so the
+    tiny test tables are planned the way production-sized ones would be.
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    
+    def explain(make_request, table):
+        with CaptureQueriesContext(connection) as queries:
+            response = make_request()
+        
+        plans = []
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if sql.startswith('SELECT') and f'FROM "{table}"' in sql:
+                    cursor.execute(f'EXPLAIN {sql}')
+                    plans.append('\n'.join(row[0] for row in cursor.fetchall()))
+        
+        return response, plans
+    
+    return explain
+
+
+def index_names(index):
+    """An index plus its per-partition copies, for matching against plans"""
+    from django.db import connection
+    
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = %s::regclass',
+            [index]
+        )
+        return {index} | {row[0] for row in cursor.fetchall()}
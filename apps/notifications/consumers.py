@@ -2,10 +2,19 @@
 # apps/notifications/consumers.py
 # ============================================================================
 
+import asyncio
 import json
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from apps.users import presence
+from . import live, stream
+from .outbox import Outbox
 
 User = get_user_model()
 
@@ -18,6 +27,15 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         """Handle WebSocket connection"""
         self.user = self.scope['user']
+        self.pending_read_ids = set()
+        self.read_flush_task = None
+        self.outbox = Outbox(
+            max_size=settings.NOTIFICATION_OUTBOX_SIZE,
+            batch_size=settings.NOTIFICATION_OUTBOX_BATCH_SIZE
+        )
+        self.outbox_ready = asyncio.Event()
+        self.outbox_task = None
+        self.topics = set()
         
         if self.user.is_authenticated:
             # Create a unique group name for this user
@@ -29,7 +47,10 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
             
-            await self.accept()
+            # JWT clients authenticating via subprotocol expect it echoed back
+            await self.accept(subprotocol=self.scope.get('auth_subprotocol'))
+            await sync_to_async(presence.mark_online)(self.user.id)
+            self.outbox_task = asyncio.ensure_future(self.drain_outbox())
             
             # Send initial unread count
             unread_count = await self.get_unread_count()
@@ -37,16 +58,32 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 'type': 'unread_count',
                 'count': unread_count
             }))
+            
+            # Replay anything missed since the client's last seen event
+            last_event_id = self.get_query_param('last_event_id')
+            if last_event_id:
+                await self.replay_missed(last_event_id)
         else:
             await self.close()
     
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
+        if self.outbox_task is not None:
+            self.outbox_task.cancel()
+        
         if hasattr(self, 'group_name'):
+            # Don't lose receipts still waiting on the debounce timer
+            await self.flush_read_receipts()
             await self.channel_layer.group_discard(
                 self.group_name,
                 self.channel_name
             )
+            for topic in self.topics:
+                await self.channel_layer.group_discard(
+                    live.topic_group(topic),
+                    self.channel_name
+                )
+            await sync_to_async(presence.mark_offline)(self.user.id)
     
     async def receive(self, text_data):
         """Handle messages from WebSocket"""
@@ -54,24 +91,161 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         message_type = data.get('type')
         
         if message_type == 'ping':
+            await sync_to_async(presence.heartbeat)(self.user.id)
             await self.send(text_data=json.dumps({
                 'type': 'pong'
             }))
+        elif message_type == 'sync':
+            await self.replay_missed(data.get('last_event_id'))
+        elif message_type == 'mark_read':
+            await self.queue_read_receipts(data.get('ids'))
+        elif message_type == 'mark_all_read':
+            await self.flush_read_receipts(mark_all=True)
+        elif message_type == 'subscribe':
+            await self.subscribe(data.get('topic'))
+        elif message_type == 'unsubscribe':
+            await self.unsubscribe(data.get('topic'))
     
     async def notification_message(self, event):
-        """Send notification to WebSocket"""
+        """Queue notification for the WebSocket"""
+        self.outbox.put_notification(event['notification'], event.get('event_id'))
+        self.outbox_ready.set()
+    
+    async def unread_count_update(self, event):
+        """Queue updated unread count - only the latest one is sent"""
+        self.outbox.put_unread_count(event['count'])
+        self.outbox_ready.set()
+    
+    async def topic_update(self, event):
+        """Queue live counter deltas for a subscribed topic"""
+        self.outbox.put_topic_update(event['topic'], event['deltas'])
+        self.outbox_ready.set()
+    
+    async def subscribe(self, topic):
+        """Start receiving live counter updates for a post or snippet"""
+        parsed = live.parse_topic(topic)
+        
+        if parsed is None or not await self.can_subscribe(*parsed):
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': f'Cannot subscribe to {topic}'
+            }))
+            return
+        
+        if topic not in self.topics:
+            if len(self.topics) >= settings.LIVE_MAX_SUBSCRIPTIONS:
+                await self.send(text_data=json.dumps({
+                    'type': 'error',
+                    'message': 'Too many subscriptions'
+                }))
+                return
+            
+            self.topics.add(topic)
+            await self.channel_layer.group_add(
+                live.topic_group(topic),
+                self.channel_name
+            )
+        
         await self.send(text_data=json.dumps({
-            'type': 'notification',
-            'notification': event['notification']
+            'type': 'subscribed',
+            'topic': topic
         }))
     
-    async def unread_count_update(self, event):
-        """Send updated unread count"""
+    async def unsubscribe(self, topic):
+        """Stop receiving live counter updates for a topic"""
+        if live.parse_topic(topic) and topic in self.topics:
+            self.topics.discard(topic)
+            await self.channel_layer.group_discard(
+                live.topic_group(topic),
+                self.channel_name
+            )
+        
+        await self.send(text_data=json.dumps({
+            'type': 'unsubscribed',
+            'topic': topic
+        }))
+    
+    async def drain_outbox(self):
+        """Send queued frames, batching whatever arrives within the batch window"""
+        while True:
+            await self.outbox_ready.wait()
+            await asyncio.sleep(settings.NOTIFICATION_OUTBOX_BATCH_WINDOW)
+            self.outbox_ready.clear()
+            
+            # A client that keeps overflowing its queue is too slow to keep up
+            if self.outbox.overflow_count > settings.NOTIFICATION_OUTBOX_MAX_OVERFLOWS:
+                await self.close(code=4008)
+                return
+            
+            for frame in self.outbox.drain():
+                await self.send(text_data=json.dumps(frame))
+    
+    async def replay_missed(self, last_event_id):
+        """Send notifications created after last_event_id"""
+        if not stream.is_valid_event_id(last_event_id):
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'Invalid last_event_id'
+            }))
+            return
+        
+        replay = await self.get_missed_notifications(last_event_id)
+        if replay is None:
+            await self.send(text_data=json.dumps({'type': 'resync_required'}))
+            return
+        
         await self.send(text_data=json.dumps({
-            'type': 'unread_count',
-            'count': event['count']
+            'type': 'replay',
+            **replay
         }))
     
+    async def queue_read_receipts(self, ids):
+        """Collect read receipts and apply them after a short debounce"""
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'ids must be a list of notification IDs'
+            }))
+            return
+        
+        self.pending_read_ids.update(ids)
+        
+        if len(self.pending_read_ids) >= settings.NOTIFICATION_READ_BATCH_SIZE:
+            await self.flush_read_receipts()
+        elif self.read_flush_task is None:
+            self.read_flush_task = asyncio.ensure_future(self.flush_read_receipts_later())
+    
+    async def flush_read_receipts_later(self):
+        await asyncio.sleep(settings.NOTIFICATION_READ_DEBOUNCE)
+        self.read_flush_task = None
+        await self.flush_read_receipts()
+    
+    async def flush_read_receipts(self, mark_all=False):
+        """Apply pending receipts in one UPDATE and push the new unread count"""
+        if self.read_flush_task is not None:
+            self.read_flush_task.cancel()
+            self.read_flush_task = None
+        
+        ids, self.pending_read_ids = self.pending_read_ids, set()
+        if not ids and not mark_all:
+            return
+        
+        unread_count = await self.apply_read_receipts(None if mark_all else ids)
+        
+        # Every socket the user has open should see the new count
+        await self.channel_layer.group_send(
+            self.group_name,
+            {
+                'type': 'unread_count_update',
+                'count': unread_count
+            }
+        )
+    
+    def get_query_param(self, name):
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        values = query.get(name)
+        return values[0] if values else None
+    
     @database_sync_to_async
     def get_unread_count(self):
         """Get unread notification count from database"""
@@ -80,3 +254,84 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             recipient=self.user,
             is_read=False
         ).count()
+    
+    @database_sync_to_async
+    def can_subscribe(self, kind, object_id):
+        """Only allow topics for content this user is able to view"""
+        from django.db.models import Q
+        from apps.posts.models import Post
+        from apps.snippets.models import Snippet
+        
+        if kind == 'post':
+            return Post.objects.filter(
+                Q(status='published') | Q(author=self.user),
+                id=object_id
+            ).exists()
+        
+        return Snippet.objects.filter(
+            Q(visibility__in=['public', 'unlisted']) | Q(author=self.user),
+            id=object_id
+        ).exists()
+    
+    @database_sync_to_async
+    def apply_read_receipts(self, ids):
+        """Mark notifications read and return the remaining unread count"""
+        from .utils import mark_notifications_read, get_unread_count
+        mark_notifications_read(self.user.id, ids)
+        return get_unread_count(self.user.id)
+    
+    @database_sync_to_async
+    def get_missed_notifications(self, last_event_id):
+        """
+        Read missed notifications from the stream, falling back to a keyset
+        query on (created_at, id) when the stream has been trimmed. Returns
+        None when neither can tell what was missed.
+        """
+        from .models import Notification
+        from .serializers import NotificationSerializer
+        
+        limit = settings.NOTIFICATION_REPLAY_LIMIT
+        stream_id, position = stream.parse_event_id(last_event_id)
+        events, covered, truncated = stream.read_since(self.user.id, stream_id, limit)
+        
+        if covered:
+            return {
+                'source': 'stream',
+                'notifications': [
+                    {**payload, 'event_id': event_id} for event_id, payload in events
+                ],
+                'last_event_id': events[-1][0] if events else last_event_id,
+                'truncated': truncated,
+            }
+        
+        if position is None:
+            # A bare stream id from an older client has no database position
+            return None
+        
+        # Read the head before querying: anything appended after it is
+        # committed later and will be read from the stream next time
+        head = stream.latest_stream_id(self.user.id)
+        created_at, notification_id = position
+        missed = list(
+            Notification.objects.filter(recipient=self.user).filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=notification_id)
+            ).select_related('sender').order_by('created_at', 'id')[:limit + 1]
+        )
+        
+        truncated = len(missed) > limit
+        missed = missed[:limit]
+        if missed:
+            position = (missed[-1].created_at, missed[-1].id)
+        # A truncated replay resumes from the database after its last row;
+        # otherwise the stream takes over from the head
+        cursor = stream.make_event_id(None if truncated else head, *position)
+        
+        return {
+            'source': 'database',
+            'notifications': [
+                {**data, 'event_id': stream.make_event_id(None, notification.created_at, notification.id)}
+                for notification, data in zip(missed, NotificationSerializer(missed, many=True).data)
+            ],
+            'last_event_id': cursor,
+            'truncated': truncated,
+        }
@@ -0,0 +1,113 @@
+# ============================================================================
+# apps/notifications/live.py
+# ============================================================================
+
+"""
+Live counter updates for post and snippet pages.
+
+Clients subscribe to topics like "post:12" over the notifications socket.
+Counter changes are accumulated in a Redis hash per topic and broadcast at
+most once per LIVE_UPDATE_INTERVAL, so a viral post produces one message
+per interval per subscriber no matter how many likes or views it gets.
+"""
+
+import logging
+import re
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+TOPIC_RE = re.compile(r'^(post|snippet):(\d+)$')
+
+
+def parse_topic(topic):
+    """Split "post:12" into ('post', 12), or return None if invalid"""
+    match = TOPIC_RE.match(str(topic or ''))
+    if not match:
+        return None
+    return match.group(1), int(match.group(2))
+
+
+def topic_group(topic):
+    # Channel layer group names can't contain ':'
+    return 'live_' + topic.replace(':', '_')
+
+
+def _pending_key(topic):
+    return f'live:pending:{topic}'
+
+
+def _scheduled_key(topic):
+    return f'live:scheduled:{topic}'
+
+
+def publish_delta(kind, object_id, field, delta=1):
+    """
+    Record a counter change for a topic once the current transaction
+    commits, and make sure a flush is scheduled. Never raises - live
+    updates are best effort.
+    """
+    transaction.on_commit(lambda: _publish(f'{kind}:{object_id}', field, delta))
+
+
+def _publish(topic, field, delta):
+    from .tasks import flush_live_updates
+    
+    interval = settings.LIVE_UPDATE_INTERVAL
+    
+    try:
+        conn = get_redis_connection('default')
+        pipe = conn.pipeline()
+        pipe.hincrby(_pending_key(topic), field, delta)
+        pipe.expire(_pending_key(topic), max(int(interval * 10), 60))
+        pipe.set(_scheduled_key(topic), 1, nx=True, px=int(interval * 1000))
+        _, _, newly_scheduled = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Live update publish failed: {e}")
+        return
+    
+    # Whoever opens the window schedules its flush; later deltas just accumulate
+    if newly_scheduled:
+        try:
+            # Fail fast rather than hold up the request retrying an unreachable broker
+            flush_live_updates.apply_async(args=[topic], countdown=interval, retry=False)
+        except Exception as e:
+            logger.warning(f"Live update flush could not be queued for {topic}: {e}")
+            # Reopen the window so the next delta tries again; pending deltas are kept
+            try:
+                conn.delete(_scheduled_key(topic))
+            except Exception:
+                pass
+
+
+def flush_topic(topic):
+    """Broadcast the accumulated deltas for a topic to its subscribers"""
+    conn = get_redis_connection('default')
+    pipe = conn.pipeline()
+    pipe.hgetall(_pending_key(topic))
+    pipe.delete(_pending_key(topic))
+    pending, _ = pipe.execute()
+    
+    deltas = {
+        field.decode(): int(value)
+        for field, value in pending.items()
+        if int(value)
+    }
+    if not deltas:
+        return deltas
+    
+    channel_layer = get_channel_layer()
+    async_to_sync(channel_layer.group_send)(
+        topic_group(topic),
+        {
+            'type': 'topic_update',
+            'topic': topic,
+            'deltas': deltas,
+        }
+    )
+    return deltas
@@ -0,0 +1,28 @@
+# ============================================================================
+# apps/notifications/management/commands/create_notification_partitions.py
+# ============================================================================
+
+from django.core.management.base import BaseCommand
+from apps.notifications.partitions import create_partitions
+
+
+class Command(BaseCommand):
+    help = 'Create monthly notifications partitions ahead of time'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=3,
+            help='How many months ahead of the current one to cover'
+        )
+    
+    def handle(self, *args, **options):
+        created = create_partitions(months_ahead=options['months'])
+        
+        for name in created:
+            self.stdout.write(f'Created {name}')
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'{len(created)} notification partitions created')
+        )
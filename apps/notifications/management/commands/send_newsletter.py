@@ -0,0 +1,68 @@
+# ============================================================================
+# apps/notifications/management/commands/send_newsletter.py
+# ============================================================================
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.notifications.models import NewsletterIssue
+
+
+class Command(BaseCommand):
+    help = (
+        'Send a newsletter to subscribed users. Use --sync against a local SMTP '
+        'stand-in (EMAIL_HOST=localhost EMAIL_PORT=1025 EMAIL_USE_TLS=False) '
+        'to benchmark throughput.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--subject', help='Subject of a new issue')
+        parser.add_argument('--intro-file', help='Text file with the issue introduction')
+        parser.add_argument('--resume', type=int, help='Resume an existing issue by id')
+        parser.add_argument(
+            '--sync',
+            action='store_true',
+            help='Send in this process instead of queueing Celery tasks'
+        )
+    
+    def handle(self, *args, **options):
+        from apps.notifications.newsletter import create_issue
+        from apps.notifications.tasks import send_newsletter
+        
+        if options['resume']:
+            try:
+                issue = NewsletterIssue.objects.get(id=options['resume'])
+            except NewsletterIssue.DoesNotExist:
+                raise CommandError(f"Newsletter issue {options['resume']} does not exist")
+        else:
+            if not options['subject'] or not options['intro_file']:
+                raise CommandError('--subject and --intro-file are required for a new issue')
+            with open(options['intro_file']) as f:
+                issue = create_issue(options['subject'], f.read())
+            self.stdout.write(f'Created newsletter issue {issue.id}')
+        
+        if not options['sync']:
+            result = send_newsletter.delay(issue.id)
+            self.stdout.write(self.style.SUCCESS(f'Queued newsletter issue {issue.id} ({result.id})'))
+            return
+        
+        self.send_inline(issue)
+    
+    def send_inline(self, issue):
+        from apps.notifications.newsletter import finish_issue_if_done, plan_chunks, send_chunk
+        
+        if issue.started_at is None:
+            NewsletterIssue.objects.filter(id=issue.id).update(started_at=timezone.now())
+        if not issue.chunks.exists():
+            plan_chunks(issue)
+        
+        for chunk in issue.chunks.filter(completed_at__isnull=True).select_related('issue'):
+            send_chunk(chunk)
+            self.stdout.write(f'Sent chunk {chunk.first_user_id}-{chunk.last_user_id}')
+        finish_issue_if_done(issue.id)
+        
+        issue.refresh_from_db()
+        throughput = issue.throughput
+        self.stdout.write(self.style.SUCCESS(
+            f'Sent {issue.sent_count} messages'
+            + (f' ({throughput:.1f} msg/s)' if throughput else '')
+        ))
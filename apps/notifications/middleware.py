@@ -0,0 +1,135 @@
+# ============================================================================
+# apps/notifications/middleware.py
+# ============================================================================
+
+"""
+JWT authentication for the notifications WebSocket.
+
+Browsers can't set an Authorization header on a WebSocket, so the access
+token comes from the query string (?token=...) or the subprotocol list
+(new WebSocket(url, ['jwt', token])). Verified tokens are kept in a
+per-process LRU and users in a short-lived cache snapshot, so a reconnect
+storm doesn't turn into a signature-check and database storm. The snapshot
+holds only the fields the socket needs - never the password hash - and is
+dropped whenever the user is saved (see signals.py).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+
+JWT_SUBPROTOCOL = 'jwt'
+
+# Fields of the user snapshot cached for socket authentication
+CACHED_USER_FIELDS = ('id', 'username', 'is_active', 'is_staff')
+
+
+class VerifiedTokenCache:
+    """Thread-safe LRU of token -> (user_id, expiry timestamp)"""
+    
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, token):
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None:
+                return None
+            
+            user_id, expires_at = entry
+            if expires_at <= time.time():
+                del self.entries[token]
+                return None
+            
+            self.entries.move_to_end(token)
+            return user_id
+    
+    def set(self, token, user_id, expires_at):
+        with self.lock:
+            self.entries[token] = (user_id, expires_at)
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+verified_tokens = VerifiedTokenCache(settings.WS_TOKEN_CACHE_SIZE)
+
+
+def user_cache_key(user_id):
+    return f'ws_user_{user_id}'
+
+
+def get_token_from_scope(scope):
+    """Return (token, subprotocol to accept) from the handshake, if any"""
+    subprotocols = scope.get('subprotocols') or []
+    if JWT_SUBPROTOCOL in subprotocols:
+        index = subprotocols.index(JWT_SUBPROTOCOL)
+        if index + 1 < len(subprotocols):
+            return subprotocols[index + 1], JWT_SUBPROTOCOL
+    
+    query = parse_qs(scope.get('query_string', b'').decode())
+    tokens = query.get('token')
+    if tokens:
+        return tokens[0], None
+    
+    return None, None
+
+
+def get_user_for_token(token):
+    """Resolve an access token to an active user, or AnonymousUser"""
+    user_id = verified_tokens.get(token)
+    
+    if user_id is None:
+        try:
+            access_token = AccessToken(token)
+        except TokenError:
+            return AnonymousUser()
+        
+        user_id = access_token[api_settings.USER_ID_CLAIM]
+        verified_tokens.set(token, user_id, access_token['exp'])
+    
+    fields = cache.get(user_cache_key(user_id))
+    if fields is None:
+        fields = User.objects.filter(id=user_id).values(*CACHED_USER_FIELDS).first()
+        if fields is None:
+            return AnonymousUser()
+        cache.set(user_cache_key(user_id), fields, settings.WS_USER_CACHE_TIMEOUT)
+    
+    return User(**fields) if fields['is_active'] else AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Populates scope["user"] from a JWT access token when one is supplied,
+    leaving any session-authenticated user in place otherwise
+    """
+    
+    async def __call__(self, scope, receive, send):
+        token, subprotocol = get_token_from_scope(scope)
+        
+        if token:
+            scope = dict(scope)
+            scope['user'] = await database_sync_to_async(get_user_for_token)(token)
+            scope['auth_subprotocol'] = subprotocol
+        
+        return await super().__call__(scope, receive, send)
+
+
+def JWTAuthMiddlewareStack(inner):
+    return AuthMiddlewareStack(JWTAuthMiddleware(inner))
@@ -0,0 +1,173 @@
+# ============================================================================
+# apps/notifications/migrations/0003_partition_notifications.py
+# ============================================================================
+
+"""
+Convert notifications into a table range-partitioned by month on created_at.
+
+Nothing is copied: the existing table becomes the partition
+"notifications_legacy" for everything before the month after next. The slow steps
+(the unique index the partitioned primary key needs, and validating the
+bound check that lets ATTACH skip its scan) run first without blocking
+writes; the swap itself is a short metadata-only transaction.
+
+The model is unchanged. The primary key becomes (id, created_at), as
+Postgres requires, and ids still come from a single sequence.
+
+Reversing copies every row back into a plain table under an exclusive
+lock, so unlike the forward step it is neither online nor cheap.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import migrations, transaction
+
+# Indexes Django created in 0001 - the parent gets the same names, and the
+# legacy copies are renamed so CREATE INDEX attaches them instead of rebuilding
+INDEXES = [
+    ('notifications_recipient_id_e1133bac', '("recipient_id")'),
+    ('notifications_sender_id_57e62d28', '("sender_id")'),
+    ('notificatio_recipie_2d3764_idx', '("recipient_id", "created_at" DESC)'),
+    ('notificatio_recipie_583549_idx', '("recipient_id", "is_read")'),
+]
+
+
+def add_months(value, months):
+    month_index = value.year * 12 + value.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def legacy_bound():
+    # Start of the month after next, so rows written while this runs fit
+    return add_months(datetime.now(dt_timezone.utc), 2)
+
+
+def partition_notifications(apps, schema_editor):
+    execute = schema_editor.execute
+    bound = legacy_bound()
+    
+    # Online preparation - neither step blocks reads or writes
+    execute(
+        'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "notifications_legacy_id_created_at" '
+        'ON "notifications" ("id", "created_at")'
+    )
+    execute('ALTER TABLE "notifications" DROP CONSTRAINT IF EXISTS "notifications_legacy_bound"')
+    execute(
+        'ALTER TABLE "notifications" ADD CONSTRAINT "notifications_legacy_bound" '
+        'CHECK ("created_at" < %s) NOT VALID',
+        [bound.isoformat()]
+    )
+    execute('ALTER TABLE "notifications" VALIDATE CONSTRAINT "notifications_legacy_bound"')
+    
+    with transaction.atomic(using=schema_editor.connection.alias):
+        execute('LOCK TABLE "notifications" IN ACCESS EXCLUSIVE MODE')
+        
+        # Identity columns can't be partitioned before Postgres 17, so move
+        # the ids onto a plain sequence that continues where they left off
+        # (dropping the identity drops its sequence, which had this name)
+        execute('ALTER TABLE "notifications" ALTER COLUMN "id" DROP IDENTITY')
+        execute('CREATE SEQUENCE "notifications_id_seq" AS bigint')
+        execute(
+            'SELECT setval(\'"notifications_id_seq"\', '
+            'COALESCE((SELECT MAX("id") FROM "notifications"), 0) + 1, false)'
+        )
+        
+        execute('ALTER TABLE "notifications" RENAME TO "notifications_legacy"')
+        # The partition's key has to match the parent's (id, created_at); the
+        # index for it was built concurrently above
+        execute(
+            'ALTER TABLE "notifications_legacy" DROP CONSTRAINT "notifications_pkey", '
+            'ADD CONSTRAINT "notifications_legacy_pkey" PRIMARY KEY '
+            'USING INDEX "notifications_legacy_id_created_at"'
+        )
+        for name, _ in INDEXES:
+            execute(f'ALTER INDEX "{name}" RENAME TO "{name}_legacy"')
+        
+        execute(
+            """
+            CREATE TABLE "notifications" (
+                "id" bigint NOT NULL DEFAULT nextval('"notifications_id_seq"'),
+                "notification_type" varchar(20) NOT NULL,
+                "title" varchar(200) NOT NULL,
+                "message" text NOT NULL,
+                "link" varchar(500) NOT NULL,
+                "data" jsonb NOT NULL,
+                "is_read" boolean NOT NULL,
+                "read_at" timestamp with time zone NULL,
+                "created_at" timestamp with time zone NOT NULL,
+                "recipient_id" bigint NOT NULL,
+                "sender_id" bigint NULL,
+                CONSTRAINT "notifications_pkey" PRIMARY KEY ("id", "created_at"),
+                CONSTRAINT "notifications_recipient_id_e1133bac_fk_users_id"
+                    FOREIGN KEY ("recipient_id") REFERENCES "users" ("id") DEFERRABLE INITIALLY DEFERRED,
+                CONSTRAINT "notifications_sender_id_57e62d28_fk_users_id"
+                    FOREIGN KEY ("sender_id") REFERENCES "users" ("id") DEFERRABLE INITIALLY DEFERRED
+            ) PARTITION BY RANGE ("created_at")
+            """
+        )
+        execute('ALTER SEQUENCE "notifications_id_seq" OWNED BY "notifications"."id"')
+        
+        # The validated check constraint lets this skip scanning the table
+        execute(
+            'ALTER TABLE "notifications" ATTACH PARTITION "notifications_legacy" '
+            'FOR VALUES FROM (MINVALUE) TO (%s)',
+            [bound.isoformat()]
+        )
+        execute('ALTER TABLE "notifications_legacy" DROP CONSTRAINT "notifications_legacy_bound"')
+        
+        for name, columns in INDEXES:
+            execute(f'CREATE INDEX "{name}" ON "notifications" {columns}')
+        
+        # First monthly partitions; create_notification_partitions keeps ahead of time
+        for offset in range(3):
+            start = add_months(bound, offset)
+            execute(
+                f'CREATE TABLE "notifications_y{start.year}m{start.month:02d}" '
+                f'PARTITION OF "notifications" FOR VALUES FROM (%s) TO (%s)',
+                [start.isoformat(), add_months(start, 1).isoformat()]
+            )
+        execute('CREATE TABLE "notifications_default" PARTITION OF "notifications" DEFAULT')
+
+
+def unpartition_notifications(apps, schema_editor):
+    execute = schema_editor.execute
+    
+    with transaction.atomic(using=schema_editor.connection.alias):
+        execute('LOCK TABLE "notifications" IN ACCESS EXCLUSIVE MODE')
+        # LIKE keeps the column types and NOT NULLs but not the sequence default
+        execute('CREATE TABLE "notifications_unpartitioned" (LIKE "notifications")')
+        execute('INSERT INTO "notifications_unpartitioned" SELECT * FROM "notifications"')
+        # Pending deferred foreign key checks would block the DROP
+        execute('SET CONSTRAINTS ALL IMMEDIATE')
+        execute('DROP TABLE "notifications"')
+        execute('ALTER TABLE "notifications_unpartitioned" RENAME TO "notifications"')
+        
+        execute('ALTER TABLE "notifications" ALTER COLUMN "id" ADD GENERATED BY DEFAULT AS IDENTITY')
+        execute(
+            'SELECT setval(pg_get_serial_sequence(\'"notifications"\', \'id\'), '
+            'COALESCE((SELECT MAX("id") FROM "notifications"), 0) + 1, false)'
+        )
+        execute('ALTER TABLE "notifications" ADD CONSTRAINT "notifications_pkey" PRIMARY KEY ("id")')
+        execute(
+            'ALTER TABLE "notifications" '
+            'ADD CONSTRAINT "notifications_recipient_id_e1133bac_fk_users_id" '
+            'FOREIGN KEY ("recipient_id") REFERENCES "users" ("id") DEFERRABLE INITIALLY DEFERRED, '
+            'ADD CONSTRAINT "notifications_sender_id_57e62d28_fk_users_id" '
+            'FOREIGN KEY ("sender_id") REFERENCES "users" ("id") DEFERRABLE INITIALLY DEFERRED'
+        )
+        for name, columns in INDEXES:
+            execute(f'CREATE INDEX "{name}" ON "notifications" {columns}')
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+    
+    dependencies = [
+        ('notifications', '0002_newsletter'),
+    ]
+    
+    operations = [
+        migrations.RunPython(partition_notifications, unpartition_notifications),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_partition_notifications'),
+    ]
+
+    # Postgres can't build indexes concurrently on a partitioned table; the
+    # partial index only covers unread rows so the build is short
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['recipient', '-created_at'], name='notifications_unread_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notificatio_recipie_583549_idx',
+        ),
+    ]
@@ -55,8 +55,73 @@ class Notification(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['recipient', '-created_at']),
-            models.Index(fields=['recipient', 'is_read']),
+            # Unread lists and counts only ever touch unread rows
+            models.Index(
+                fields=['recipient', '-created_at'],
+                condition=models.Q(is_read=False),
+                name='notifications_unread_idx'
+            ),
         ]
     
     def __str__(self):
-        return f"{self.notification_type} notification for {self.recipient.username}"
\ No newline at end of file
+        return f"{self.notification_type} notification for {self.recipient.username}"
+
+
+class NewsletterIssue(models.Model):
+    """A newsletter send, rendered once and delivered in chunks"""
+    
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    
+    # Delivery progress
+    sent_count = models.IntegerField(default=0)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'newsletter_issues'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return self.subject
+    
+    @property
+    def throughput(self):
+        """Messages per second for a finished send"""
+        if not (self.started_at and self.finished_at):
+            return None
+        elapsed = (self.finished_at - self.started_at).total_seconds()
+        return self.sent_count / elapsed if elapsed > 0 else None
+
+
+class NewsletterChunk(models.Model):
+    """
+    A contiguous range of subscriber ids sent by one Celery task.
+    sent_through_id is the checkpoint a retried chunk resumes from.
+    """
+    
+    issue = models.ForeignKey(
+        NewsletterIssue,
+        on_delete=models.CASCADE,
+        related_name='chunks'
+    )
+    first_user_id = models.BigIntegerField()
+    last_user_id = models.BigIntegerField()
+    
+    sent_through_id = models.BigIntegerField(null=True, blank=True)
+    sent_count = models.IntegerField(default=0)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'newsletter_chunks'
+        ordering = ['issue', 'first_user_id']
+        indexes = [
+            models.Index(fields=['issue', 'completed_at']),
+        ]
+    
+    def __str__(self):
+        return f"Chunk {self.first_user_id}-{self.last_user_id} of {self.issue}"
@@ -0,0 +1,183 @@
+# ============================================================================
+# apps/notifications/newsletter.py
+# ============================================================================
+
+"""
+Newsletter delivery for users with newsletter_subscribed set.
+
+An issue is rendered once and stored. Subscriber ids are streamed with a
+server-side cursor and split into NewsletterChunk id ranges, and each
+chunk is sent by its own Celery task over one SMTP connection. A chunk
+records the last user id it delivered after every send batch, so a
+retried or resumed chunk continues from there. Delivery is at least
+once: a failure part-way through a send batch may repeat that batch.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import NewsletterChunk, NewsletterIssue
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+def top_posts_section(limit=5):
+    """Plain-text list of the week's most liked posts, from a single query"""
+    from apps.posts.models import Post
+    
+    week_ago = timezone.now() - timedelta(days=7)
+    posts = (
+        Post.objects
+        .filter(status='published', published_at__gte=week_ago)
+        .order_by('-likes_count', '-views_count')
+        .values('title', 'slug', 'likes_count', 'author__username')[:limit]
+    )
+    
+    lines = [
+        f"- {post['title']} by {post['author__username']} ({post['likes_count']} likes)\n"
+        f"  /posts/{post['slug']}"
+        for post in posts
+    ]
+    if not lines:
+        return ''
+    return 'Top posts this week\n\n' + '\n'.join(lines)
+
+
+def create_issue(subject, intro):
+    """Render the issue body once and store it"""
+    sections = [intro.strip(), top_posts_section(settings.NEWSLETTER_TOP_POSTS)]
+    body = '\n\n'.join(section for section in sections if section)
+    body += '\n\nYou are receiving this because you subscribed to the DevConnect newsletter.'
+    
+    return NewsletterIssue.objects.create(subject=subject, body=body)
+
+
+def plan_chunks(issue, chunk_size=None):
+    """Split the current subscribers into id-range chunks for an issue"""
+    chunk_size = chunk_size or settings.NEWSLETTER_CHUNK_SIZE
+    
+    subscriber_ids = (
+        User.objects
+        .filter(newsletter_subscribed=True, is_active=True)
+        .order_by('id')
+        .values_list('id', flat=True)
+        .iterator(chunk_size=chunk_size)  # Server-side cursor on Postgres
+    )
+    
+    chunks = []
+    first_id = last_id = None
+    count = 0
+    
+    for user_id in subscriber_ids:
+        if first_id is None:
+            first_id = user_id
+        last_id = user_id
+        count += 1
+        
+        if count == chunk_size:
+            chunks.append(NewsletterChunk(issue=issue, first_user_id=first_id, last_user_id=last_id))
+            first_id = None
+            count = 0
+    
+    if first_id is not None:
+        chunks.append(NewsletterChunk(issue=issue, first_user_id=first_id, last_user_id=last_id))
+    
+    NewsletterChunk.objects.bulk_create(chunks, batch_size=1000)
+    return len(chunks)
+
+
+def send_chunk(chunk):
+    """
+    Deliver a chunk from its checkpoint onwards. Raises on SMTP errors so
+    the calling task can retry; progress made so far is kept.
+    """
+    issue = chunk.issue
+    send_batch_size = settings.NEWSLETTER_SEND_BATCH_SIZE
+    
+    recipients = (
+        User.objects
+        .filter(
+            newsletter_subscribed=True,
+            is_active=True,
+            id__gte=chunk.first_user_id,
+            id__lte=chunk.last_user_id
+        )
+        .order_by('id')
+        .values_list('id', 'email')
+    )
+    if chunk.sent_through_id is not None:
+        recipients = recipients.filter(id__gt=chunk.sent_through_id)
+    
+    connection = get_connection(fail_silently=False)
+    connection.open()
+    started = time.monotonic()
+    sent = 0
+    
+    try:
+        batch = []
+        for recipient in recipients.iterator(chunk_size=send_batch_size):
+            batch.append(recipient)
+            if len(batch) == send_batch_size:
+                sent += _send_batch(chunk, issue, batch, connection)
+                batch = []
+        if batch:
+            sent += _send_batch(chunk, issue, batch, connection)
+    finally:
+        connection.close()
+    
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Newsletter {issue.id} chunk {chunk.id}: {sent} messages "
+        f"in {elapsed:.2f}s ({sent / elapsed if elapsed else 0:.1f} msg/s)"
+    )
+    
+    NewsletterChunk.objects.filter(id=chunk.id).update(completed_at=timezone.now(), last_error='')
+    finish_issue_if_done(issue.id)
+    return sent
+
+
+def _send_batch(chunk, issue, batch, connection):
+    messages = [
+        EmailMessage(
+            subject=issue.subject,
+            body=issue.body,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[email],
+            connection=connection,
+        )
+        for _, email in batch
+    ]
+    # The connection is already open, so send_messages leaves it that way
+    connection.send_messages(messages)
+    
+    # Checkpoint after every batch so a retry doesn't resend it
+    NewsletterChunk.objects.filter(id=chunk.id).update(
+        sent_through_id=batch[-1][0],
+        sent_count=F('sent_count') + len(messages)
+    )
+    return len(messages)
+
+
+def finish_issue_if_done(issue_id):
+    """Stamp finished_at and the total once every chunk has completed"""
+    if NewsletterChunk.objects.filter(issue_id=issue_id, completed_at__isnull=True).exists():
+        return False
+    
+    total = NewsletterChunk.objects.filter(issue_id=issue_id).aggregate(
+        total=Sum('sent_count')
+    )['total'] or 0
+    
+    return bool(
+        NewsletterIssue.objects
+        .filter(id=issue_id, finished_at__isnull=True)
+        .update(finished_at=timezone.now(), sent_count=total)
+    )
@@ -0,0 +1,88 @@
+# ============================================================================
+# apps/notifications/outbox.py
+# ============================================================================
+
+from collections import deque
+
+
+class Outbox:
+    """
+    Bounded per-connection send queue for NotificationConsumer.
+    
+    Channel-layer handlers only enqueue, so a slow client can't back up the
+    channels-redis buffer. Unread counts are coalesced (only the latest is
+    sent), live topic deltas are summed per topic, notifications are
+    batched into one frame, and a client that falls more than `max_size`
+    notifications behind is told to resync instead of having the backlog
+    held in memory.
+    """
+    
+    def __init__(self, max_size, batch_size):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.notifications = deque()
+        self.unread_count = None
+        self.topic_deltas = {}
+        self.overflowed = False
+        self.overflow_count = 0  # Overflows since the client last caught up
+    
+    def put_notification(self, notification, event_id=None):
+        if len(self.notifications) >= self.max_size:
+            # The client will replay from its last_event_id, so drop the backlog
+            self.notifications.clear()
+            self.overflowed = True
+            self.overflow_count += 1
+            return
+        
+        if not self.overflowed:
+            self.notifications.append({**notification, 'event_id': event_id})
+    
+    def put_unread_count(self, count):
+        self.unread_count = count
+    
+    def put_topic_update(self, topic, deltas):
+        pending = self.topic_deltas.setdefault(topic, {})
+        for field, delta in deltas.items():
+            pending[field] = pending.get(field, 0) + delta
+    
+    def drain(self):
+        """Return the frames to send now, emptying the queue"""
+        frames = []
+        
+        if self.overflowed:
+            self.overflowed = False
+            frames.append({'type': 'resync_required'})
+        else:
+            # Caught up - only back-to-back overflows count against the client
+            self.overflow_count = 0
+        
+        while self.notifications:
+            batch = [
+                self.notifications.popleft()
+                for _ in range(min(self.batch_size, len(self.notifications)))
+            ]
+            
+            if len(batch) == 1:
+                notification = dict(batch[0])
+                event_id = notification.pop('event_id')
+                frames.append({
+                    'type': 'notification',
+                    'notification': notification,
+                    'event_id': event_id
+                })
+            else:
+                frames.append({
+                    'type': 'notification_batch',
+                    'notifications': batch,
+                    'last_event_id': batch[-1]['event_id']
+                })
+        
+        if self.unread_count is not None:
+            frames.append({'type': 'unread_count', 'count': self.unread_count})
+            self.unread_count = None
+        
+        for topic, deltas in self.topic_deltas.items():
+            frames.append({'type': 'topic_update', 'topic': topic, 'deltas': deltas})
+        self.topic_deltas = {}
+        
+        return frames
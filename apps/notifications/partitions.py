@@ -0,0 +1,162 @@
+# ============================================================================
+# apps/notifications/partitions.py
+# ============================================================================
+
+"""
+Monthly range partitions of the notifications table (by created_at).
+
+Migration 0003 turns the original table into the partition
+"notifications_legacy", covering everything before the first monthly
+partition. Monthly partitions are named notifications_yYYYYmMM and are
+created ahead of time by the create_notification_partitions command and
+the daily maintain_notification_partitions task; rows outside every
+monthly range land in notifications_default so inserts never fail.
+"""
+
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from .models import Notification
+
+DEFAULT_PARTITION = 'notifications_default'
+BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(value, months):
+    month_index = value.year * 12 + value.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f'notifications_y{month.year}m{month.month:02d}'
+
+
+def _parse_bound(value):
+    value = value.strip("'")
+    if value in ('MINVALUE', 'MAXVALUE'):
+        return None
+    return datetime.fromisoformat(value).astimezone(dt_timezone.utc)
+
+
+def list_partitions():
+    """Return [(name, lower, upper)] with None for unbounded ends, oldest first"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = %s::regclass
+            """,
+            [Notification._meta.db_table]
+        )
+        rows = cursor.fetchall()
+    
+    partitions = []
+    for name, bound in rows:
+        match = BOUND_RE.search(bound)
+        if match is None:  # DEFAULT
+            continue
+        partitions.append((name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+    
+    return sorted(partitions, key=lambda p: p[2] or datetime.max.replace(tzinfo=dt_timezone.utc))
+
+
+def create_partitions(months_ahead=3, now=None):
+    """
+    Make sure monthly partitions exist from the current month through
+    `months_ahead` months from now, moving any rows that already landed in
+    the default partition into them. Returns the names created.
+    """
+    now = now or datetime.now(dt_timezone.utc)
+    partitions = list_partitions()
+    existing = {name for name, _, _ in partitions}
+    # Months before this are covered by the legacy partition
+    covered_until = max((upper for _, _, upper in partitions if upper), default=None)
+    
+    quote = connection.ops.quote_name
+    table = quote(Notification._meta.db_table)
+    created = []
+    
+    for offset in range(months_ahead + 1):
+        start = add_months(month_start(now), offset)
+        name = partition_name(start)
+        if name in existing or (covered_until and start < covered_until):
+            continue
+        
+        bounds = [start, add_months(start, 1)]
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT EXISTS (SELECT 1 FROM {quote(DEFAULT_PARTITION)} '
+                    f'WHERE created_at >= %s AND created_at < %s)',
+                    bounds
+                )
+                stranded = cursor.fetchone()[0]
+                
+                # Postgres won't create a partition while the default holds
+                # rows in its range, so detach the default to move them across
+                if stranded:
+                    cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {quote(DEFAULT_PARTITION)}')
+                
+                cursor.execute(
+                    f'CREATE TABLE {quote(name)} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)',
+                    bounds
+                )
+                
+                if stranded:
+                    cursor.execute(
+                        f'WITH moved AS ('
+                        f'DELETE FROM {quote(DEFAULT_PARTITION)} '
+                        f'WHERE created_at >= %s AND created_at < %s RETURNING *'
+                        f') INSERT INTO {quote(name)} SELECT * FROM moved',
+                        bounds
+                    )
+                    cursor.execute(f'ALTER TABLE {table} ATTACH PARTITION {quote(DEFAULT_PARTITION)} DEFAULT')
+        created.append(name)
+    
+    return created
+
+
+def drop_partitions_before(cutoff, archive=None):
+    """
+    Detach and drop partitions whose whole range is older than `cutoff`,
+    writing their rows to `archive` (an open text file, one JSON row per
+    line) first. Returns {partition name: rows dropped}.
+    """
+    quote = connection.ops.quote_name
+    dropped = {}
+    
+    for name, _, upper in list_partitions():
+        if upper is None or upper > cutoff:
+            continue
+        
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'ALTER TABLE {quote(Notification._meta.db_table)} DETACH PARTITION {quote(name)}'
+                )
+                cursor.execute(f'SELECT COUNT(*) FROM {quote(name)}')
+                dropped[name] = cursor.fetchone()[0]
+            
+            if archive and dropped[name]:
+                # Named cursor streams the rows instead of loading the partition
+                with connection.chunked_cursor() as cursor:
+                    cursor.execute(f'SELECT row_to_json({quote(name)})::text FROM {quote(name)}')
+                    for (row,) in cursor:
+                        archive.write(row + '\n')
+                archive.flush()
+            
+            with connection.cursor() as cursor:
+                # Deferred foreign key checks still queued against the
+                # partition (when called inside a larger transaction) block DROP
+                cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+                cursor.execute(f'DROP TABLE {quote(name)}')
+    
+    return dropped
@@ -0,0 +1,118 @@
+# ============================================================================
+# apps/notifications/retention.py
+# ============================================================================
+
+"""
+Notification retention.
+
+Notifications past NOTIFICATION_UNREAD_RETENTION_DAYS go a whole monthly
+partition at a time where they can (see partitions.py), which costs
+nothing in WAL or vacuum. The rest of the expired rows sit in partitions
+that straddle the cutoff - notifications_legacy holds all history from
+before partitioning until its upper bound is past the cutoff - and read
+notifications expire sooner and mid-partition, so those rows are deleted
+with raw SQL over consecutive primary-key ranges, one short transaction
+per range with a pause in between, so cleanup never holds long locks,
+floods WAL in one go, or pulls rows into Python through Django's delete
+collector (notifications have no dependent rows). When
+NOTIFICATION_ARCHIVE_DIR is set, each batch's deleted rows are written to
+a gzipped NDJSON file in the same transaction before it commits.
+"""
+
+import gzip
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Notification
+
+
+def archive_path(directory, now=None):
+    now = now or timezone.now()
+    return os.path.join(directory, f"notifications-{now:%Y%m%d-%H%M%S}.ndjson.gz")
+
+
+def delete_in_batches(where, params, batch_size=None, pause=None, archive=None):
+    """
+    Delete notifications matching a SQL condition, batch_size ids at a time,
+    stepping only over the ids of matching rows. The condition should bound
+    created_at so partition pruning keeps every query to the partitions
+    that straddle the cutoff. `archive` is an open text file that receives
+    one JSON row per line. Returns the number of rows deleted.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_CLEANUP_BATCH_SIZE
+    pause = settings.NOTIFICATION_CLEANUP_PAUSE if pause is None else pause
+    table = connection.ops.quote_name(Notification._meta.db_table)
+    
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN(id), MAX(id) FROM {table} WHERE {where}', params)
+        min_id, max_id = cursor.fetchone()
+    
+    if min_id is None:
+        return 0
+    
+    returning = f'row_to_json({table})::text' if archive else 'id'
+    deleted = 0
+    
+    for start in range(min_id, max_id + 1, batch_size):
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {table} WHERE id >= %s AND id < %s AND ({where}) '
+                    f'RETURNING {returning}',
+                    [start, start + batch_size, *params]
+                )
+                rows = cursor.fetchall()
+            
+            # A failed archive write rolls the delete back
+            if archive and rows:
+                archive.write(''.join(row[0] + '\n' for row in rows))
+                archive.flush()
+        
+        deleted += len(rows)
+        if rows and pause:
+            time.sleep(pause)
+    
+    return deleted
+
+
+def purge_old_notifications(now=None):
+    """
+    Apply the retention policy: delete read notifications older than
+    NOTIFICATION_READ_RETENTION_DAYS, and every notification older than
+    NOTIFICATION_UNREAD_RETENTION_DAYS (0 keeps them forever) - dropping
+    partitions that are entirely older, deleting the rest in batches.
+    Returns {'read': n, 'expired': n}.
+    """
+    from .partitions import drop_partitions_before
+    
+    now = now or timezone.now()
+    archive = None
+    
+    if settings.NOTIFICATION_ARCHIVE_DIR:
+        os.makedirs(settings.NOTIFICATION_ARCHIVE_DIR, exist_ok=True)
+        archive = gzip.open(archive_path(settings.NOTIFICATION_ARCHIVE_DIR, now), 'at')
+    
+    try:
+        counts = {'read': 0, 'expired': 0}
+        
+        if settings.NOTIFICATION_UNREAD_RETENTION_DAYS:
+            expiry_cutoff = now - timedelta(days=settings.NOTIFICATION_UNREAD_RETENTION_DAYS)
+            counts['expired'] = sum(drop_partitions_before(expiry_cutoff, archive=archive).values())
+            # Partition pruning limits this to the partitions left that start before the cutoff
+            counts['expired'] += delete_in_batches('created_at < %s', [expiry_cutoff], archive=archive)
+        
+        read_cutoff = now - timedelta(days=settings.NOTIFICATION_READ_RETENTION_DAYS)
+        # Nothing is read before it's created, so the created_at bound only adds pruning
+        counts['read'] = delete_in_batches(
+            'is_read AND read_at < %s AND created_at < %s', [read_cutoff, read_cutoff], archive=archive
+        )
+    finally:
+        if archive:
+            archive.close()
+    
+    return counts
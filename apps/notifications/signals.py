@@ -1,7 +1,9 @@
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from apps.posts.models import Like, Comment, Post, Bookmark
-from apps.users.models import Follow
+from apps.users.models import Follow, User
+from apps.notifications.middleware import user_cache_key
 from apps.notifications.utils import create_notification
 
 
@@ -98,4 +100,10 @@ def notify_follow(sender, instance, created, **kwargs):
                 data={'user_id': instance.follower.id}
             )
         except Exception as e:
-            print(f"Failed to create notification: {e}")
\ No newline at end of file
+            print(f"Failed to create notification: {e}")
+
+
+@receiver([post_save, post_delete], sender=User)
+def forget_socket_user(sender, instance, **kwargs):
+    """Drop the cached WebSocket auth snapshot so changes like deactivation apply at once"""
+    cache.delete(user_cache_key(instance.pk))
\ No newline at end of file
@@ -0,0 +1,143 @@
+# ============================================================================
+# apps/notifications/stream.py
+# ============================================================================
+
+"""
+Per-user Redis Stream of delivered notifications.
+
+Every notification pushed over the WebSocket is also appended to a bounded
+stream so a reconnecting client can ask for "everything after event X"
+instead of refetching /api/notifications/ in full.
+
+Event ids handed to clients are "<stream id>:<position>", where the position
+is the notification's (created_at, id) in microseconds. The stream id is
+Redis' own and only orders entries within the stream; when the stream no
+longer reaches back far enough, replay resumes from the position with a
+keyset query, so it never compares the Redis clock against the database's.
+"""
+
+import json
+import logging
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+EVENT_ID_RE = re.compile(r'^(\d+-\d+)(?::(\d+)-(\d+))?$')
+
+# Stream id for events that never made it into the stream; no entry has it,
+# so resuming from one always goes to the database
+NO_STREAM_ID = '0-0'
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def stream_key(user_id):
+    return f'notifications:stream:{user_id}'
+
+
+def is_valid_event_id(event_id):
+    return bool(event_id) and bool(EVENT_ID_RE.match(str(event_id)))
+
+
+def _position(created_at, notification_id):
+    return f'{(created_at - EPOCH) // timedelta(microseconds=1)}-{notification_id}'
+
+
+def make_event_id(stream_id, created_at, notification_id):
+    return f'{stream_id or NO_STREAM_ID}:{_position(created_at, notification_id)}'
+
+
+def parse_event_id(event_id):
+    """
+    Split an event id into (stream_id, position), position being the
+    notification's (created_at, id). Bare stream ids issued before positions
+    were added have no position.
+    """
+    stream_id, micros, notification_id = EVENT_ID_RE.match(str(event_id)).groups()
+    if micros is None:
+        return stream_id, None
+    return stream_id, (EPOCH + timedelta(microseconds=int(micros)), int(notification_id))
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def append_event(user_id, payload, created_at, notification_id):
+    """
+    Append a serialized notification to the user's stream and return its
+    event id. If Redis is unavailable the id still carries the position, so
+    a client resuming from it is served from the database.
+    """
+    position = _position(created_at, notification_id)
+    try:
+        conn = get_redis_connection('default')
+        key = stream_key(user_id)
+        pipe = conn.pipeline()
+        pipe.xadd(
+            key,
+            {'payload': json.dumps(payload), 'position': position},
+            maxlen=settings.NOTIFICATION_STREAM_MAXLEN,
+            approximate=True
+        )
+        pipe.expire(key, settings.NOTIFICATION_STREAM_TTL)
+        stream_id, _ = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Notification stream append failed: {e}")
+        stream_id = None
+    return make_event_id(_decode(stream_id), created_at, notification_id)
+
+
+def latest_stream_id(user_id):
+    """Stream id of the newest entry in the user's stream, or None"""
+    try:
+        conn = get_redis_connection('default')
+        entries = conn.xrevrange(stream_key(user_id), count=1)
+    except Exception as e:
+        logger.warning(f"Notification stream read failed: {e}")
+        return None
+    return _decode(entries[0][0]) if entries else None
+
+
+def _event_id(entry_id, fields):
+    # Entries appended before positions were added only have a stream id
+    position = fields.get(b'position')
+    return f'{entry_id}:{_decode(position)}' if position else entry_id
+
+
+def read_since(user_id, stream_id, limit):
+    """
+    Read entries strictly after stream_id.
+    
+    Returns (events, covered, truncated):
+    - events: list of (event_id, payload) in delivery order
+    - covered: False when the stream no longer reaches back to stream_id
+      (trimmed, expired or Redis unavailable) and the caller must fall back
+      to the database
+    - truncated: True when more than `limit` entries were missed
+    """
+    try:
+        conn = get_redis_connection('default')
+        key = stream_key(user_id)
+        pipe = conn.pipeline()
+        pipe.xrange(key, min=stream_id, max=stream_id, count=1)
+        pipe.xrange(key, min=f'({stream_id}', count=limit + 1)
+        anchor, entries = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Notification stream read failed: {e}")
+        return [], False, False
+    
+    # Trimming drops the oldest entries first, so if the client's last seen
+    # entry is still present nothing after it has been lost
+    if not anchor:
+        return [], False, False
+    
+    events = [
+        (_event_id(_decode(entry_id), fields), json.loads(_decode(fields[b'payload'])))
+        for entry_id, fields in entries[:limit]
+    ]
+    return events, True, len(entries) > limit
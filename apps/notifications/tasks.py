@@ -10,54 +10,194 @@ from datetime import timedelta
 User = get_user_model()
 
 
+def _chunked(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _digest_rows(since, top):
+    """
+    One grouped query: unread count and latest titles per opted-in recipient
+    """
+    from django.contrib.postgres.aggregates import ArrayAgg
+    from django.contrib.postgres.fields import ArrayField
+    from django.db.models import CharField, Count, Func
+    from .models import Notification
+    
+    latest_titles = Func(
+        ArrayAgg('title', ordering='-created_at'),
+        template=f'(%(expressions)s)[1:{int(top)}]',
+        output_field=ArrayField(CharField(max_length=200)),
+    )
+    
+    return (
+        Notification.objects
+        .filter(
+            created_at__gte=since,
+            is_read=False,
+            recipient__email_notifications=True
+        )
+        .values('recipient_id', 'recipient__username', 'recipient__email')
+        .annotate(unread_count=Count('id'), latest_titles=latest_titles)
+        .order_by('recipient_id')
+        .iterator(chunk_size=2000)
+    )
+
+
 @shared_task
 def send_daily_digest():
     """
-    Send daily digest emails to users
+    Send daily digest emails to users, fanned out over a group of batch tasks
     """
-    from .models import Notification
-    from django.core.mail import send_mail
+    from celery import group
     from django.conf import settings
     
     yesterday = timezone.now() - timedelta(days=1)
+    recipients = 0
     
-    # Get users with unread notifications from yesterday
-    users_with_notifications = User.objects.filter(
-        notifications__created_at__gte=yesterday,
-        notifications__is_read=False,
-        email_notifications=True
-    ).distinct()
+    def batches():
+        nonlocal recipients
+        rows = _digest_rows(yesterday, settings.DIGEST_TOP_NOTIFICATIONS)
+        for batch in _chunked(rows, settings.DIGEST_BATCH_SIZE):
+            recipients += len(batch)
+            yield send_digest_batch.s([
+                {
+                    'username': row['recipient__username'],
+                    'email': row['recipient__email'],
+                    'unread_count': row['unread_count'],
+                    'latest_titles': row['latest_titles'],
+                }
+                for row in batch
+            ])
     
-    for user in users_with_notifications:
-        unread_count = user.notifications.filter(
-            is_read=False,
-            created_at__gte=yesterday
-        ).count()
+    group(batches()).apply_async()
+    
+    return f'Digest queued for {recipients} users'
+
+
+@shared_task
+def send_digest_batch(digests):
+    """
+    Send one batch of digest emails over a single SMTP connection
+    """
+    from django.core.mail import EmailMessage, get_connection
+    from django.conf import settings
+    
+    connection = get_connection(fail_silently=True)
+    messages = []
+    
+    for digest in digests:
+        unread_count = digest['unread_count']
+        latest = ''.join(f'  - {title}\n' for title in digest['latest_titles'])
         
-        if unread_count > 0:
-            send_mail(
-                subject=f'You have {unread_count} unread notifications on DevConnect',
-                message=f'Hi {user.username},\n\nYou have {unread_count} unread notifications waiting for you.\n\nVisit DevConnect to check them out!',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=True,
-            )
+        messages.append(EmailMessage(
+            subject=f'You have {unread_count} unread notifications on DevConnect',
+            body=(
+                f"Hi {digest['username']},\n\n"
+                f"You have {unread_count} unread notifications waiting for you.\n\n"
+                f"Latest:\n{latest}\n"
+                f"Visit DevConnect to check them out!"
+            ),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[digest['email']],
+            connection=connection,
+        ))
+    
+    # send_messages opens the connection once for the whole batch
+    sent = connection.send_messages(messages) or 0
+    
+    return f'Digest sent to {sent} users'
+
+
+@shared_task
+def send_newsletter(issue_id):
+    """
+    Fan a newsletter issue out over a group of chunk tasks. Calling it again
+    for the same issue resumes: only unfinished chunks are queued.
+    """
+    from celery import group
+    from .models import NewsletterIssue
+    from .newsletter import finish_issue_if_done, plan_chunks
+    
+    issue = NewsletterIssue.objects.get(id=issue_id)
+    
+    if issue.started_at is None:
+        NewsletterIssue.objects.filter(id=issue.id).update(started_at=timezone.now())
+    if not issue.chunks.exists():
+        plan_chunks(issue)
+    
+    chunk_ids = list(
+        issue.chunks.filter(completed_at__isnull=True).values_list('id', flat=True)
+    )
+    if chunk_ids:
+        group(send_newsletter_chunk.s(chunk_id) for chunk_id in chunk_ids).apply_async()
+    else:
+        finish_issue_if_done(issue.id)
+    
+    return f'Newsletter {issue.id} queued in {len(chunk_ids)} chunks'
+
+
+@shared_task(bind=True, max_retries=5)
+def send_newsletter_chunk(self, chunk_id):
+    """
+    Send one chunk of a newsletter, retrying from its checkpoint on failure
+    """
+    from django.db.models import F
+    from .models import NewsletterChunk
+    from .newsletter import send_chunk
+    
+    chunk = NewsletterChunk.objects.select_related('issue').get(id=chunk_id)
+    if chunk.completed_at is not None:
+        return f'Chunk {chunk_id} already sent'
+    
+    NewsletterChunk.objects.filter(id=chunk_id).update(attempts=F('attempts') + 1)
+    
+    try:
+        sent = send_chunk(chunk)
+    except Exception as e:
+        NewsletterChunk.objects.filter(id=chunk_id).update(last_error=str(e)[:1000])
+        raise self.retry(exc=e, countdown=30 * 2 ** self.request.retries)
     
-    return f'Digest sent to {users_with_notifications.count()} users'
+    return f'Chunk {chunk_id} sent {sent} messages'
 
 
 @shared_task
 def cleanup_old_notifications():
     """
-    Delete read notifications older than 30 days
+    Drop expired notification partitions and delete the other expired rows in small batches
     """
-    from .models import Notification
+    from .retention import purge_old_notifications
+    
+    counts = purge_old_notifications()
     
-    thirty_days_ago = timezone.now() - timedelta(days=30)
+    return f"Deleted {counts['read']} read and {counts['expired']} expired notifications"
+
+
+@shared_task
+def maintain_notification_partitions(months_ahead=3):
+    """
+    Create the coming months' notification partitions ahead of time
+    """
+    from .partitions import create_partitions
+    
+    created = create_partitions(months_ahead=months_ahead)
+    
+    return f'Created {len(created)} notification partitions'
+
+
+@shared_task(ignore_result=True)
+def flush_live_updates(topic):
+    """
+    Push coalesced counter deltas to a live topic's subscribers
+    """
+    from .live import flush_topic
     
-    deleted_count = Notification.objects.filter(
-        is_read=True,
-        read_at__lt=thirty_days_ago
-    ).delete()[0]
+    deltas = flush_topic(topic)
     
-    return f'Deleted {deleted_count} old notifications'
+    return f'Pushed {len(deltas)} counters to {topic}'
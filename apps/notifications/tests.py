@@ -0,0 +1,751 @@
+# ============================================================================
+# apps/notifications/tests.py
+# ============================================================================
+
+import json
+import pytest
+import smtplib
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.db import transaction
+from django_redis import get_redis_connection
+from rest_framework.test import APIClient
+from apps.notifications.consumers import NotificationConsumer
+from apps.notifications.models import Notification
+from apps.notifications.stream import make_event_id, read_since, stream_key
+from apps.notifications.utils import create_notification
+
+User = get_user_model()
+
+IN_MEMORY_CHANNEL_LAYERS = {
+    'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}
+}
+
+
+@pytest.mark.django_db(transaction=True)
+class TestNotificationStream:
+    
+    @pytest.fixture
+    def user(self):
+        user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        get_redis_connection('default').delete(stream_key(user.id))
+        return user
+    
+    def stream_ids(self, user):
+        entries = get_redis_connection('default').xrange(stream_key(user.id))
+        return [entry_id.decode() for entry_id, _ in entries]
+    
+    def test_create_notification_appends_to_stream(self, user):
+        """Test notifications are recorded in the replay stream"""
+        create_notification(recipient=user, title='Hello', message='First')
+        assert len(self.stream_ids(user)) == 1
+    
+    def test_read_since_returns_only_newer_events(self, user):
+        """Test replay starts strictly after the given event id"""
+        create_notification(recipient=user, message='First')
+        second = create_notification(recipient=user, message='Second')
+        first_id = self.stream_ids(user)[0]
+        
+        events, covered, truncated = read_since(user.id, first_id, 10)
+        assert covered
+        assert not truncated
+        assert [payload['id'] for _, payload in events] == [second.id]
+    
+    def test_read_since_detects_trimmed_stream(self, user):
+        """Test a trimmed stream asks the caller to fall back to the database"""
+        for i in range(3):
+            create_notification(recipient=user, message=f'Message {i}')
+        first_id = self.stream_ids(user)[0]
+        get_redis_connection('default').xtrim(stream_key(user.id), maxlen=1, approximate=False)
+        
+        events, covered, _ = read_since(user.id, first_id, 10)
+        assert not covered
+        assert events == []
+    
+    def test_rolled_back_notification_is_not_streamed(self, user):
+        """Test a notification only reaches the stream once its transaction commits"""
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                create_notification(recipient=user, message='Rolled back')
+                assert self.stream_ids(user) == []
+                raise RuntimeError
+        
+        assert self.stream_ids(user) == []
+        assert not Notification.objects.filter(recipient=user).exists()
+
+
+@pytest.mark.django_db
+class TestNotificationAPI:
+    
+    @pytest.fixture
+    def api_client(self):
+        return APIClient()
+    
+    @pytest.fixture
+    def users(self):
+        user1 = User.objects.create_user(username='user1', email='user1@example.com', password='pass123')
+        user2 = User.objects.create_user(username='user2', email='user2@example.com', password='pass123')
+        return user1, user2
+    
+    def make_notification(self, recipient):
+        return Notification.objects.create(
+            recipient=recipient,
+            notification_type='system',
+            title='Test',
+            message='Test notification'
+        )
+    
+    def test_bulk_mark_read(self, api_client, users):
+        """Test marking a list of notifications as read"""
+        user1, user2 = users
+        own = [self.make_notification(user1) for _ in range(3)]
+        other = self.make_notification(user2)
+        
+        api_client.force_authenticate(user=user1)
+        response = api_client.post(
+            '/api/notifications/mark_read/',
+            {'ids': [own[0].id, own[1].id, other.id]},
+            format='json'
+        )
+        
+        assert response.status_code == 200
+        assert response.data['unread_count'] == 1
+        assert Notification.objects.filter(recipient=user1, is_read=True).count() == 2
+        other.refresh_from_db()
+        assert not other.is_read
+    
+    def test_unread_list_uses_partial_index(self, api_client, users, query_plan):
+        """Test unread notifications are read from the unread-only index"""
+        from apps.conftest import index_names
+        
+        recipient, _ = users
+        self.make_notification(recipient)
+        self.make_notification(recipient)
+        api_client.force_authenticate(user=recipient)
+        
+        response, plans = query_plan(lambda: api_client.get('/api/notifications/unread/'), 'notifications')
+        assert response.status_code == 200
+        unread_indexes = index_names('notifications_unread_idx')
+        assert any(name in plan for plan in plans for name in unread_indexes), plans
+    
+    def test_bulk_mark_read_requires_id_list(self, api_client, users):
+        """Test bulk mark_read rejects malformed payloads"""
+        api_client.force_authenticate(user=users[0])
+        response = api_client.post('/api/notifications/mark_read/', {'ids': 'all'}, format='json')
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db(transaction=True)
+class TestNotificationConsumer:
+    
+    @pytest.fixture(autouse=True)
+    def in_memory_channels(self, settings):
+        settings.CHANNEL_LAYERS = IN_MEMORY_CHANNEL_LAYERS
+        settings.NOTIFICATION_READ_DEBOUNCE = 0
+    
+    @pytest.fixture
+    def user(self):
+        user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        get_redis_connection('default').delete(stream_key(user.id))
+        return user
+    
+    def connect(self, user, path='/ws/notifications/'):
+        communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), path)
+        communicator.scope['user'] = user
+        return communicator
+    
+    def test_replay_from_database_when_stream_missing(self, user):
+        """Test reconnecting clients get missed notifications from the database"""
+        Notification.objects.create(recipient=user, notification_type='system', title='Missed', message='Missed')
+        
+        async def run():
+            communicator = self.connect(user, '/ws/notifications/?last_event_id=0-0:0-0')
+            connected, _ = await communicator.connect()
+            assert connected
+            unread = json.loads(await communicator.receive_from())
+            replay = json.loads(await communicator.receive_from())
+            await communicator.disconnect()
+            return unread, replay
+        
+        unread, replay = async_to_sync(run)()
+        assert unread == {'type': 'unread_count', 'count': 1}
+        assert replay['type'] == 'replay'
+        assert replay['source'] == 'database'
+        assert [n['title'] for n in replay['notifications']] == ['Missed']
+    
+    def test_truncated_database_replay_resumes_where_it_stopped(self, user, settings):
+        """Test a second sync from a truncated replay's cursor gets the rest"""
+        from datetime import timedelta
+        from django.utils import timezone
+        settings.NOTIFICATION_REPLAY_LIMIT = 2
+        
+        now = timezone.now().replace(microsecond=0)
+        for minutes, title in [(3, 'First'), (2, 'Second'), (1, 'Third')]:
+            notification = Notification.objects.create(
+                recipient=user, notification_type='system', title=title, message=title
+            )
+            Notification.objects.filter(id=notification.id).update(created_at=now - timedelta(minutes=minutes))
+        
+        async def run():
+            communicator = self.connect(user, '/ws/notifications/?last_event_id=0-0:0-0')
+            await communicator.connect()
+            await communicator.receive_from()
+            first = json.loads(await communicator.receive_from())
+            await communicator.send_to(text_data=json.dumps({
+                'type': 'sync',
+                'last_event_id': first['last_event_id']
+            }))
+            second = json.loads(await communicator.receive_from())
+            await communicator.disconnect()
+            return first, second
+        
+        first, second = async_to_sync(run)()
+        assert first['truncated']
+        assert [n['title'] for n in first['notifications']] == ['First', 'Second']
+        assert first['last_event_id'] == first['notifications'][-1]['event_id']
+        assert not second['truncated']
+        assert [n['title'] for n in second['notifications']] == ['Third']
+    
+    def test_database_replay_breaks_created_at_ties_by_id(self, user):
+        """Test rows sharing the last seen row's created_at are not skipped"""
+        seen = Notification.objects.create(recipient=user, notification_type='system', title='Seen', message='Seen')
+        missed = Notification.objects.create(recipient=user, notification_type='system', title='Missed', message='Missed')
+        Notification.objects.filter(id=missed.id).update(created_at=seen.created_at)
+        
+        async def run():
+            cursor = make_event_id(None, seen.created_at, seen.id)
+            communicator = self.connect(user, f'/ws/notifications/?last_event_id={cursor}')
+            await communicator.connect()
+            await communicator.receive_from()
+            replay = json.loads(await communicator.receive_from())
+            await communicator.disconnect()
+            return replay
+        
+        replay = async_to_sync(run)()
+        assert replay['source'] == 'database'
+        assert [n['title'] for n in replay['notifications']] == ['Missed']
+    
+    def test_trimmed_bare_stream_id_requires_resync(self, user):
+        """Test an old-style event id the stream no longer covers asks for a resync"""
+        async def run():
+            communicator = self.connect(user, '/ws/notifications/?last_event_id=1-0')
+            await communicator.connect()
+            await communicator.receive_from()
+            frame = json.loads(await communicator.receive_from())
+            await communicator.disconnect()
+            return frame
+        
+        assert async_to_sync(run)() == {'type': 'resync_required'}
+    
+    def test_mark_read_over_socket(self, user):
+        """Test read receipts sent over the socket are applied and acknowledged"""
+        notifications = [
+            Notification.objects.create(recipient=user, notification_type='system', title='Test', message='Test')
+            for _ in range(2)
+        ]
+        
+        async def run():
+            communicator = self.connect(user)
+            await communicator.connect()
+            await communicator.receive_from()
+            await communicator.send_to(text_data=json.dumps({
+                'type': 'mark_read',
+                'ids': [n.id for n in notifications]
+            }))
+            update = json.loads(await communicator.receive_from())
+            await communicator.disconnect()
+            return update
+        
+        update = async_to_sync(run)()
+        assert update == {'type': 'unread_count', 'count': 0}
+        assert not Notification.objects.filter(recipient=user, is_read=False).exists()
+    
+    def test_burst_is_batched_into_one_frame(self, user):
+        """Test notifications arriving together are sent as a single batch"""
+        from channels.layers import get_channel_layer
+        
+        async def run():
+            communicator = self.connect(user)
+            await communicator.connect()
+            await communicator.receive_from()
+            channel_layer = get_channel_layer()
+            for i in range(3):
+                await channel_layer.group_send(f'notifications_{user.id}', {
+                    'type': 'notification_message',
+                    'notification': {'id': i, 'title': f'Burst {i}'},
+                    'event_id': f'{i + 1}-0'
+                })
+                await channel_layer.group_send(f'notifications_{user.id}', {
+                    'type': 'unread_count_update',
+                    'count': i + 1
+                })
+            frames = [json.loads(await communicator.receive_from()) for _ in range(2)]
+            await communicator.disconnect()
+            return frames
+        
+        batch, unread = async_to_sync(run)()
+        assert batch['type'] == 'notification_batch'
+        assert [n['id'] for n in batch['notifications']] == [0, 1, 2]
+        assert batch['last_event_id'] == '3-0'
+        assert unread == {'type': 'unread_count', 'count': 3}
+    
+    def test_live_topic_updates_are_coalesced(self, user):
+        """Test subscribed sockets get summed counter deltas per topic"""
+        from asgiref.sync import sync_to_async
+        from apps.posts.models import Post
+        from apps.notifications.live import publish_delta
+        from apps.notifications.tasks import flush_live_updates
+        
+        post = Post.objects.create(author=user, title='Live', content='Live post', status='published')
+        topic = f'post:{post.id}'
+        get_redis_connection('default').delete(f'live:pending:{topic}', f'live:scheduled:{topic}')
+        
+        async def run():
+            communicator = self.connect(user)
+            await communicator.connect()
+            await communicator.receive_from()
+            await communicator.send_to(text_data=json.dumps({'type': 'subscribe', 'topic': topic}))
+            subscribed = json.loads(await communicator.receive_from())
+            
+            # The first delta opens the window and flushes (eagerly in tests),
+            # the rest accumulate until the scheduled flush runs
+            for _ in range(3):
+                await sync_to_async(publish_delta)('post', post.id, 'likes_count')
+            await sync_to_async(publish_delta)('post', post.id, 'views_count')
+            first = json.loads(await communicator.receive_from())
+            await sync_to_async(flush_live_updates)(topic)
+            second = json.loads(await communicator.receive_from())
+            await communicator.disconnect()
+            return subscribed, first, second
+        
+        subscribed, first, second = async_to_sync(run)()
+        assert subscribed == {'type': 'subscribed', 'topic': topic}
+        assert first == {'type': 'topic_update', 'topic': topic, 'deltas': {'likes_count': 1}}
+        assert second == {'type': 'topic_update', 'topic': topic, 'deltas': {'likes_count': 2, 'views_count': 1}}
+    
+    def test_live_delta_waits_for_commit_and_survives_broker_errors(self, user, monkeypatch):
+        """Test deltas publish only on commit, and an unreachable broker doesn't fail the request"""
+        from django.db import transaction
+        from apps.notifications.live import publish_delta
+        from apps.notifications.tasks import flush_live_updates
+        
+        conn = get_redis_connection('default')
+        conn.delete('live:pending:post:1', 'live:scheduled:post:1')
+        
+        def broker_down(*args, **kwargs):
+            raise ConnectionError('broker unreachable')
+        monkeypatch.setattr(flush_live_updates, 'apply_async', broker_down)
+        
+        with transaction.atomic():
+            publish_delta('post', 1, 'likes_count')
+            assert not conn.exists('live:pending:post:1')
+        
+        assert conn.hget('live:pending:post:1', 'likes_count') == b'1'
+        # The failed flush doesn't hold the window shut
+        assert not conn.exists('live:scheduled:post:1')
+    
+    def test_cannot_subscribe_to_private_snippet(self, user):
+        """Test topics are limited to content the user can see"""
+        from apps.snippets.models import Snippet
+        
+        other = User.objects.create_user(username='other', email='other@example.com', password='pass123')
+        snippet = Snippet.objects.create(author=other, title='Secret', code='x = 1', visibility='private')
+        
+        async def run():
+            communicator = self.connect(user)
+            await communicator.connect()
+            await communicator.receive_from()
+            await communicator.send_to(text_data=json.dumps({'type': 'subscribe', 'topic': f'snippet:{snippet.id}'}))
+            response = json.loads(await communicator.receive_from())
+            await communicator.disconnect()
+            return response
+        
+        assert async_to_sync(run)()['type'] == 'error'
+    
+    def test_jwt_handshake(self, user):
+        """Test sockets authenticate with an access token in the query string or subprotocol"""
+        from rest_framework_simplejwt.tokens import AccessToken
+        from apps.notifications.middleware import JWTAuthMiddleware
+        
+        token = str(AccessToken.for_user(user))
+        application = JWTAuthMiddleware(NotificationConsumer.as_asgi())
+        
+        async def run():
+            results = []
+            for path, subprotocols in [
+                (f'/ws/notifications/?token={token}', None),
+                ('/ws/notifications/', ['jwt', token]),
+                ('/ws/notifications/?token=invalid', None),
+            ]:
+                communicator = WebsocketCommunicator(application, path, subprotocols=subprotocols)
+                communicator.scope['user'] = AnonymousUser()
+                connected, subprotocol = await communicator.connect()
+                results.append((connected, subprotocol))
+                await communicator.disconnect()
+            return results
+        
+        assert async_to_sync(run)() == [(True, None), (True, 'jwt'), (False, 1000)]
+    
+    def test_verified_tokens_are_cached(self, user):
+        """Test a reconnect with the same token skips verification"""
+        from rest_framework_simplejwt.tokens import AccessToken
+        from apps.notifications.middleware import get_user_for_token, verified_tokens
+        
+        token = str(AccessToken.for_user(user))
+        assert get_user_for_token(token) == user
+        assert verified_tokens.get(token) == user.id
+    
+    def test_cached_socket_user_is_a_snapshot_dropped_on_save(self, user):
+        """Test the cached user has no password hash and deactivation applies at once"""
+        from django.core.cache import cache
+        from rest_framework_simplejwt.tokens import AccessToken
+        from apps.notifications.middleware import get_user_for_token, user_cache_key
+        
+        token = str(AccessToken.for_user(user))
+        assert get_user_for_token(token).username == user.username
+        assert 'password' not in cache.get(user_cache_key(user.id))
+        
+        user.is_active = False
+        user.save()
+        assert cache.get(user_cache_key(user.id)) is None
+        assert not get_user_for_token(token).is_authenticated
+
+
+class CountingEmailBackend(locmem.EmailBackend):
+    """In-memory SMTP stand-in that records how many connections were opened"""
+    
+    opened = 0
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        CountingEmailBackend.opened += 1
+
+
+@pytest.mark.django_db
+class TestDailyDigest:
+    
+    @pytest.fixture(autouse=True)
+    def email_backend(self, settings):
+        settings.EMAIL_BACKEND = 'apps.notifications.tests.CountingEmailBackend'
+        settings.DIGEST_BATCH_SIZE = 2
+        settings.DIGEST_TOP_NOTIFICATIONS = 2
+        CountingEmailBackend.opened = 0
+    
+    def test_digest_summarizes_unread_notifications(self):
+        """Test one email per opted-in user with their count and latest titles"""
+        from apps.notifications.tasks import send_daily_digest
+        
+        users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='testpass123')
+            for i in range(3)
+        ]
+        opted_out = User.objects.create_user(
+            username='quiet', email='quiet@example.com', password='testpass123', email_notifications=False
+        )
+        for user in users + [opted_out]:
+            for title in ('First', 'Second', 'Third'):
+                create_notification(recipient=user, title=title, message=title)
+        Notification.objects.filter(recipient=users[0], title='Third').update(is_read=True)
+        
+        assert send_daily_digest() == 'Digest queued for 3 users'
+        
+        sent = {message.to[0]: message for message in mail.outbox}
+        assert set(sent) == {user.email for user in users}
+        assert sent[users[0].email].subject.startswith('You have 2 unread')
+        assert 'Third' in sent[users[1].email].body
+        assert 'First' not in sent[users[1].email].body
+        # Three recipients in batches of two: one connection per batch
+        assert CountingEmailBackend.opened == 2
+
+
+class FlakyEmailBackend(locmem.EmailBackend):
+    """SMTP stand-in that drops the connection on a chosen send call"""
+    
+    fail_on_call = None
+    calls = 0
+    
+    def send_messages(self, messages):
+        FlakyEmailBackend.calls += 1
+        if FlakyEmailBackend.calls == FlakyEmailBackend.fail_on_call:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        return super().send_messages(messages)
+
+
+@pytest.mark.django_db
+class TestNewsletter:
+    
+    @pytest.fixture(autouse=True)
+    def newsletter_settings(self, settings):
+        settings.EMAIL_BACKEND = 'apps.notifications.tests.FlakyEmailBackend'
+        settings.NEWSLETTER_CHUNK_SIZE = 3
+        settings.NEWSLETTER_SEND_BATCH_SIZE = 2
+        FlakyEmailBackend.fail_on_call = None
+        FlakyEmailBackend.calls = 0
+    
+    @pytest.fixture
+    def subscribers(self):
+        User.objects.create_user(username='unsubscribed', email='no@example.com', password='testpass123')
+        return [
+            User.objects.create_user(
+                username=f'reader{i}',
+                email=f'reader{i}@example.com',
+                password='testpass123',
+                newsletter_subscribed=True
+            )
+            for i in range(7)
+        ]
+    
+    def test_newsletter_reaches_each_subscriber_once(self, subscribers):
+        """Test the issue is chunked, sent to subscribers only and finished"""
+        from apps.notifications.newsletter import create_issue
+        from apps.notifications.tasks import send_newsletter
+        
+        issue = create_issue('Weekly', 'Hello readers')
+        send_newsletter(issue.id)
+        
+        issue.refresh_from_db()
+        assert issue.chunks.count() == 3
+        assert sorted(m.to[0] for m in mail.outbox) == sorted(u.email for u in subscribers)
+        assert mail.outbox[0].body.startswith('Hello readers')
+        assert issue.sent_count == 7
+        assert issue.finished_at is not None
+    
+    def test_failed_chunk_resumes_from_checkpoint(self, subscribers):
+        """Test a retried chunk doesn't resend batches it already delivered"""
+        from apps.notifications.newsletter import create_issue
+        from apps.notifications.tasks import send_newsletter
+        
+        # Second send of the first chunk fails after its first batch went out
+        FlakyEmailBackend.fail_on_call = 2
+        issue = create_issue('Weekly', 'Hello readers')
+        send_newsletter(issue.id)
+        
+        recipients = [m.to[0] for m in mail.outbox]
+        assert sorted(recipients) == sorted(u.email for u in subscribers)
+        first_chunk = issue.chunks.order_by('first_user_id').first()
+        assert first_chunk.attempts == 2
+        assert first_chunk.sent_count == 3
+
+
+@pytest.mark.django_db
+class TestNotificationRetention:
+    
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(username='keeper', email='keeper@example.com', password='testpass123')
+    
+    def notify(self, user, count, **fields):
+        notifications = [
+            Notification.objects.create(recipient=user, notification_type='system', title='t', message='m')
+            for _ in range(count)
+        ]
+        if fields:
+            Notification.objects.filter(id__in=[n.id for n in notifications]).update(**fields)
+        return [n.id for n in notifications]
+    
+    def test_partitions_are_created_ahead(self, user):
+        """Test monthly partitions are added once and receive their rows"""
+        from django.db import connection
+        from apps.notifications.partitions import add_months, create_partitions, list_partitions
+        
+        legacy_name, _, legacy_bound = list_partitions()[0]
+        assert legacy_name == 'notifications_legacy'
+        
+        created = create_partitions(months_ahead=4, now=legacy_bound)
+        assert created == [f'notifications_y{m.year}m{m.month:02d}' for m in (
+            add_months(legacy_bound, 3), add_months(legacy_bound, 4)
+        )]
+        assert create_partitions(months_ahead=4, now=legacy_bound) == []
+        
+        [notification_id] = self.notify(user, 1, created_at=add_months(legacy_bound, 4))
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT tableoid::regclass::text FROM notifications WHERE id = %s', [notification_id])
+            assert cursor.fetchone()[0] == created[-1]
+        assert Notification.objects.filter(recipient=user).count() == 1
+    
+    def test_partition_takes_over_rows_from_the_default(self, user):
+        """Test creating a partition moves rows the default partition already holds for it"""
+        from django.db import connection
+        from apps.notifications.partitions import DEFAULT_PARTITION, add_months, create_partitions, list_partitions
+        
+        legacy_bound = list_partitions()[0][2]
+        month = add_months(legacy_bound, 5)
+        stranded_ids = self.notify(user, 2, created_at=month)
+        [later_id] = self.notify(user, 1, created_at=add_months(month, 1))
+        
+        assert create_partitions(months_ahead=5, now=legacy_bound)[-1] == f'notifications_y{month.year}m{month.month:02d}'
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT id, tableoid::regclass::text FROM notifications WHERE recipient_id = %s', [user.id])
+            partitions = dict(cursor.fetchall())
+        assert {partitions[i] for i in stranded_ids} == {f'notifications_y{month.year}m{month.month:02d}'}
+        assert partitions[later_id] == DEFAULT_PARTITION
+        
+        # The default is attached again and still catches out-of-range rows
+        [future_id] = self.notify(user, 1, created_at=add_months(month, 2))
+        assert Notification.objects.filter(id=future_id).exists()
+    
+    def test_cleanup_drops_expired_partitions_and_archives(self, user, settings, tmp_path):
+        """Test old partitions are dropped, old read rows deleted, both archived"""
+        import gzip
+        from datetime import timedelta
+        from apps.notifications.partitions import add_months, create_partitions, list_partitions
+        from apps.notifications.retention import purge_old_notifications
+        
+        settings.NOTIFICATION_CLEANUP_BATCH_SIZE = 2
+        settings.NOTIFICATION_CLEANUP_PAUSE = 0
+        settings.NOTIFICATION_UNREAD_RETENTION_DAYS = 90
+        settings.NOTIFICATION_ARCHIVE_DIR = str(tmp_path)
+        
+        legacy_bound = list_partitions()[0][2]
+        create_partitions(months_ahead=4, now=legacy_bound)
+        now = add_months(legacy_bound, 4) + timedelta(days=10)
+        recent = add_months(legacy_bound, 3) + timedelta(days=1)
+        
+        expired_ids = self.notify(user, 3)  # In the legacy partition
+        old_read_ids = self.notify(user, 3, created_at=recent, is_read=True, read_at=now - timedelta(days=31))
+        kept_ids = self.notify(user, 1, created_at=recent, is_read=True, read_at=now)
+        kept_ids += self.notify(user, 1, created_at=recent)
+        
+        assert purge_old_notifications(now) == {'read': 3, 'expired': 3}
+        assert set(Notification.objects.values_list('id', flat=True)) == set(kept_ids)
+        assert 'notifications_legacy' not in [name for name, _, _ in list_partitions()]
+        
+        [archive] = tmp_path.iterdir()
+        with gzip.open(archive, 'rt') as f:
+            archived = [json.loads(line)['id'] for line in f]
+        assert sorted(archived) == sorted(expired_ids + old_read_ids)
+
+    
+    def test_cleanup_expires_old_rows_in_the_legacy_partition(self, user, settings):
+        """Test the age cap reaches rows in partitions that straddle the cutoff"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from apps.notifications.partitions import list_partitions
+        from apps.notifications.retention import purge_old_notifications
+        
+        settings.NOTIFICATION_CLEANUP_PAUSE = 0
+        settings.NOTIFICATION_UNREAD_RETENTION_DAYS = 180
+        now = timezone.now()
+        
+        expired_ids = self.notify(user, 2, created_at=now - timedelta(days=200))
+        kept_ids = self.notify(user, 1, created_at=now - timedelta(days=100))
+        
+        assert purge_old_notifications(now) == {'read': 0, 'expired': 2}
+        assert set(Notification.objects.values_list('id', flat=True)) == set(kept_ids)
+        assert not Notification.objects.filter(id__in=expired_ids).exists()
+        assert list_partitions()[0][0] == 'notifications_legacy'
+    
+    def test_batched_delete_only_steps_over_matching_ids(self, user, settings):
+        """Test the id ranges cover the expired rows, not the whole table"""
+        from datetime import timedelta
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django.utils import timezone
+        from apps.notifications.retention import delete_in_batches
+        
+        now = timezone.now()
+        expired_ids = self.notify(user, 2, created_at=now - timedelta(days=200))
+        self.notify(user, 5, created_at=now - timedelta(days=100))
+        
+        with CaptureQueriesContext(connection) as queries:
+            deleted = delete_in_batches('created_at < %s', [now - timedelta(days=180)], batch_size=1, pause=0)
+        assert deleted == 2
+        assert len([q for q in queries.captured_queries if q['sql'].startswith('DELETE')]) == len(expired_ids)
+
+
+class TestOutbox:
+    
+    def test_overflow_drops_backlog_and_requests_resync(self):
+        """Test a client that falls behind is asked to resync"""
+        from apps.notifications.outbox import Outbox
+        
+        outbox = Outbox(max_size=2, batch_size=10)
+        for i in range(3):
+            outbox.put_notification({'id': i}, f'{i + 1}-0')
+        
+        assert outbox.drain() == [{'type': 'resync_required'}]
+        assert outbox.overflow_count == 1
+        
+        outbox.put_notification({'id': 3}, '4-0')
+        assert outbox.drain() == [{'type': 'notification', 'notification': {'id': 3}, 'event_id': '4-0'}]
+        assert outbox.overflow_count == 0
+
+
+def channel_shard_hosts():
+    """
+    Shards for the channel layer tests. Point CHANNEL_REDIS_TEST_HOSTS at
+    separate Redis instances (docker compose --profile shards up) to test
+    real multi-node fan-out; by default separate databases on the cache
+    Redis stand in for the nodes.
+    """
+    import os
+    from urllib.parse import urlparse
+    from django.conf import settings
+    
+    hosts = os.getenv('CHANNEL_REDIS_TEST_HOSTS')
+    if hosts:
+        return [host.strip() for host in hosts.split(',') if host.strip()]
+    
+    parsed = urlparse(settings.REDIS_URL)
+    return [parsed._replace(path=f'/{db}').geturl() for db in (10, 11, 12)]
+
+
+class TestShardedChannelLayer:
+    
+    def test_adding_a_shard_moves_few_groups(self):
+        """Test consistent hashing only remaps groups onto the new shard"""
+        from DevConnect.channel_layers import HashRing
+        
+        groups = [f'notifications_{i}' for i in range(2000)]
+        three = HashRing(['redis://a', 'redis://b', 'redis://c'])
+        four = HashRing(['redis://a', 'redis://b', 'redis://c', 'redis://d'])
+        
+        moved = [g for g in groups if three.get_index(g) != four.get_index(g)]
+        assert all(four.get_index(g) == 3 for g in moved)
+        assert len(moved) < len(groups) * 0.4
+    
+    def test_group_send_across_shards(self):
+        """Test every group gets its message when groups live on different shards"""
+        from DevConnect.channel_layers import ShardedRedisChannelLayer
+        
+        async def run():
+            layer = ShardedRedisChannelLayer(
+                hosts=channel_shard_hosts(),
+                prefix='test_shards'
+            )
+            groups = [f'live_post_{i}' for i in range(12)]
+            channels = {}
+            try:
+                for group in groups:
+                    channels[group] = await layer.new_channel()
+                    await layer.group_add(group, channels[group])
+                
+                for group in groups:
+                    await layer.group_send(group, {'type': 'topic.update', 'topic': group})
+                
+                received = {
+                    group: (await layer.receive(channels[group]))['topic']
+                    for group in groups
+                }
+                return {layer.consistent_hash(g) for g in groups}, received
+            finally:
+                for group in groups:
+                    if group in channels:
+                        await layer.group_discard(group, channels[group])
+                await layer.flush()
+        
+        shards_used, received = async_to_sync(run)()
+        assert len(shards_used) > 1
+        assert received == {f'live_post_{i}': f'live_post_{i}' for i in range(12)}
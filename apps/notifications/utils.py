@@ -4,19 +4,22 @@
 
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from django.db import transaction
 from .models import Notification
 from .serializers import NotificationSerializer
+from .stream import append_event
 
 
-def send_notification_to_user(user_id, notification):
+def send_notification_to_user(user_id, notification, event_id=None):
     """Send notification to user via WebSocket"""
     try:
         channel_layer = get_channel_layer()
         async_to_sync(channel_layer.group_send)(
-            f"user_{user_id}",
+            f"notifications_{user_id}",
             {
                 "type": "notification_message",
                 "notification": notification,
+                "event_id": event_id,
             }
         )
     except Exception as e:
@@ -66,36 +69,83 @@ def create_notification(recipient, sender=None, notification_type=None, title=No
         data=data,
     )
     
-    # Try to send WebSocket, but don't fail if Redis unavailable
-    try:
-        send_notification_to_user(recipient.id, notification)
-    except Exception as e:
-        print(f"Failed to send WebSocket notification: {e}")
-        pass
+    payload = dict(NotificationSerializer(notification).data)
+    
+    def deliver():
+        # Record in the replay stream, then push to connected sockets
+        event_id = append_event(recipient.id, payload, notification.created_at, notification.id)
+        
+        # Try to send WebSocket, but don't fail if Redis unavailable
+        try:
+            send_notification_to_user(recipient.id, payload, event_id)
+        except Exception as e:
+            print(f"Failed to send WebSocket notification: {e}")
+            pass
+    
+    # A rolled-back notification must not reach the stream or any socket
+    transaction.on_commit(deliver)
     
     return notification
 
 
-def update_unread_count(user_id):
+def mark_notifications_read(user_id, ids=None):
     """
-    Send updated unread count to user
+    Mark a user's notifications as read in a single UPDATE.
+    ids=None marks every unread notification; returns the number updated.
     """
-    from .models import Notification
+    from django.db import connection
+    from django.utils import timezone
     
-    channel_layer = get_channel_layer()
-    group_name = f'notifications_{user_id}'
+    now = timezone.now()
     
-    # Get unread count
-    count = Notification.objects.filter(
+    if ids is None:
+        return Notification.objects.filter(
+            recipient_id=user_id,
+            is_read=False
+        ).update(is_read=True, read_at=now)
+    
+    if not ids:
+        return 0
+    
+    # id = ANY(%s) binds the whole list as one array parameter
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {Notification._meta.db_table} "
+            "SET is_read = TRUE, read_at = %s "
+            "WHERE recipient_id = %s AND is_read = FALSE AND id = ANY(%s)",
+            [now, user_id, list(ids)]
+        )
+        return cursor.rowcount
+
+
+def get_unread_count(user_id):
+    return Notification.objects.filter(
         recipient_id=user_id,
         is_read=False
     ).count()
+
+
+def update_unread_count(user_id, count=None):
+    """
+    Send updated unread count to user
+    """
+    group_name = f'notifications_{user_id}'
+    
+    # Get unread count
+    if count is None:
+        count = get_unread_count(user_id)
     
     # Send to group
-    async_to_sync(channel_layer.group_send)(
-        group_name,
-        {
-            'type': 'unread_count_update',
-            'count': count
-        }
-    )
+    try:
+        channel_layer = get_channel_layer()
+        async_to_sync(channel_layer.group_send)(
+            group_name,
+            {
+                'type': 'unread_count_update',
+                'count': count
+            }
+        )
+    except Exception as e:
+        print(f"WebSocket unread count update failed: {e}")
+    
+    return count
@@ -11,6 +11,7 @@ from django.utils import timezone
 
 from .models import Notification
 from .serializers import NotificationSerializer
+from .utils import mark_notifications_read, update_unread_count
 
 
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
@@ -56,10 +57,29 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         if not notification.is_read:
             notification.is_read = True
             notification.read_at = timezone.now()
-            notification.save()
+            notification.save(update_fields=['is_read', 'read_at'])
         
         return Response({'message': 'Notification marked as read'})
     
+    @action(detail=False, methods=['post'], url_path='mark_read')
+    def bulk_mark_read(self, request):
+        """Mark a list of notifications as read"""
+        ids = request.data.get('ids')
+        
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return Response(
+                {'error': 'ids must be a list of notification IDs'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        updated = mark_notifications_read(request.user.id, ids)
+        unread_count = update_unread_count(request.user.id)
+        
+        return Response({
+            'message': f'{updated} notifications marked as read',
+            'unread_count': unread_count
+        })
+    
     @action(detail=True, methods=['delete'])
     def delete_notification(self, request, pk=None):
         """Delete a notification"""
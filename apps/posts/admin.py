@@ -3,17 +3,47 @@
 # ============================================================================
 
 from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, Q
+from DevConnect.admin_search import RankedSearchMixin
+from DevConnect.pagination import EstimatedCountPaginator
 from .models import Post, Comment, Tag, Like, Bookmark
 
+User = get_user_model()
+
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(RankedSearchMixin, admin.ModelAdmin):
     list_display = ['title', 'author', 'status', 'views_count', 'likes_count', 'published_at']
     list_filter = ['status', 'created_at', 'published_at']
     search_fields = ['title', 'content', 'author__username']
     prepopulated_fields = {'slug': ('title',)}
     date_hierarchy = 'published_at'
     ordering = ['-published_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Match the stored tsvector and author names instead of LIKE scans"""
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        
+        query = SearchQuery(search_term, search_type='websearch')
+        matches = Q(search_vector=query)
+        
+        # A literal id list (not a subquery) lets Postgres OR the two index scans
+        author_ids = list(
+            User.objects.filter(username__icontains=search_term).values_list('id', flat=True)[:100]
+        )
+        if author_ids:
+            matches |= Q(author_id__in=author_ids)
+        
+        queryset = queryset.filter(matches).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        )
+        return queryset, False
 
 
 @admin.register(Comment)
@@ -21,6 +51,8 @@ class CommentAdmin(admin.ModelAdmin):
     list_display = ['author', 'post', 'created_at', 'likes_count']
     list_filter = ['created_at']
     search_fields = ['content', 'author__username']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Tag)
@@ -34,6 +66,8 @@ class TagAdmin(admin.ModelAdmin):
 class LikeAdmin(admin.ModelAdmin):
     list_display = ['user', 'content_type', 'object_id', 'created_at']
     list_filter = ['content_type', 'created_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Bookmark)
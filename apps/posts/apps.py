@@ -8,4 +8,7 @@ from django.apps import AppConfig
 class PostsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.posts'
-    verbose_name = 'Posts'
\ No newline at end of file
+    verbose_name = 'Posts'
+    
+    def ready(self):
+        import apps.posts.signals
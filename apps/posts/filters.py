@@ -4,16 +4,39 @@
 
 import django_filters
 from .models import Post
+from .tags import tag_ids_for_slugs
+
+
+def split_slugs(value):
+    return [slug.strip() for slug in value.split(',') if slug.strip()]
 
 
 class PostFilter(django_filters.FilterSet):
     """Custom filters for posts"""
     author = django_filters.CharFilter(field_name='author__username')
-    tag = django_filters.CharFilter(field_name='tags__slug')
+    # Tag filters test the GIN-indexed tag_ids array instead of joining tags
+    tag = django_filters.CharFilter(method='filter_by_all_tags')
+    tags_all = django_filters.CharFilter(method='filter_by_all_tags')
+    tags_any = django_filters.CharFilter(method='filter_by_any_tag')
     min_likes = django_filters.NumberFilter(field_name='likes_count', lookup_expr='gte')
     date_from = django_filters.DateFilter(field_name='published_at', lookup_expr='gte')
     date_to = django_filters.DateFilter(field_name='published_at', lookup_expr='lte')
     
     class Meta:
         model = Post
-        fields = ['status', 'author', 'tag']
\ No newline at end of file
+        fields = ['status', 'author', 'tag']
+    
+    def filter_by_all_tags(self, queryset, name, value):
+        slugs = split_slugs(value)
+        if not slugs:
+            return queryset
+        tag_ids = tag_ids_for_slugs(slugs)
+        if len(tag_ids) < len(set(slugs)):
+            return queryset.none()  # An unknown tag can't be on any post
+        return queryset.filter(tag_ids__contains=list(tag_ids.values()))
+    
+    def filter_by_any_tag(self, queryset, name, value):
+        slugs = split_slugs(value)
+        if not slugs:
+            return queryset
+        return queryset.filter(tag_ids__overlap=list(tag_ids_for_slugs(slugs).values()))
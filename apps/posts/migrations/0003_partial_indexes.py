@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:25
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('posts', '0002_add_search_vector'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='post',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['-published_at'], name='posts_published_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='post',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['-views_count'], name='posts_published_views_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='post',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['-likes_count'], name='posts_published_likes_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='post',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['-comments_count'], name='posts_published_comments_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='post',
+            name='posts_status_cc3e56_idx',
+        ),
+    ]
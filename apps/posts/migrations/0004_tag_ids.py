@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:44
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.contrib.postgres.expressions import ArraySubquery
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.db.models import OuterRef
+
+BATCH_SIZE = 1000
+
+
+def backfill_tag_ids(apps, schema_editor):
+    # One short UPDATE per id range rather than one rewrite of the whole table
+    Post = apps.get_model('posts', 'Post')
+    tag_ids = ArraySubquery(
+        Post.tags.through.objects
+        .filter(post_id=OuterRef('pk'))
+        .order_by('tag_id')
+        .values('tag_id')
+    )
+    ids = Post.objects.order_by('id').values_list('id', flat=True)
+    first, last = ids.first(), ids.last()
+    if first is None:
+        return
+    for start in range(first, last + 1, BATCH_SIZE):
+        Post.objects.filter(id__gte=start, id__lt=start + BATCH_SIZE).update(tag_ids=tag_ids)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('posts', '0003_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='tag_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, size=None),
+        ),
+        migrations.RunPython(backfill_tag_ids, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='post',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_ids'], name='posts_tag_ids_idx'),
+        ),
+    ]
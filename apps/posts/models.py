@@ -7,7 +7,8 @@
 
 from django.db import models
 from django.contrib.auth import get_user_model
-from django.contrib.postgres.search import SearchVectorField
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.contrib.postgres.indexes import GinIndex
 from django.utils.text import slugify
 import markdown
@@ -34,6 +35,13 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # A renamed tag's old slug has a cached id to forget too
+        instance._saved_slug = instance.__dict__.get('slug')
+        return instance
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
@@ -59,6 +67,8 @@ class Post(models.Model):
     
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='draft')
     tags = models.ManyToManyField(Tag, related_name='posts', blank=True)
+    # Copy of the tag ids kept in sync with `tags` by signals (see tags.py)
+    tag_ids = ArrayField(models.BigIntegerField(), default=list, blank=True)
     
     # Stats
     views_count = models.IntegerField(default=0)
@@ -82,9 +92,30 @@ class Post(models.Model):
         ordering = ['-published_at', '-created_at']
         indexes = [
             models.Index(fields=['slug']),
-            models.Index(fields=['status', '-published_at']),
             models.Index(fields=['author', '-created_at']),
             GinIndex(fields=['search_vector']),
+            GinIndex(fields=['tag_ids'], name='posts_tag_ids_idx'),
+            # Public listings only read published posts, in PostViewSet.ordering_fields order
+            models.Index(
+                fields=['-published_at'],
+                condition=models.Q(status='published'),
+                name='posts_published_idx'
+            ),
+            models.Index(
+                fields=['-views_count'],
+                condition=models.Q(status='published'),
+                name='posts_published_views_idx'
+            ),
+            models.Index(
+                fields=['-likes_count'],
+                condition=models.Q(status='published'),
+                name='posts_published_likes_idx'
+            ),
+            models.Index(
+                fields=['-comments_count'],
+                condition=models.Q(status='published'),
+                name='posts_published_comments_idx'
+            ),
         ]
     
     def __str__(self):
@@ -111,6 +142,13 @@ class Post(models.Model):
             self.excerpt = plain_text[:297] + '...' if len(plain_text) > 300 else plain_text
         
         super().save(*args, **kwargs)
+        
+        # Keep the stored tsvector used by search in step with the text
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'title', 'content'} & set(update_fields):
+            Post.objects.filter(pk=self.pk).update(
+                search_vector=SearchVector('title', weight='A') + SearchVector('content', weight='B')
+            )
     
     @staticmethod
     def render_markdown(text):
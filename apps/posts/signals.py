@@ -0,0 +1,50 @@
+# ============================================================================
+# apps/posts/signals.py
+# ============================================================================
+
+from django.core.cache import cache
+from django.contrib.postgres.fields import ArrayField
+from django.db import models
+from django.db.models import F, Func, Value
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+from .models import Post, Tag
+from .tags import TAG_ID_CACHE_KEY, refresh_tag_ids
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def sync_post_tag_ids(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep Post.tag_ids in step with every write to the tags M2M"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_tag_ids([instance.pk])
+        return
+    
+    # Written from the tag side (tag.posts.add(...)) - pk_set holds post ids
+    if action == 'pre_clear':
+        instance._cleared_post_ids = list(instance.posts.values_list('id', flat=True))
+    elif action == 'post_clear':
+        refresh_tag_ids(getattr(instance, '_cleared_post_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        refresh_tag_ids(pk_set)
+
+
+@receiver(pre_delete, sender=Tag)
+def remove_deleted_tag_ids(sender, instance, **kwargs):
+    """Deleting a tag removes its M2M rows without m2m_changed"""
+    Post.objects.filter(tag_ids__contains=[instance.id]).update(
+        tag_ids=Func(
+            F('tag_ids'), Value(instance.id),
+            function='array_remove',
+            output_field=ArrayField(models.BigIntegerField())
+        )
+    )
+    cache.delete(TAG_ID_CACHE_KEY.format(instance.slug))
+
+
+@receiver(post_save, sender=Tag)
+def forget_cached_tag_id(sender, instance, **kwargs):
+    """Drop the cached slug -> id entries, old and new, so the tag filters read them again"""
+    slugs = {instance.slug, getattr(instance, '_saved_slug', None)} - {None}
+    cache.delete_many([TAG_ID_CACHE_KEY.format(slug) for slug in slugs])
+    instance._saved_slug = instance.slug
@@ -0,0 +1,54 @@
+# ============================================================================
+# apps/posts/tags.py
+# ============================================================================
+
+"""
+Post.tag_ids - the post's tag ids as an integer array.
+
+The tags M2M stays the source of truth; tag_ids is a copy refreshed from
+it by the m2m_changed and Tag delete signals, so tag filters become one
+GIN-indexed containment (@>) or overlap (&&) test on the posts row
+instead of a join that repeats posts and can't express "all of".
+"""
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.core.cache import cache
+from django.db.models import OuterRef
+
+from .models import Post, Tag
+
+TAG_ID_CACHE_KEY = 'tag_id_{}'
+TAG_ID_CACHE_TTL = 3600
+
+
+def refresh_tag_ids(post_ids):
+    """Recompute tag_ids from the M2M rows for the given posts"""
+    post_ids = list(post_ids)
+    if not post_ids:
+        return 0
+    
+    tag_ids = ArraySubquery(
+        Post.tags.through.objects
+        .filter(post_id=OuterRef('pk'))
+        .order_by('tag_id')
+        .values('tag_id')
+    )
+    return Post.objects.filter(id__in=post_ids).update(tag_ids=tag_ids)
+
+
+def tag_ids_for_slugs(slugs):
+    """{slug: id} for the slugs that exist, from cache where possible"""
+    keys = {slug: TAG_ID_CACHE_KEY.format(slug) for slug in set(slugs)}
+    cached = cache.get_many(list(keys.values()))
+    found = {slug: cached[key] for slug, key in keys.items() if key in cached}
+    
+    missing = keys.keys() - found.keys()
+    if missing:
+        fetched = dict(Tag.objects.filter(slug__in=missing).values_list('slug', 'id'))
+        cache.set_many(
+            {TAG_ID_CACHE_KEY.format(slug): tag_id for slug, tag_id in fetched.items()},
+            TAG_ID_CACHE_TTL
+        )
+        found.update(fetched)
+    
+    return found
@@ -5,6 +5,7 @@
 import pytest
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
+from apps.posts.filters import PostFilter
 from apps.posts.models import Post, Comment, Tag, Like, Bookmark
 
 User = get_user_model()
@@ -212,3 +213,199 @@ class TestTagAPI:
         response = api_client.get('/api/posts/tags/')
         assert response.status_code == 200
         assert len(response.data['results']) == 2
+
+
+@pytest.mark.django_db
+class TestPostQueryPlans:
+    
+    @pytest.fixture
+    def posts(self):
+        author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        for i in range(3):
+            Post.objects.create(author=author, title=f'Published {i}', content='c', status='published')
+        Post.objects.create(author=author, title='Draft', content='c', status='draft')
+    
+    @pytest.mark.parametrize('ordering, index', [
+        ('', 'posts_published_idx'),
+        ('-views_count', 'posts_published_views_idx'),
+        ('likes_count', 'posts_published_likes_idx'),
+        ('-comments_count', 'posts_published_comments_idx'),
+    ])
+    def test_list_uses_published_partial_indexes(self, api_client, query_plan, posts, ordering, index):
+        """Test the public post list is served from the published-only indexes"""
+        response, plans = query_plan(
+            lambda: api_client.get('/api/posts/', {'ordering': ordering} if ordering else {}),
+            'posts'
+        )
+        assert response.status_code == 200
+        assert response.data['count'] == 3
+        assert any(index in plan for plan in plans), plans
+
+
+@pytest.mark.django_db
+class TestEstimatedCountPagination:
+    
+    @pytest.fixture
+    def posts(self):
+        from django.db import connection
+        
+        author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        for i in range(3):
+            Post.objects.create(author=author, title=f'Post {i}', content='c', status='published')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE posts')
+        # Rows added after ANALYZE only show up in an exact count
+        Post.objects.create(author=author, title='Late', content='c', status='published')
+    
+    def count_queries(self, paginator):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as queries:
+            count = paginator.count
+        return count, [q['sql'] for q in queries.captured_queries if 'COUNT(' in q['sql']]
+    
+    def test_large_results_use_the_estimate(self, settings, posts):
+        """Test no COUNT(*) runs once the estimate passes the threshold"""
+        from DevConnect.pagination import EstimatedCountPaginator
+        
+        settings.ESTIMATED_COUNT_THRESHOLD = 1
+        count, counts = self.count_queries(EstimatedCountPaginator(Post.objects.order_by('id'), 20))
+        assert count == 3
+        assert counts == []
+        
+        count, counts = self.count_queries(EstimatedCountPaginator(Post.objects.filter(status='published'), 20))
+        assert count >= 1
+        assert counts == []
+    
+    def test_pages_past_an_estimate_are_served_from_their_rows(self, api_client, settings, monkeypatch, posts):
+        """Test an underestimate doesn't hide rows and an overestimate doesn't serve empty pages"""
+        from django.core.paginator import EmptyPage
+        from DevConnect.pagination import EstimatedCountPagination, EstimatedCountPaginator
+        
+        settings.ESTIMATED_COUNT_THRESHOLD = 2
+        monkeypatch.setattr(EstimatedCountPagination, 'page_size', 1)
+        author = User.objects.get(username='author')
+        for i in range(2):
+            Post.objects.create(author=author, title=f'Later {i}', content='c', status='published')
+        
+        first = api_client.get('/api/posts/').data
+        assert first['count_is_estimate'] is True
+        assert first['count'] < 6
+        assert first['next'] is not None
+        
+        last = api_client.get('/api/posts/?page=6').data
+        assert len(last['results']) == 1
+        assert last['next'] is None
+        assert last['count'] == 6
+        assert api_client.get('/api/posts/?page=7').status_code == 404
+        
+        Post.objects.exclude(title='Late').delete()
+        paginator = EstimatedCountPaginator(Post.objects.order_by('id'), 1)
+        assert paginator.count == 3
+        assert not paginator.page(1).has_next()
+        with pytest.raises(EmptyPage):
+            paginator.page(2)
+    
+    def test_small_results_are_counted_exactly(self, api_client, settings, posts):
+        """Test results under the threshold keep an exact count"""
+        settings.ESTIMATED_COUNT_THRESHOLD = 10000
+        response = api_client.get('/api/posts/')
+        assert response.status_code == 200
+        assert response.data['count'] == 4
+
+
+@pytest.mark.django_db
+class TestPostAdminSearch:
+    
+    @pytest.fixture
+    def admin_client(self, client):
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='testpass123')
+        client.force_login(admin)
+        return client
+    
+    def test_search_uses_tsvector_and_ranks_matches(self, admin_client, query_plan):
+        """Test admin search goes through the search_vector index, best match first"""
+        author = User.objects.create_user(username='writer', email='writer@example.com', password='testpass123')
+        body_match = Post.objects.create(author=author, title='Notes', content='Some postgres tuning tips')
+        title_match = Post.objects.create(author=author, title='Postgres indexing', content='All about postgres')
+        Post.objects.create(author=author, title='Unrelated', content='Nothing here')
+        
+        response, plans = query_plan(
+            lambda: admin_client.get('/admin/posts/post/', {'q': 'postgres'}, HTTP_HOST='localhost'),
+            'posts'
+        )
+        assert response.status_code == 200
+        assert list(response.context['cl'].result_list) == [title_match, body_match]
+        assert any('posts_search__7ce7e8_gin' in plan for plan in plans), plans
+
+
+@pytest.mark.django_db
+class TestPostTagIds:
+    
+    @pytest.fixture
+    def tags(self):
+        return {name: Tag.objects.create(name=name) for name in ('python', 'django', 'rust')}
+    
+    @pytest.fixture
+    def posts(self, tags):
+        author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        both = Post.objects.create(author=author, title='Both', content='c', status='published')
+        both.tags.set([tags['python'], tags['django']])
+        python = Post.objects.create(author=author, title='Python', content='c', status='published')
+        python.tags.add(tags['python'])
+        rust = Post.objects.create(author=author, title='Rust', content='c', status='published')
+        tags['rust'].posts.add(rust)
+        return both, python, rust
+    
+    def ids(self, response):
+        return {item['id'] for item in response.data['results']}
+    
+    def test_tag_ids_follow_m2m_writes(self, tags, posts):
+        """Test tag_ids tracks adds, removes, clears from either side and tag deletes"""
+        both, python, rust = posts
+        python_id, django_id, rust_id = (tags[name].id for name in ('python', 'django', 'rust'))
+        
+        both.refresh_from_db()
+        rust.refresh_from_db()
+        assert both.tag_ids == sorted([python_id, django_id])
+        assert rust.tag_ids == [rust_id]
+        
+        both.tags.remove(tags['django'])
+        tags['rust'].posts.add(python)
+        tags['python'].posts.clear()
+        for post in posts:
+            post.refresh_from_db()
+        assert (both.tag_ids, python.tag_ids, rust.tag_ids) == ([], [rust_id], [rust_id])
+        
+        tags['rust'].delete()
+        python.refresh_from_db()
+        assert python.tag_ids == []
+    
+    def test_renamed_tag_forgets_its_old_slug(self, tags):
+        """Test a slug rename drops the cached id for the old slug as well as the new one"""
+        from apps.posts.tags import tag_ids_for_slugs
+        
+        tag = Tag.objects.get(slug='python')
+        assert tag_ids_for_slugs(['python']) == {'python': tag.id}
+        
+        tag.slug = 'python3'
+        tag.save()
+        assert tag_ids_for_slugs(['python', 'python3']) == {'python3': tag.id}
+    
+    def test_all_and_any_filters(self, api_client, posts, query_plan, django_assert_num_queries):
+        """Test tags_all / tags_any use array operators on the GIN index with cached slug ids"""
+        both, python, rust = posts
+        
+        assert self.ids(api_client.get('/api/posts/', {'tags_all': 'python,django'})) == {both.id}
+        assert self.ids(api_client.get('/api/posts/', {'tags_any': 'django, rust'})) == {both.id, rust.id}
+        assert self.ids(api_client.get('/api/posts/', {'tag': 'python'})) == {both.id, python.id}
+        assert self.ids(api_client.get('/api/posts/', {'tags_all': 'python,unknown'})) == set()
+        
+        # Slugs resolved above come from the cache
+        with django_assert_num_queries(1):
+            assert list(PostFilter({'tags_all': 'python,django'}, Post.objects.all()).qs) == [both]
+        
+        for params in ({'tags_all': 'python,django'}, {'tags_any': 'django,rust'}):
+            _, plans = query_plan(lambda: list(PostFilter(params, Post.objects.all()).qs), 'posts')
+            assert any('posts_tag_ids_idx' in plan for plan in plans), plans
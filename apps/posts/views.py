@@ -20,6 +20,7 @@ from .serializers import (
 )
 from .permissions import IsAuthorOrReadOnly
 from .filters import PostFilter
+from apps.notifications.live import publish_delta
 
 logger = logging.getLogger(__name__)
 
@@ -81,6 +82,7 @@ class PostViewSet(viewsets.ModelViewSet):
                 instance.save(update_fields=['views_count'])
                 instance.refresh_from_db()
                 cache.set(cache_key, True, 300)  # 5 minutes
+                publish_delta('post', instance.id, 'views_count')
         except Exception as e:
             logger.warning(f"Cache error in view count: {e}")
         
@@ -118,6 +120,7 @@ class PostViewSet(viewsets.ModelViewSet):
             post.likes_count = F('likes_count') + 1
             post.save(update_fields=['likes_count'])
             post.refresh_from_db()
+            publish_delta('post', post.id, 'likes_count')
             
             # Give author reputation points
             try:
@@ -151,6 +154,7 @@ class PostViewSet(viewsets.ModelViewSet):
             post.likes_count = F('likes_count') - 1
             post.save(update_fields=['likes_count'])
             post.refresh_from_db()
+            publish_delta('post', post.id, 'likes_count', -1)
             
             # Remove reputation points from author
             try:
@@ -182,6 +186,7 @@ class PostViewSet(viewsets.ModelViewSet):
             post.bookmarks_count = F('bookmarks_count') + 1
             post.save(update_fields=['bookmarks_count'])
             post.refresh_from_db()
+            publish_delta('post', post.id, 'bookmarks_count')
             
             return Response(
                 {'message': 'Post bookmarked', 'bookmarks_count': post.bookmarks_count},
@@ -205,6 +210,7 @@ class PostViewSet(viewsets.ModelViewSet):
             post.bookmarks_count = F('bookmarks_count') - 1
             post.save(update_fields=['bookmarks_count'])
             post.refresh_from_db()
+            publish_delta('post', post.id, 'bookmarks_count', -1)
             
             return Response(
                 {'message': 'Bookmark removed', 'bookmarks_count': post.bookmarks_count},
@@ -288,6 +294,7 @@ class CommentViewSet(viewsets.ModelViewSet):
         post = comment.post
         post.comments_count = F('comments_count') + 1
         post.save(update_fields=['comments_count'])
+        publish_delta('post', post.id, 'comments_count')
         
         # Give author reputation points
         try:
@@ -300,6 +307,7 @@ class CommentViewSet(viewsets.ModelViewSet):
         post = instance.post
         post.comments_count = F('comments_count') - 1
         post.save(update_fields=['comments_count'])
+        publish_delta('post', post.id, 'comments_count', -1)
         
         instance.delete()
     
@@ -3,17 +3,51 @@
 # ============================================================================
 
 from django.contrib import admin
-from .models import Snippet, Language, SnippetComment, SnippetLike
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q
+from DevConnect.admin_search import RankedSearchMixin
+from DevConnect.pagination import EstimatedCountPaginator
+from .models import CodeBlob, Snippet, Language, SnippetComment, SnippetLike
+
+User = get_user_model()
 
 
 @admin.register(Snippet)
-class SnippetAdmin(admin.ModelAdmin):
+class SnippetAdmin(RankedSearchMixin, admin.ModelAdmin):
     list_display = ['title', 'author', 'language', 'visibility', 'views_count', 'likes_count', 'created_at']
     list_filter = ['visibility', 'language', 'created_at']
-    search_fields = ['title', 'description', 'code', 'author__username']
+    search_fields = ['title', 'description', 'code_blob__content', 'author__username']
     prepopulated_fields = {'slug': ('title',)}
     date_hierarchy = 'created_at'
     ordering = ['-created_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Substring search served by the trigram indexes, ranked by title similarity"""
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        
+        matches = Q(title__icontains=search_term) | Q(description__icontains=search_term)
+        
+        # Literal id lists (not subqueries) let Postgres OR the index scans
+        author_ids = list(
+            User.objects.filter(username__icontains=search_term).values_list('id', flat=True)[:100]
+        )
+        if author_ids:
+            matches |= Q(author_id__in=author_ids)
+        blob_ids = list(
+            CodeBlob.objects.filter(content__icontains=search_term).values_list('digest', flat=True)[:1000]
+        )
+        if blob_ids:
+            matches |= Q(code_blob_id__in=blob_ids)
+        
+        queryset = queryset.filter(matches).annotate(
+            search_rank=TrigramWordSimilarity(search_term, 'title')
+        )
+        return queryset, False
 
 
 @admin.register(Language)
@@ -0,0 +1,99 @@
+# ============================================================================
+# apps/snippets/blobs.py
+# ============================================================================
+
+"""
+Content-addressed storage for snippet code.
+
+Each distinct body of code is stored once in code_blobs, keyed by the hex
+SHA-256 of its UTF-8 bytes, with a count of the snippets pointing at it.
+Unchanged forks share their original's blob, and two snippets have the
+same code exactly when their code_blob_id values are equal.
+
+Snippet.save() takes a reference on the blob it points at and releases
+the one it pointed at before; deleting a snippet releases its reference,
+and a blob is deleted when its last reference goes.
+
+Blobs of at least CODE_BLOB_COMPRESS_THRESHOLD bytes are stored zstd
+compressed when the optional zstandard package is installed (0 turns
+compression off). Compressed blobs have no searchable content column, so
+substring and regex search skip them; text search still finds them.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+try:
+    import zstandard
+except ImportError:  # Optional - blobs are stored uncompressed without it
+    zstandard = None
+
+
+def blob_digest(code):
+    return hashlib.sha256(code.encode()).hexdigest()
+
+
+def encode_blob(code):
+    """(content, data) columns for code: plain text, or zstd bytes when large"""
+    raw = code.encode()
+    threshold = settings.CODE_BLOB_COMPRESS_THRESHOLD
+    if zstandard is not None and threshold and len(raw) >= threshold:
+        compressor = zstandard.ZstdCompressor(level=settings.CODE_BLOB_COMPRESS_LEVEL)
+        return '', compressor.compress(raw)
+    return code, None
+
+
+def decode_blob(content, data):
+    if data is None:
+        return content
+    if zstandard is None:
+        raise RuntimeError('zstandard is required to read compressed code blobs')
+    return zstandard.ZstdDecompressor().decompress(bytes(data)).decode()
+
+
+def acquire_blob(code):
+    """Store code if it's new, take a reference on it, and return its digest"""
+    from .models import CodeBlob
+    
+    digest = blob_digest(code)
+    content, data = encode_blob(code)
+    table = connection.ops.quote_name(CodeBlob._meta.db_table)
+    
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (digest, content, data, size, refcount, created_at)
+            VALUES (%s, %s, %s, %s, 1, %s)
+            ON CONFLICT (digest) DO UPDATE SET refcount = {table}.refcount + 1
+            """,
+            [digest, content, data, len(code.encode()), timezone.now()]
+        )
+    return digest
+
+
+def retain_blob(digest):
+    """Take another reference on an existing blob"""
+    from .models import CodeBlob
+    
+    CodeBlob.objects.filter(digest=digest).update(refcount=F('refcount') + 1)
+
+
+def release_blobs(counts):
+    """Drop references ({digest: count}) and delete blobs nobody uses"""
+    from .models import CodeBlob, Snippet
+    
+    counts = {digest: count for digest, count in counts.items() if digest and count}
+    if not counts:
+        return
+    
+    with transaction.atomic():
+        for digest, count in counts.items():
+            CodeBlob.objects.filter(digest=digest).update(refcount=F('refcount') - count)
+        # The reference check guards against a count that has drifted
+        CodeBlob.objects.filter(digest__in=counts, refcount__lte=0).exclude(
+            Exists(Snippet.objects.filter(code_blob=OuterRef('pk')))
+        ).delete()
@@ -0,0 +1,62 @@
+# ============================================================================
+# apps/snippets/comments.py
+# ============================================================================
+
+"""
+Line-anchored snippet comments.
+
+Snippet detail responses carry only how many comments each line has;
+the comments themselves are loaded per line range. Both reads are single
+queries served by the (snippet, line_number, created_at) index - the
+counts as an index-ordered GROUP BY, and a range as one scan that numbers
+each line's comments with window functions so only the first few per
+line are returned alongside that line's total.
+"""
+
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from .models import SnippetComment
+
+
+def line_comment_counts(snippet_id):
+    """{'total', 'general', 'lines': {line: count}}; general comments have no line"""
+    counts = {'total': 0, 'general': 0, 'lines': {}}
+    rows = (
+        SnippetComment.objects
+        .filter(snippet_id=snippet_id)
+        .order_by('line_number')
+        .values('line_number')
+        .annotate(count=Count('id'))
+        .values_list('line_number', 'count')
+    )
+    for line_number, count in rows:
+        counts['total'] += count
+        if line_number is None:
+            counts['general'] = count
+        else:
+            counts['lines'][line_number] = count
+    return counts
+
+
+def comments_by_line(snippet_id, start, end, per_line):
+    """
+    {line: (count, [comments])} for lines start..end, with each line's
+    oldest `per_line` comments and its full count
+    """
+    comments = (
+        SnippetComment.objects
+        .filter(snippet_id=snippet_id, line_number__gte=start, line_number__lte=end)
+        .select_related('author')
+        .annotate(
+            line_count=Window(Count('id'), partition_by=[F('line_number')]),
+            position=Window(RowNumber(), partition_by=[F('line_number')], order_by=[F('created_at'), F('id')]),
+        )
+        .filter(position__lte=per_line)
+        .order_by('line_number', 'created_at', 'id')
+    )
+    
+    lines = {}
+    for comment in comments:
+        lines.setdefault(comment.line_number, (comment.line_count, []))[1].append(comment)
+    return lines
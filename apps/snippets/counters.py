@@ -0,0 +1,116 @@
+# ============================================================================
+# apps/snippets/counters.py
+# ============================================================================
+
+"""
+Language.snippets_count - the number of public snippets in each language.
+
+Snippet signals record a +1/-1 for the languages a snippet enters or
+leaves: on create and delete, when its language changes, and when it
+becomes public or stops being public. Within a transaction the deltas are
+summed per language and applied once it commits, as one F() update per
+language however many savepoints recorded them, so a rolled back
+transaction or savepoint changes nothing and deleting a user's snippets
+touches each language row once.
+
+recount_languages() rebuilds every count from the snippets table, for
+counts that have drifted (for example after a queryset .update() that
+skipped the signals).
+"""
+
+import threading
+import weakref
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Language, Snippet
+
+_local = threading.local()
+
+
+def counted_language(language_id, visibility):
+    """The language a snippet in this state counts towards, if any"""
+    return language_id if language_id and visibility == 'public' else None
+
+
+def apply_deltas(deltas):
+    for language_id, delta in deltas.items():
+        if delta:
+            Language.objects.filter(id=language_id).update(snippets_count=F('snippets_count') + delta)
+
+
+class PendingDeltas:
+    """
+    Deltas recorded in one savepoint (or the outermost atomic block) of
+    the current transaction. Its flush callback, registered inside that
+    savepoint, is the only strong reference to it, so when the savepoint
+    rolls back Django drops the callback and the batch leaves _batches().
+    The first flush of a commit applies every batch still there, summed
+    per language; the rest find nothing left to do.
+    """
+    
+    def __init__(self):
+        self.deltas = {}
+    
+    def add(self, language_id, delta):
+        self.deltas[language_id] = self.deltas.get(language_id, 0) + delta
+    
+    def flush(self):
+        batches = _batches()
+        survivors = list(batches.values())
+        batches.clear()
+        
+        totals = {}
+        for batch in survivors:
+            for language_id, delta in batch.deltas.items():
+                totals[language_id] = totals.get(language_id, 0) + delta
+        apply_deltas(totals)
+
+
+def _batches():
+    """This thread's pending batches by savepoint id (None outside any savepoint)"""
+    if not hasattr(_local, 'batches'):
+        _local.batches = weakref.WeakValueDictionary()
+    return _local.batches
+
+
+def _pending():
+    connection = transaction.get_connection()
+    savepoint = connection.savepoint_ids[-1] if connection.savepoint_ids else None
+    batches = _batches()
+    batch = batches.get(savepoint)
+    if batch is None:
+        batch = batches[savepoint] = PendingDeltas()
+        transaction.on_commit(batch.flush)
+    return batch
+
+
+def record_snippet_change(old_state, new_state):
+    """Record a snippet moving from one (language_id, visibility) to another"""
+    old_language, new_language = counted_language(*old_state), counted_language(*new_state)
+    if old_language == new_language:
+        return
+    
+    changes = {language_id: delta for language_id, delta in ((old_language, -1), (new_language, 1)) if language_id}
+    if not transaction.get_connection().in_atomic_block:
+        apply_deltas(changes)  # Autocommit - nothing to wait for
+        return
+    
+    pending = _pending()
+    for language_id, delta in changes.items():
+        pending.add(language_id, delta)
+
+
+def recount_languages():
+    """Recompute every Language.snippets_count from scratch"""
+    public_count = (
+        Snippet.objects
+        .filter(language=OuterRef('pk'), visibility='public')
+        .order_by()
+        .values('language')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    return Language.objects.update(snippets_count=Coalesce(Subquery(public_count), Value(0)))
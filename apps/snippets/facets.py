@@ -0,0 +1,82 @@
+# ============================================================================
+# apps/snippets/facets.py
+# ============================================================================
+
+"""
+Tag and language counts for a filtered snippet list.
+
+Both facets and the total come from one query over the filtered rows. The
+result is cached under a hash of the filtered query's SQL and parameters,
+so requests that filter the same way share an entry (a signed-in user's
+own private snippets show up as a parameter, so they never leak).
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .models import Language
+
+FACETS_SQL = """
+    WITH filtered AS ({filtered})
+    (
+        SELECT 'tag' AS facet, tag AS value, NULL AS name, COUNT(*) AS count
+        FROM filtered,
+             jsonb_array_elements_text(
+                 CASE WHEN jsonb_typeof(filtered.tags) = 'array' THEN filtered.tags ELSE '[]' END
+             ) AS tag
+        GROUP BY tag
+        ORDER BY count DESC, tag
+        LIMIT %s
+    )
+    UNION ALL
+    (
+        SELECT 'language', language.slug, language.name, COUNT(*)
+        FROM filtered
+        JOIN {languages} language ON language.id = filtered.language_id
+        GROUP BY language.slug, language.name
+        ORDER BY 4 DESC, 2
+    )
+    UNION ALL
+    SELECT 'total', NULL, NULL, COUNT(*) FROM filtered
+"""
+
+
+def facets_cache_key(sql, params):
+    # Parameters are interpolated first; some (JSON adapters) have no stable repr
+    signature = connection.ops.compose_sql(sql, params)
+    if isinstance(signature, bytes):
+        signature = signature.decode()
+    return f'snippet_facets_{hashlib.md5(signature.encode()).hexdigest()}'
+
+
+def snippet_facets(queryset):
+    """{'total', 'tags': [{tag, count}], 'languages': [{slug, name, count}]} for a queryset"""
+    sql, params = queryset.order_by().values('tags', 'language_id').query.sql_with_params()
+    
+    cache_key = facets_cache_key(sql, params)
+    facets = cache.get(cache_key)
+    if facets is not None:
+        return facets
+    
+    facets = {'total': 0, 'tags': [], 'languages': []}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            FACETS_SQL.format(
+                filtered=sql,
+                languages=connection.ops.quote_name(Language._meta.db_table)
+            ),
+            [*params, settings.SNIPPET_FACETS_TAG_LIMIT]
+        )
+        for facet, value, name, count in cursor.fetchall():
+            if facet == 'tag':
+                facets['tags'].append({'tag': value, 'count': count})
+            elif facet == 'language':
+                facets['languages'].append({'slug': value, 'name': name, 'count': count})
+            else:
+                facets['total'] = count
+    
+    cache.set(cache_key, facets, settings.SNIPPET_FACETS_CACHE_TTL)
+    return facets
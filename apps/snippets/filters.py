@@ -3,14 +3,22 @@
 # ============================================================================
 
 import django_filters
+from django.db.models import Q
 from .models import Snippet
 
 
+def split_tags(value):
+    return [tag.strip() for tag in value.split(',') if tag.strip()]
+
+
 class SnippetFilter(django_filters.FilterSet):
     """Custom filters for snippets"""
     author = django_filters.CharFilter(field_name='author__username')
     language = django_filters.CharFilter(field_name='language__slug')
     tag = django_filters.CharFilter(method='filter_by_tag')
+    # Comma-separated; both are served by the jsonb_path_ops GIN index on tags
+    tags_all = django_filters.CharFilter(method='filter_by_all_tags')
+    tags_any = django_filters.CharFilter(method='filter_by_any_tag')
     min_likes = django_filters.NumberFilter(field_name='likes_count', lookup_expr='gte')
     
     class Meta:
@@ -18,4 +26,20 @@ class SnippetFilter(django_filters.FilterSet):
         fields = ['visibility', 'author', 'language']
     
     def filter_by_tag(self, queryset, name, value):
-        return queryset.filter(tags__contains=[value])
\ No newline at end of file
+        return queryset.filter(tags__contains=[value])
+    
+    def filter_by_all_tags(self, queryset, name, value):
+        tags = split_tags(value)
+        if not tags:
+            return queryset
+        return queryset.filter(tags__contains=tags)
+    
+    def filter_by_any_tag(self, queryset, name, value):
+        tags = split_tags(value)
+        if not tags:
+            return queryset
+        # One @> per tag, so the planner can OR together index bitmaps
+        condition = Q()
+        for tag in tags:
+            condition |= Q(tags__contains=[tag])
+        return queryset.filter(condition)
@@ -0,0 +1,124 @@
+# ============================================================================
+# apps/snippets/highlighting.py
+# ============================================================================
+
+"""
+Server-side syntax highlighting with Pygments.
+
+Code is rendered either to HTML (spans with Pygments' short CSS classes)
+or to a token stream - one list per line of [css class, text] pairs - and
+cached under (code hash, language, style, output). Keying on the hash
+means forks and other copies of the same code share one entry. New and
+edited snippets are highlighted by the highlight_snippet task when they
+are saved, so views normally only read the cache.
+"""
+
+import hashlib
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from pygments import highlight as pygments_highlight, lex
+from pygments.formatters import HtmlFormatter
+from pygments.lexers import get_lexer_by_name, get_lexer_for_filename
+from pygments.lexers.special import TextLexer
+from pygments.styles import get_all_styles
+from pygments.token import STANDARD_TYPES
+from pygments.util import ClassNotFound
+
+OUTPUTS = ('html', 'tokens')
+
+CACHE_KEY = 'highlight_{digest}_{language}_{style}_{output}'
+
+
+def code_hash(code):
+    return hashlib.sha256(code.encode()).hexdigest()
+
+
+def get_lexer(language):
+    """Lexer for a Language, by slug then by file extension, else plain text"""
+    if language is not None:
+        try:
+            return get_lexer_by_name(language.slug, stripnl=False)
+        except ClassNotFound:
+            pass
+        try:
+            return get_lexer_for_filename(f'snippet{language.extension}', stripnl=False)
+        except ClassNotFound:
+            pass
+    return TextLexer(stripnl=False)
+
+
+@lru_cache(maxsize=None)
+def style_css(style):
+    """CSS for a style's token classes, scoped to .highlight"""
+    return HtmlFormatter(style=style).get_style_defs('.highlight')
+
+
+def _token_class(ttype):
+    # Subtypes without a short class of their own use their parent's
+    while ttype not in STANDARD_TYPES:
+        ttype = ttype.parent
+    return STANDARD_TYPES[ttype]
+
+
+def render_tokens(code, lexer):
+    """[[[css class, text], ...] per line], merging runs of the same class"""
+    lines = [[]]
+    for ttype, value in lex(code, lexer):
+        css_class = _token_class(ttype)
+        for i, part in enumerate(value.split('\n')):
+            if i:
+                lines.append([])
+            if not part:
+                continue
+            line = lines[-1]
+            if line and line[-1][0] == css_class:
+                line[-1][1] += part
+            else:
+                line.append([css_class, part])
+    
+    # Lexers end the stream with a newline; don't report a phantom last line
+    if not lines[-1] and len(lines) > 1:
+        lines.pop()
+    return lines
+
+
+def render(code, language, style, output):
+    lexer = get_lexer(language)
+    if output == 'html':
+        return pygments_highlight(code, lexer, HtmlFormatter(style=style, cssclass='highlight'))
+    return render_tokens(code, lexer)
+
+
+def highlight(code, language, style=None, output='html'):
+    """
+    Highlighted code, from cache when it has been rendered before.
+    Raises ValueError for an unknown style or output.
+    """
+    style = style or settings.SNIPPET_HIGHLIGHT_STYLE
+    if output not in OUTPUTS:
+        raise ValueError(f"Unknown output '{output}', expected one of: {', '.join(OUTPUTS)}")
+    if style not in set(get_all_styles()):
+        raise ValueError(f"Unknown highlighting style '{style}'")
+    
+    digest = code_hash(code)
+    cache_key = CACHE_KEY.format(
+        digest=digest,
+        language=language.slug if language is not None else 'text',
+        style=style,
+        output=output
+    )
+    
+    result = cache.get(cache_key)
+    if result is None:
+        result = {
+            'code_hash': digest,
+            'language': language.slug if language is not None else None,
+            'style': style,
+            'output': output,
+            output: render(code, language, style, output),
+        }
+        cache.set(cache_key, result, settings.SNIPPET_HIGHLIGHT_CACHE_TTL)
+    
+    return result
@@ -0,0 +1,180 @@
+# ============================================================================
+# apps/snippets/lineage.py
+# ============================================================================
+
+"""
+Fork lineage - the chain of snippets a fork descends from, and the tree of
+forks below a snippet.
+
+Both walk Snippet.forked_from with a single recursive CTE. Ancestors are
+capped at SNIPPET_FORK_TREE_MAX_DEPTH steps; trees are also capped at that
+depth and at SNIPPET_FORK_TREE_MAX_WIDTH children per snippet (the most
+forked first), so one viral snippet can't make a request unbounded.
+
+The whole tree under each root is cached and shared by every snippet in
+it; signals drop the entry when a fork is created, renamed, hidden or
+deleted. Private snippets are filtered out per viewer when serving, along
+with the forks below them.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+
+from .models import Snippet
+
+User = get_user_model()
+
+FORK_TREE_CACHE_KEY = 'snippet_fork_tree_{}'
+
+NODE_COLUMNS = ['id', 'parent_id', 'depth', 'title', 'slug', 'visibility', 'author_id', 'author', 'forks_count']
+
+# Walks up forked_from; depth counts steps from the starting snippet
+ANCESTORS_SQL = """
+    WITH RECURSIVE chain AS (
+        SELECT id, forked_from_id, 0 AS depth
+        FROM {snippets}
+        WHERE id = %s
+        UNION ALL
+        SELECT parent.id, parent.forked_from_id, chain.depth + 1
+        FROM {snippets} parent
+        JOIN chain ON parent.id = chain.forked_from_id
+        WHERE chain.depth < %s
+    )
+    SELECT chain.id, chain.forked_from_id, chain.depth, snippet.title, snippet.slug,
+           snippet.visibility, snippet.author_id, author.username, snippet.forks_count
+    FROM chain
+    JOIN {snippets} snippet ON snippet.id = chain.id
+    JOIN {users} author ON author.id = snippet.author_id
+    ORDER BY chain.depth DESC
+"""
+
+# Walks down forked_from, keeping the most forked children of each snippet
+TREE_SQL = """
+    WITH RECURSIVE tree AS (
+        SELECT id, forked_from_id, 0 AS depth
+        FROM {snippets}
+        WHERE id = %s
+        UNION ALL
+        SELECT children.id, children.forked_from_id, children.depth
+        FROM (
+            SELECT child.id, child.forked_from_id, tree.depth + 1 AS depth,
+                   row_number() OVER (
+                       PARTITION BY child.forked_from_id ORDER BY child.forks_count DESC, child.id
+                   ) AS position
+            FROM {snippets} child
+            JOIN tree ON child.forked_from_id = tree.id
+            WHERE tree.depth < %s
+        ) children
+        WHERE children.position <= %s
+    )
+    SELECT tree.id, tree.forked_from_id, tree.depth, snippet.title, snippet.slug,
+           snippet.visibility, snippet.author_id, author.username, snippet.forks_count
+    FROM tree
+    JOIN {snippets} snippet ON snippet.id = tree.id
+    JOIN {users} author ON author.id = snippet.author_id
+    ORDER BY tree.depth, snippet.forks_count DESC, tree.id
+"""
+
+
+def _format(sql):
+    return sql.format(
+        snippets=connection.ops.quote_name(Snippet._meta.db_table),
+        users=connection.ops.quote_name(User._meta.db_table)
+    )
+
+
+def _fetch_nodes(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(_format(sql), params)
+        return [dict(zip(NODE_COLUMNS, row)) for row in cursor.fetchall()]
+
+
+def ancestors(snippet_id):
+    """The snippet and what it was forked from, root first, as node dicts"""
+    return _fetch_nodes(ANCESTORS_SQL, [snippet_id, settings.SNIPPET_FORK_TREE_MAX_DEPTH])
+
+
+def root_id(snippet_id):
+    """Id of the snippet at the top of snippet_id's fork chain"""
+    chain = ancestors(snippet_id)
+    return chain[0]['id'] if chain else snippet_id
+
+
+def tree_nodes(snippet_id):
+    """Every node under a snippet (breadth first, itself included)"""
+    return _fetch_nodes(TREE_SQL, [
+        snippet_id, settings.SNIPPET_FORK_TREE_MAX_DEPTH, settings.SNIPPET_FORK_TREE_MAX_WIDTH
+    ])
+
+
+def fork_tree_nodes(root):
+    """tree_nodes() for a root snippet, cached"""
+    cache_key = FORK_TREE_CACHE_KEY.format(root)
+    nodes = cache.get(cache_key)
+    if nodes is None:
+        nodes = tree_nodes(root)
+        cache.set(cache_key, nodes, settings.SNIPPET_FORK_TREE_CACHE_TTL)
+    return nodes
+
+
+def invalidate_fork_tree(snippet_id):
+    cache.delete(FORK_TREE_CACHE_KEY.format(root_id(snippet_id)))
+
+
+def can_view(node, user):
+    return node['visibility'] != 'private' or (user.is_authenticated and node['author_id'] == user.id)
+
+
+def public_node(node):
+    return {
+        'id': node['id'],
+        'title': node['title'],
+        'slug': node['slug'],
+        'author': node['author'],
+        'forks_count': node['forks_count'],
+    }
+
+
+def lineage(snippet, user):
+    """{'root', 'parent', 'depth', 'ancestors'} for a snippet, in at most one query"""
+    if snippet.forked_from_id is None:
+        return {'root': None, 'parent': None, 'depth': 0, 'ancestors': []}
+    
+    chain = ancestors(snippet.id)[:-1]  # Drop the snippet itself
+    if not chain:  # The original was deleted after loading the snippet
+        return {'root': None, 'parent': None, 'depth': 0, 'ancestors': []}
+    
+    root, parent = chain[0], chain[-1]
+    return {
+        # A chain cut off by the depth limit doesn't reach its root
+        'root': public_node(root) if root['parent_id'] is None and can_view(root, user) else None,
+        'parent': public_node(parent) if can_view(parent, user) else None,
+        'depth': len(chain),
+        'ancestors': [public_node(node) for node in chain if can_view(node, user)],
+    }
+
+
+def fork_tree(snippet, user, max_depth=None):
+    """The nested tree of forks below a snippet, as the user may see it"""
+    nodes = fork_tree_nodes(root_id(snippet.id) if snippet.forked_from_id else snippet.id)
+    if not any(node['id'] == snippet.id for node in nodes):
+        # Cut off the root's cached tree by the depth or width limit
+        nodes = tree_nodes(snippet.id)
+    
+    children = {}
+    for node in nodes:
+        children.setdefault(node['parent_id'], []).append(node)
+    
+    def build(node, depth):
+        result = public_node(node)
+        result['children'] = [
+            build(child, depth + 1)
+            for child in children.get(node['id'], [])
+            if can_view(child, user) and (max_depth is None or depth < max_depth)
+        ]
+        return result
+    
+    start = next(node for node in nodes if node['id'] == snippet.id)
+    return build(start, 0)
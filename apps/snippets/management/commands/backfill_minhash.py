@@ -0,0 +1,72 @@
+# ============================================================================
+# apps/snippets/management/commands/backfill_minhash.py
+# ============================================================================
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from apps.snippets.blobs import decode_blob
+from apps.snippets.duplicates import signature_batch
+from apps.snippets.models import Snippet
+
+
+class Command(BaseCommand):
+    help = (
+        'Compute near-duplicate signatures (MinHash + LSH buckets) for snippets '
+        'that have none, hashing batches in parallel worker processes.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Snippets per worker task')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+        parser.add_argument('--all', action='store_true', help='Recompute every signature, not just missing ones')
+    
+    def batches(self, batch_size, recompute):
+        """[(id, code)] lists in id order, read one batch at a time"""
+        snippets = Snippet.objects.filter(code_blob__isnull=False).order_by('id')
+        if not recompute:
+            snippets = snippets.filter(minhash__isnull=True)
+        
+        last_id = 0
+        while True:
+            rows = list(
+                snippets.filter(id__gt=last_id)
+                .values_list('id', 'code_blob__content', 'code_blob__data')[:batch_size]
+            )
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [(snippet_id, decode_blob(content, data)) for snippet_id, content, data in rows]
+    
+    def save(self, results):
+        snippets = [
+            Snippet(id=snippet_id, minhash=minhash, lsh_buckets=buckets)
+            for snippet_id, minhash, buckets in results
+        ]
+        Snippet.objects.bulk_update(snippets, ['minhash', 'lsh_buckets'])
+        return len(results)
+    
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        done = 0
+        batches = self.batches(options['batch_size'], options['all'])
+        
+        # The database is read and written here; workers only hash
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            running = set()
+            for batch in batches:
+                running.add(executor.submit(signature_batch, batch))
+                if len(running) >= options['workers'] * 2:
+                    finished, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        done += self.save(future.result())
+                    self.stdout.write(f'Signed {done} snippets')
+            
+            for future in running:
+                done += self.save(future.result())
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Signed {done} snippets in {time.monotonic() - started:.1f}s')
+        )
@@ -0,0 +1,196 @@
+# ============================================================================
+# apps/snippets/management/commands/benchmark_code_search.py
+# ============================================================================
+
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from apps.snippets.models import Snippet
+
+User = get_user_model()
+
+BENCH_USERNAME = 'code-search-bench'
+
+VERBS = [
+    'parse', 'load', 'fetch', 'build', 'render', 'encode', 'decode', 'validate', 'merge', 'sort',
+    'filter', 'update', 'create', 'delete', 'send', 'read', 'write', 'format', 'compute', 'resolve',
+]
+NOUNS = [
+    'json', 'user', 'request', 'response', 'config', 'cache', 'token', 'session', 'file', 'stream',
+    'buffer', 'query', 'record', 'event', 'message', 'http', 'node', 'tree', 'graph', 'matrix',
+    'image', 'socket', 'payload', 'schema', 'index',
+]
+
+# (mode, query) pairs: common words, a rare identifier (1 snippet in 1000), and misses
+QUERIES = [
+    ('text', 'parse json'),
+    ('text', 'httpClient'),
+    ('text', 'quickSortPartition'),
+    ('text', 'nonexistent identifier'),
+    ('substring', 'SortPartition'),
+    ('substring', 'JsonClient('),
+    ('substring', 'no_such_call('),
+    ('regex', r'^def parse_\w+\(stream'),
+    ('regex', r'quick\w+partition'),
+    ('regex', r'class \w+Matrix\w*Handler'),
+]
+
+# Filled in by SQL format(), one pick of words per snippet
+CODE_TEMPLATE = (
+    'def %s_%s(%s, **options):\n'
+    '    # %s the %s from a %s\n'
+    '    %s = %s%sClient(%s)\n'
+    '    result = %s.%s%s(options)\n'
+    '    return [%s_%s(item) for item in result]\n'
+    '\n'
+    'class %s%sHandler:\n'
+    '    def %s%s(self, %s):\n'
+    '        return self.%s_%s(%s)\n'
+)
+RARE_CODE = '\ndef quickSortPartition(items, lo, hi):\n    pass\n'
+
+# One batch of generated snippets, with their code stored as shared blobs
+INSERT_SQL = """
+    WITH picks AS (
+        SELECT
+            g,
+            v[1 + floor(random() * array_length(v, 1))::int] AS v1,
+            v[1 + floor(random() * array_length(v, 1))::int] AS v2,
+            n[1 + floor(random() * array_length(n, 1))::int] AS n1,
+            n[1 + floor(random() * array_length(n, 1))::int] AS n2,
+            n[1 + floor(random() * array_length(n, 1))::int] AS n3
+        FROM generate_series(%(start)s, %(end)s) g, (SELECT %(verbs)s::text[] AS v, %(nouns)s::text[] AS n) words
+    ), generated AS (
+        SELECT picks.*, code, encode(sha256(convert_to(code, 'UTF8')), 'hex') AS digest
+        FROM picks, LATERAL (SELECT format(
+            %(template)s,
+            v1, n1, n2,
+            initcap(v1), n1, n2,
+            n3, initcap(n1), initcap(n2), n2,
+            n3, v2, initcap(n2),
+            v2, n3,
+            initcap(n1), initcap(n2),
+            v2, initcap(n3), n1,
+            v1, n2, n1
+        ) || CASE WHEN g %% 1000 = 0 THEN %(rare)s ELSE '' END AS code) body
+    ), blobs AS (
+        INSERT INTO code_blobs (digest, content, data, size, refcount, created_at)
+        SELECT digest, min(code), NULL, octet_length(min(code)), count(*), now()
+        FROM generated
+        GROUP BY digest
+        ON CONFLICT (digest) DO UPDATE SET refcount = code_blobs.refcount + EXCLUDED.refcount
+    )
+    INSERT INTO snippets (
+        title, slug, description, code_blob_id, visibility, tags, lsh_buckets,
+        views_count, likes_count, forks_count, created_at, updated_at, author_id
+    )
+    SELECT
+        initcap(v1) || ' ' || n1 || ' from ' || n2,
+        'code-search-bench-' || g,
+        'Generated snippet ' || g,
+        digest,
+        'public', '[]'::jsonb, '{}'::bigint[],
+        (random() * 1000)::int, (random() * 100)::int, 0,
+        now() - random() * interval '365 days', now(), %(author)s
+    FROM generated
+"""
+
+# Removes the corpus, dropping its references on the blobs
+DELETE_SQL = """
+    WITH deleted AS (
+        DELETE FROM snippets WHERE author_id = %s RETURNING code_blob_id
+    )
+    UPDATE code_blobs SET refcount = code_blobs.refcount - released.count
+    FROM (SELECT code_blob_id, count(*) AS count FROM deleted GROUP BY code_blob_id) released
+    WHERE code_blobs.digest = released.code_blob_id
+"""
+DELETE_BLOBS_SQL = """
+    DELETE FROM code_blobs
+    WHERE refcount <= 0 AND NOT EXISTS (SELECT 1 FROM snippets WHERE code_blob_id = code_blobs.digest)
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark snippet code search. Generates a corpus of public snippets '
+        '(1M by default, kept between runs) and times each search mode.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--snippets', type=int, default=1_000_000, help='Corpus size')
+        parser.add_argument('--batch-size', type=int, default=50_000, help='Snippets generated per INSERT')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the corpus afterwards')
+    
+    def handle(self, *args, **options):
+        author, _ = User.objects.get_or_create(
+            username=BENCH_USERNAME,
+            defaults={'email': f'{BENCH_USERNAME}@example.com', 'is_active': False}
+        )
+        
+        self.generate(author, options['snippets'], options['batch_size'])
+        
+        self.stdout.write(f"{'mode':<10} {'query':<30} {'est rows':>9} {'p50 ms':>9} {'max ms':>9}")
+        for mode, q in QUERIES:
+            self.benchmark(mode, q, options['repeat'])
+        
+        if options['cleanup']:
+            with connection.cursor() as cursor:
+                cursor.execute(DELETE_SQL, [author.id])
+                cursor.execute(DELETE_BLOBS_SQL)
+            author.delete()
+            self.stdout.write('Deleted the benchmark corpus')
+    
+    def generate(self, author, total, batch_size):
+        from apps.snippets.search import blob_code, search_vector
+        
+        existing = Snippet.objects.filter(author=author).count()
+        if existing >= total:
+            self.stdout.write(f'Using the existing corpus of {existing} snippets')
+            return
+        
+        started = time.monotonic()
+        for start in range(existing + 1, total + 1, batch_size):
+            end = min(start + batch_size - 1, total)
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT COALESCE(MAX(id), 0) FROM snippets')
+                last_id = cursor.fetchone()[0]
+                cursor.execute(INSERT_SQL, {
+                    'start': start, 'end': end, 'verbs': VERBS, 'nouns': NOUNS,
+                    'template': CODE_TEMPLATE, 'rare': RARE_CODE, 'author': author.id
+                })
+            # The same expression Snippet.save() uses, computed in the database
+            Snippet.objects.filter(id__gt=last_id, author=author).update(search_vector=search_vector(blob_code()))
+            self.stdout.write(f'Generated {end} of {total} snippets')
+        
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE snippets')
+            cursor.execute('ANALYZE code_blobs')
+        self.stdout.write(f'Generated corpus in {time.monotonic() - started:.1f}s')
+    
+    def benchmark(self, mode, q, repeat):
+        from apps.snippets.search import matched_lines, search_snippets
+        from DevConnect.pagination import estimate_count
+        
+        queryset = search_snippets(
+            Snippet.objects.filter(visibility='public').select_related('code_blob'), q, mode
+        )
+        
+        timings = []
+        for _ in range(repeat + 1):
+            started = time.monotonic()
+            # What the endpoint does for one page, less serialization
+            page = list(queryset[:20])
+            for snippet in page:
+                matched_lines(snippet.code, q, mode)
+            timings.append((time.monotonic() - started) * 1000)
+        timings = timings[1:]  # The first run warms the cache
+        
+        matches = estimate_count(queryset)
+        self.stdout.write(
+            f"{mode:<10} {q:<30} {matches if matches is not None else '?':>9} "
+            f"{statistics.median(timings):>9.1f} {max(timings):>9.1f}"
+        )
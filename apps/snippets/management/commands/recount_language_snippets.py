@@ -0,0 +1,14 @@
+# ============================================================================
+# apps/snippets/management/commands/recount_language_snippets.py
+# ============================================================================
+
+from django.core.management.base import BaseCommand
+from apps.snippets.counters import recount_languages
+
+
+class Command(BaseCommand):
+    help = 'Recompute Language.snippets_count from the snippets table'
+    
+    def handle(self, *args, **kwargs):
+        updated = recount_languages()
+        self.stdout.write(self.style.SUCCESS(f'Recounted snippets for {updated} languages'))
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:25
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('snippets', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='snippet',
+            index=models.Index(condition=models.Q(('visibility', 'public')), fields=['-created_at'], name='snippets_public_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='snippet',
+            name='snippets_visibil_b883f3_idx',
+        ),
+    ]
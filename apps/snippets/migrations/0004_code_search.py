@@ -0,0 +1,71 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:37
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import F, Func, TextField, Value
+
+BATCH_SIZE = 1000
+
+
+# A frozen copy of apps.snippets.search.search_vector, so later changes to
+# search.py can't change what this migration writes
+def _regexp_replace(expression, pattern, replacement):
+    return Func(
+        expression, Value(pattern), Value(replacement), Value('g'),
+        function='regexp_replace', output_field=TextField()
+    )
+
+
+def identifier_vector(expression, weight):
+    words = _regexp_replace(expression, r'[^A-Za-z0-9]+', ' ')
+    split = _regexp_replace(
+        _regexp_replace(words, r'([a-z0-9])([A-Z])', r'\1 \2'),
+        r'([A-Z])([A-Z][a-z])', r'\1 \2'
+    )
+    return SearchVector(words, split, config='simple', weight=weight)
+
+
+def search_vector(code):
+    return (
+        identifier_vector(F('title'), 'A')
+        + identifier_vector(F('description'), 'B')
+        + identifier_vector(code, 'C')
+    )
+
+
+def backfill_search_vectors(apps, schema_editor):
+    # One short UPDATE per id range rather than one rewrite of the whole table
+    Snippet = apps.get_model('snippets', 'Snippet')
+    ids = Snippet.objects.order_by('id').values_list('id', flat=True)
+    first, last = ids.first(), ids.last()
+    if first is None:
+        return
+    for start in range(first, last + 1, BATCH_SIZE):
+        Snippet.objects.filter(id__gte=start, id__lt=start + BATCH_SIZE).update(
+            search_vector=search_vector(F('code'))
+        )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('snippets', '0003_trigram_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snippet',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(null=True),
+        ),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='snippet',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='snippets_search_vector_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:41
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('snippets', '0004_code_search'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='snippet',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tags'], name='snippets_tags_idx', opclasses=['jsonb_path_ops']),
+        ),
+    ]
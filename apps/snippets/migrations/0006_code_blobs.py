@@ -0,0 +1,152 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:51
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+import django.db.models.functions.text
+
+BATCH_SIZE = 1000
+
+# Moves snippets without a blob onto blobs: identical code in the batch
+# becomes one blob whose refcount is the number of snippets sharing it
+MOVE_CODE_SQL = """
+WITH batch AS (
+    SELECT id, code, encode(sha256(convert_to(code, 'UTF8')), 'hex') AS digest
+    FROM snippets
+    WHERE code_blob_id IS NULL AND {where}
+), blobs AS (
+    INSERT INTO code_blobs (digest, content, data, size, refcount, created_at)
+    SELECT digest, min(code), NULL, octet_length(min(code)), count(*), now()
+    FROM batch
+    GROUP BY digest
+    ON CONFLICT (digest) DO UPDATE SET refcount = code_blobs.refcount + EXCLUDED.refcount
+)
+UPDATE snippets SET code_blob_id = batch.digest
+FROM batch
+WHERE snippets.id = batch.id
+"""
+
+# While the batches run, the old code still writes snippets.code. This
+# trigger releases the blob of any snippet whose code changes or that is
+# deleted, and clears its code_blob_id so the final pass moves it again.
+TRACK_CODE_CHANGES_SQL = """
+CREATE FUNCTION snippets_code_blob_reset() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.code IS NOT DISTINCT FROM OLD.code THEN
+        RETURN NEW;
+    END IF;
+    UPDATE code_blobs SET refcount = refcount - 1 WHERE digest = OLD.code_blob_id;
+    IF TG_OP = 'DELETE' THEN
+        RETURN OLD;
+    END IF;
+    NEW.code_blob_id := NULL;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER snippets_code_blob_reset
+    BEFORE UPDATE OF code OR DELETE ON snippets
+    FOR EACH ROW WHEN (OLD.code_blob_id IS NOT NULL)
+    EXECUTE FUNCTION snippets_code_blob_reset();
+"""
+
+DROP_TRACKING_SQL = """
+DROP TRIGGER IF EXISTS snippets_code_blob_reset ON snippets;
+DROP FUNCTION IF EXISTS snippets_code_blob_reset();
+"""
+
+
+def move_code_to_blobs(apps, schema_editor):
+    Snippet = apps.get_model('snippets', 'Snippet')
+    ids = Snippet.objects.order_by('id').values_list('id', flat=True)
+    first, last = ids.first(), ids.last()
+    if first is None:
+        return
+    for start in range(first, last + 1, BATCH_SIZE):
+        with transaction.atomic(), schema_editor.connection.cursor() as cursor:
+            cursor.execute(MOVE_CODE_SQL.format(where='id >= %s AND id < %s'), [start, start + BATCH_SIZE])
+
+
+def finish_and_drop_code(apps, schema_editor):
+    """
+    Move what was inserted or edited since the batches, then drop the
+    column - in one transaction, with writes blocked, so nothing written
+    in between is lost. Reads carry on until the drop itself.
+    """
+    with transaction.atomic(), schema_editor.connection.cursor() as cursor:
+        cursor.execute('LOCK TABLE snippets IN SHARE MODE')
+        cursor.execute(MOVE_CODE_SQL.format(where='TRUE'))
+        cursor.execute(DROP_TRACKING_SQL)
+        # The code_blob foreign key checks queued above would block the ALTER
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        cursor.execute('ALTER TABLE snippets DROP COLUMN code')
+
+
+def restore_code_column(apps, schema_editor):
+    # Filled from the blobs by move_code_from_blobs, which reverses next
+    schema_editor.execute("ALTER TABLE snippets ADD COLUMN code text NOT NULL DEFAULT ''")
+    schema_editor.execute('ALTER TABLE snippets ALTER COLUMN code DROP DEFAULT')
+
+
+def move_code_from_blobs(apps, schema_editor):
+    from apps.snippets.blobs import decode_blob
+    
+    CodeBlob = apps.get_model('snippets', 'CodeBlob')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE snippets SET code = code_blobs.content FROM code_blobs "
+            "WHERE code_blobs.digest = snippets.code_blob_id AND code_blobs.data IS NULL"
+        )
+    for blob in CodeBlob.objects.filter(data__isnull=False).iterator():
+        blob.snippets.update(code=decode_blob(blob.content, blob.data))
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('snippets', '0005_tags_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodeBlob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('content', models.TextField(blank=True)),
+                ('data', models.BinaryField(null=True)),
+                ('size', models.IntegerField()),
+                ('refcount', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'code_blobs',
+            },
+        ),
+        migrations.AddField(
+            model_name='snippet',
+            name='code_blob',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='snippets', to='snippets.codeblob'),
+        ),
+        migrations.RunSQL(TRACK_CODE_CHANGES_SQL, DROP_TRACKING_SQL),
+        migrations.RunPython(move_code_to_blobs, move_code_from_blobs),
+        AddIndexConcurrently(
+            model_name='codeblob',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('content'), name='gin_trgm_ops'), name='code_blobs_content_trgm_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='snippet',
+            name='snippets_code_trgm_idx',
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(finish_and_drop_code, restore_code_column)],
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='snippet',
+                    name='code',
+                ),
+            ],
+        ),
+    ]
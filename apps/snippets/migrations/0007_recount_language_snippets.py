@@ -0,0 +1,29 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def recount_public_snippets(apps, schema_editor):
+    # snippets_count now counts public snippets only
+    Language = apps.get_model('snippets', 'Language')
+    Snippet = apps.get_model('snippets', 'Snippet')
+    public_count = (
+        Snippet.objects
+        .filter(language=OuterRef('pk'), visibility='public')
+        .order_by()
+        .values('language')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    Language.objects.update(snippets_count=Coalesce(Subquery(public_count), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('snippets', '0006_code_blobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(recount_public_snippets, migrations.RunPython.noop),
+    ]
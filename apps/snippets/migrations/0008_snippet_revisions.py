@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('snippets', '0007_recount_language_snippets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnippetRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('keyframe_number', models.PositiveIntegerField()),
+                ('content', models.TextField(blank=True)),
+                ('delta', models.JSONField(null=True)),
+                ('digest', models.CharField(max_length=64)),
+                ('size', models.IntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('snippet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='snippets.snippet')),
+            ],
+            options={
+                'db_table': 'snippet_revisions',
+                'ordering': ['-number'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='snippetrevision',
+            constraint=models.UniqueConstraint(fields=('snippet', 'number'), name='snippet_revisions_number_uniq'),
+        ),
+    ]
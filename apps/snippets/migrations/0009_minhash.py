@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:09
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Existing snippets get signatures from `manage.py backfill_minhash`
+
+    atomic = False
+
+    dependencies = [
+        ('snippets', '0008_snippet_revisions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snippet',
+            name='lsh_buckets',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, size=None),
+        ),
+        migrations.AddField(
+            model_name='snippet',
+            name='minhash',
+            field=models.BinaryField(null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='snippet',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['lsh_buckets'], name='snippets_lsh_buckets_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:12
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('snippets', '0009_minhash'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='snippetcomment',
+            index=models.Index(fields=['snippet', 'line_number', 'created_at'], name='snippet_comments_line_idx'),
+        ),
+    ]
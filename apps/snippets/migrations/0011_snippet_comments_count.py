@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:47
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_comments(apps, schema_editor):
+    Snippet = apps.get_model('snippets', 'Snippet')
+    SnippetComment = apps.get_model('snippets', 'SnippetComment')
+    comment_count = (
+        SnippetComment.objects
+        .filter(snippet=OuterRef('pk'))
+        .order_by()
+        .values('snippet')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    Snippet.objects.update(comments_count=Coalesce(Subquery(comment_count), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('snippets', '0010_comment_line_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snippet',
+            name='comments_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_comments, migrations.RunPython.noop),
+    ]
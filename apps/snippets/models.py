@@ -2,9 +2,16 @@
 # apps/snippets/models.py
 # ============================================================================
 
-from django.db import models
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import Value
+from django.db.models.functions import Upper
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.text import slugify
+from .blobs import acquire_blob, blob_digest, decode_blob, release_blobs, retain_blob
 
 User = get_user_model()
 
@@ -30,6 +37,30 @@ class Language(models.Model):
         super().save(*args, **kwargs)
 
 
+class CodeBlob(models.Model):
+    """A distinct body of snippet code, shared by every snippet with that code (see blobs.py)"""
+    digest = models.CharField(max_length=64, primary_key=True)  # SHA-256 of the UTF-8 code
+    content = models.TextField(blank=True)  # Empty when compressed
+    data = models.BinaryField(null=True)  # zstd-compressed code
+    size = models.IntegerField()  # Uncompressed bytes
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'code_blobs'
+        indexes = [
+            # Serves substring and regex code search (icontains / ~*)
+            GinIndex(OpClass(Upper('content'), name='gin_trgm_ops'), name='code_blobs_content_trgm_idx'),
+        ]
+    
+    def __str__(self):
+        return self.digest[:12]
+    
+    @property
+    def text(self):
+        return decode_blob(self.content, self.data)
+
+
 class Snippet(models.Model):
     """Code snippets shared by users"""
     
@@ -43,7 +74,8 @@ class Snippet(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=250, unique=True)
     description = models.TextField(max_length=500, blank=True)
-    code = models.TextField()
+    # The code itself lives in a shared blob; the `code` property reads and writes it
+    code_blob = models.ForeignKey(CodeBlob, on_delete=models.PROTECT, null=True, related_name='snippets')
     language = models.ForeignKey(Language, on_delete=models.SET_NULL, null=True, related_name='snippets')
     
     visibility = models.CharField(max_length=10, choices=VISIBILITY_CHOICES, default='public')
@@ -53,6 +85,13 @@ class Snippet(models.Model):
     views_count = models.IntegerField(default=0)
     likes_count = models.IntegerField(default=0)
     forks_count = models.IntegerField(default=0)
+    comments_count = models.IntegerField(default=0)
+    
+    # Identifier-aware full-text index of title, description and code (see search.py)
+    search_vector = SearchVectorField(null=True)
+    # MinHash signature of the code and its LSH band buckets (see duplicates.py)
+    minhash = models.BinaryField(null=True)
+    lsh_buckets = ArrayField(models.BigIntegerField(), default=list, blank=True)
     
     # Forking
     forked_from = models.ForeignKey(
@@ -74,12 +113,49 @@ class Snippet(models.Model):
             models.Index(fields=['slug']),
             models.Index(fields=['author', '-created_at']),
             models.Index(fields=['language', '-created_at']),
-            models.Index(fields=['visibility', '-created_at']),
+            models.Index(
+                fields=['-created_at'],
+                condition=models.Q(visibility='public'),
+                name='snippets_public_idx'
+            ),
+            # Trigram indexes so admin substring search (icontains) doesn't scan
+            GinIndex(OpClass(Upper('title'), name='gin_trgm_ops'), name='snippets_title_trgm_idx'),
+            GinIndex(OpClass(Upper('description'), name='gin_trgm_ops'), name='snippets_description_trgm_idx'),
+            GinIndex(fields=['search_vector'], name='snippets_search_vector_idx'),
+            # jsonb_path_ops covers the tags @> '["..."]' containment filters
+            GinIndex(fields=['tags'], opclasses=['jsonb_path_ops'], name='snippets_tags_idx'),
+            # Similar-snippet lookups: lsh_buckets && (shares any bucket)
+            GinIndex(fields=['lsh_buckets'], name='snippets_lsh_buckets_idx'),
         ]
     
+    # Code assigned since load, and the blob the saved row points at
+    _code = None
+    _code_changed = False
+    _saved_blob_id = None
+    # (language_id, visibility) as saved, for Language.snippets_count (see counters.py)
+    _saved_language_state = None
+    
     def __str__(self):
         return self.title
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_blob_id = instance.__dict__.get('code_blob_id')
+        instance._saved_language_state = (instance.__dict__.get('language_id'), instance.__dict__.get('visibility'))
+        return instance
+    
+    @property
+    def code(self):
+        if self._code is None:
+            self._code = self.code_blob.text if self.code_blob_id else ''
+        return self._code
+    
+    @code.setter
+    def code(self, value):
+        self._code = value
+        self._code_changed = True
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.title)
@@ -90,7 +166,69 @@ class Snippet(models.Model):
                 counter += 1
             self.slug = slug
         
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = ['code_blob' if field == 'code' else field for field in update_fields]
+            kwargs['update_fields'] = update_fields
+        saves_code = update_fields is None or 'code_blob' in update_fields
+        
+        with transaction.atomic():
+            previous_blob_id = self._saved_blob_id
+            if saves_code and self._code_changed:
+                if blob_digest(self._code) != previous_blob_id:
+                    self.code_blob_id = acquire_blob(self._code)
+            elif saves_code and self.code_blob_id and self.code_blob_id != previous_blob_id:
+                retain_blob(self.code_blob_id)  # Pointed at an existing blob, e.g. a fork
+            
+            super().save(*args, **kwargs)
+            
+            if saves_code:
+                self._code_changed = False
+                self._saved_blob_id = self.code_blob_id
+                if previous_blob_id and previous_blob_id != self.code_blob_id:
+                    from .revisions import record_revision
+                    record_revision(self, previous_blob_id)
+                    release_blobs({previous_blob_id: 1})
+        
+        # Keep the search vector and duplicate signature in step with the text
+        derived = {}
+        if update_fields is None or {'title', 'description', 'code_blob'} & set(update_fields):
+            from .search import search_vector
+            derived['search_vector'] = search_vector(Value(self.code))
+        if saves_code and self.code_blob_id != previous_blob_id:
+            from .duplicates import signature_fields
+            signature = signature_fields(self.code)
+            # Held on the instance too, or a later full save() would write the old values back
+            self.minhash, self.lsh_buckets = signature['minhash'], signature['lsh_buckets']
+            derived.update(signature)
+        if derived:
+            Snippet.objects.filter(pk=self.pk).update(**derived)
+
+
+class SnippetRevision(models.Model):
+    """One version of a snippet's code, stored whole or as a delta (see revisions.py)"""
+    snippet = models.ForeignKey(Snippet, on_delete=models.CASCADE, related_name='revisions')
+    number = models.PositiveIntegerField()
+    keyframe_number = models.PositiveIntegerField()  # The keyframe this version is rebuilt from
+    content = models.TextField(blank=True)  # Full code, on keyframes only
+    delta = models.JSONField(null=True)  # Line edits against the previous version
+    digest = models.CharField(max_length=64)  # SHA-256 of the full code
+    size = models.IntegerField()  # Bytes of the full code
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'snippet_revisions'
+        ordering = ['-number']
+        constraints = [
+            models.UniqueConstraint(fields=['snippet', 'number'], name='snippet_revisions_number_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.snippet_id} r{self.number}"
+    
+    @property
+    def is_keyframe(self):
+        return self.keyframe_number == self.number
 
 
 class SnippetComment(models.Model):
@@ -107,6 +245,10 @@ class SnippetComment(models.Model):
     class Meta:
         db_table = 'snippet_comments'
         ordering = ['created_at']
+        indexes = [
+            # Per-line comment counts and line-range loads for a snippet
+            models.Index(fields=['snippet', 'line_number', 'created_at'], name='snippet_comments_line_idx'),
+        ]
     
     def __str__(self):
         return f"Comment by {self.author.username} on {self.snippet.title}"
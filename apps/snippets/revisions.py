@@ -0,0 +1,121 @@
+# ============================================================================
+# apps/snippets/revisions.py
+# ============================================================================
+
+"""
+Snippet revision history, stored as deltas.
+
+Every change to a snippet's code adds a SnippetRevision. Most revisions
+hold only a line delta against the revision before them; every
+SNIPPET_REVISION_KEYFRAME_INTERVAL revisions (or whenever a delta would
+be no smaller than the code) a keyframe holds the full code instead. Any
+version is rebuilt from its nearest keyframe plus at most interval - 1
+deltas, fetched in one query.
+
+A delta is a list of [start, end, lines] edits over the previous
+version's lines (kept with their line endings): lines[start:end] are
+replaced by `lines`, applied in order. History starts at the first edit,
+whose revision 1 is a keyframe of the code as it was before it, so
+snippets that are never edited have no revisions and store nothing extra.
+"""
+
+import difflib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Subquery
+
+from .blobs import blob_digest
+from .models import CodeBlob, SnippetRevision
+
+# Creation time guards against a reused id (e.g. after restoring a dump) reading another snippet's entry
+CODE_CACHE_KEY = 'snippet_revision_{snippet_id}_{created}_{number}'
+
+
+def make_delta(old_code, new_code):
+    old_lines, new_lines = old_code.splitlines(True), new_code.splitlines(True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    return [
+        [i1, i2, new_lines[j1:j2]]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != 'equal'
+    ]
+
+
+def apply_delta(code, delta):
+    lines = code.splitlines(True)
+    result, position = [], 0
+    for start, end, replacement in delta:
+        result.extend(lines[position:start])
+        result.extend(replacement)
+        position = end
+    result.extend(lines[position:])
+    return ''.join(result)
+
+
+def record_revision(snippet, previous_digest):
+    """
+    Add a revision for the snippet's new code, after its row has been saved
+    (the row lock orders concurrent edits). previous_digest is the code
+    blob it pointed at before.
+    """
+    new_code = snippet.code
+    old_code = CodeBlob.objects.get(digest=previous_digest).text
+    latest = snippet.revisions.order_by('-number').first()
+    
+    if latest is None:
+        # First edit - keep the original as revision 1
+        latest = SnippetRevision.objects.create(
+            snippet=snippet, number=1, keyframe_number=1,
+            content=old_code, digest=previous_digest, size=len(old_code.encode()),
+            created_at=snippet.created_at
+        )
+    
+    number = latest.number + 1
+    revision = SnippetRevision(
+        snippet=snippet, number=number, keyframe_number=number,
+        content=new_code, digest=blob_digest(new_code), size=len(new_code.encode())
+    )
+    
+    # Delta only against what the history says the code was
+    in_step = latest.digest == previous_digest
+    if in_step and number - latest.keyframe_number < settings.SNIPPET_REVISION_KEYFRAME_INTERVAL:
+        delta = make_delta(old_code, new_code)
+        if len(json.dumps(delta)) < revision.size:
+            revision.keyframe_number = latest.keyframe_number
+            revision.content = ''
+            revision.delta = delta
+    
+    revision.save()
+    return revision
+
+
+def revision_code(snippet, number):
+    """(digest, code) of a revision, or None if there's no such revision"""
+    cache_key = CODE_CACHE_KEY.format(
+        snippet_id=snippet.id, created=int(snippet.created_at.timestamp()), number=number
+    )
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    keyframe_number = Subquery(
+        SnippetRevision.objects.filter(snippet=snippet, number=number).values('keyframe_number')
+    )
+    chain = list(
+        SnippetRevision.objects
+        .filter(snippet=snippet, number__lte=number, number__gte=keyframe_number)
+        .order_by('number')
+    )
+    if not chain or chain[-1].number != number:
+        return None
+    
+    code = chain[0].content
+    for revision in chain[1:]:
+        code = apply_delta(code, revision.delta)
+    
+    result = (chain[-1].digest, code)
+    # Revisions never change, so neither does this
+    cache.set(cache_key, result, settings.SNIPPET_REVISION_CACHE_TTL)
+    return result
@@ -0,0 +1,182 @@
+# ============================================================================
+# apps/snippets/search.py
+# ============================================================================
+
+"""
+Code search over snippets, in three modes that are each served by an index:
+
+- text (default): identifier-aware full-text search on search_vector.
+  Every identifier is indexed whole (parseJson -> parsejson) and split on
+  camelCase / snake_case boundaries (parse, json), so "parse json",
+  "parseJson" and "parse_json" find the same code. The last word matches
+  as a prefix. Ranked by ts_rank with title over description over code.
+- substring: case-insensitive substring of the code, served by the UPPER()
+  trigram index on code_blobs. Ranked by how closely the title matches.
+- regex: case-insensitive POSIX regex over the code, also served by the
+  trigram index (Postgres looks up the trigrams any match must contain).
+  ^ and $ anchor at line ends. Ranked by matches in the code.
+
+Substring and regex search read blob content, so compressed blobs (see
+blobs.py) are only found by text search. Matched line numbers are worked
+out in Python, for the returned page only.
+"""
+
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+)
+from django.db.models import F, FloatField, Func, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Upper
+
+MODES = ('text', 'substring', 'regex')
+
+# Shorter terms contain no trigram, so the index can't narrow them down
+MIN_SUBSTRING_LENGTH = 3
+
+# Kept in step with the regexp_replace calls in identifier_vector
+NON_WORD_RE = re.compile(r'[^A-Za-z0-9]+')
+CAMEL_RE = re.compile(r'([a-z0-9])([A-Z])')
+ACRONYM_RE = re.compile(r'([A-Z])([A-Z][a-z])')
+
+
+def split_identifier(word):
+    """'parseJSONData' -> 'parse JSON Data'"""
+    return ACRONYM_RE.sub(r'\1 \2', CAMEL_RE.sub(r'\1 \2', word))
+
+
+def identifier_words(text):
+    """The lowercase words search_vector holds for `text`, whole and split"""
+    words = set()
+    for word in NON_WORD_RE.sub(' ', text).split():
+        words.add(word.lower())
+        words.update(part.lower() for part in split_identifier(word).split())
+    return words
+
+
+def _regexp_replace(expression, pattern, replacement):
+    return Func(
+        expression, Value(pattern), Value(replacement), Value('g'),
+        function='regexp_replace', output_field=TextField()
+    )
+
+
+def identifier_vector(expression, weight):
+    words = _regexp_replace(expression, NON_WORD_RE.pattern, ' ')
+    split = _regexp_replace(
+        _regexp_replace(words, CAMEL_RE.pattern, r'\1 \2'),
+        ACRONYM_RE.pattern, r'\1 \2'
+    )
+    # 'simple' keeps identifiers as written - no stemming or stop words
+    return SearchVector(words, split, config='simple', weight=weight)
+
+
+def search_vector(code):
+    """Expression for Snippet.search_vector, given an expression for the code"""
+    return (
+        identifier_vector(F('title'), 'A')
+        + identifier_vector(F('description'), 'B')
+        + identifier_vector(code, 'C')
+    )
+
+
+def blob_code():
+    """The code of each row's blob, for bulk search_vector updates (uncompressed blobs only)"""
+    from .models import CodeBlob
+    return Subquery(CodeBlob.objects.filter(digest=OuterRef('code_blob_id')).values('content')[:1])
+
+
+def query_words(q):
+    """Lowercase words of a text-mode query; raises ValueError if there are none"""
+    words = [word.lower() for word in split_identifier(NON_WORD_RE.sub(' ', q)).split()]
+    if not words:
+        raise ValueError('Search query has no words')
+    return words
+
+
+def search_snippets(queryset, q, mode='text'):
+    """
+    Filter `queryset` down to snippets matching `q`, annotated with `rank`
+    and ordered best first. Raises ValueError for an unusable query.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown search mode '{mode}', expected one of: {', '.join(MODES)}")
+    
+    if mode == 'text':
+        words = query_words(q)
+        # Words are [a-z0-9]+ only, so they are safe in a raw tsquery
+        terms = words[:-1] + [f'{words[-1]}:*']
+        query = SearchQuery(' & '.join(terms), search_type='raw', config='simple')
+        return (
+            queryset
+            .filter(search_vector=query)
+            .annotate(rank=SearchRank(F('search_vector'), query))
+            .order_by('-rank', '-likes_count', '-id')
+        )
+    
+    if mode == 'substring':
+        if len(q) < MIN_SUBSTRING_LENGTH:
+            raise ValueError(f'Substring search needs at least {MIN_SUBSTRING_LENGTH} characters')
+        return (
+            queryset
+            # icontains compiles to UPPER(col) LIKE, which the trigram index covers
+            .filter(code_blob__content__icontains=q)
+            .annotate(rank=TrigramWordSimilarity(q, 'title'))
+            .order_by('-rank', '-likes_count', '-id')
+        )
+    
+    if not q:
+        raise ValueError('Regex search needs a pattern')
+    if len(q) > settings.CODE_SEARCH_MAX_PATTERN_LENGTH:
+        raise ValueError(f'Regex is longer than {settings.CODE_SEARCH_MAX_PATTERN_LENGTH} characters')
+    
+    # (?n) makes ^, $ and . work line by line; invalid patterns are rejected by Postgres
+    pattern = f'(?n){q}'
+    return (
+        queryset
+        .alias(code_upper=Upper('code_blob__content'))
+        .filter(code_upper__iregex=pattern)
+        .annotate(rank=Func(
+            F('code_blob__content'), Value(q), Value(1), Value('in'),
+            function='regexp_count', output_field=FloatField()
+        ))
+        .order_by('-rank', '-likes_count', '-id')
+    )
+
+
+def matched_lines(code, q, mode='text', limit=None):
+    """1-based numbers of the lines of `code` that match, at most `limit`"""
+    limit = limit or settings.CODE_SEARCH_MAX_LINES
+    
+    if mode == 'text':
+        words = query_words(q)
+        
+        def matches(line):
+            line_words = identifier_words(line)
+            return (
+                all(word in line_words for word in words[:-1])
+                and any(word.startswith(words[-1]) for word in line_words)
+            )
+    elif mode == 'substring':
+        needle = q.lower()
+        
+        def matches(line):
+            return needle in line.lower()
+    else:
+        try:
+            pattern = re.compile(q, re.IGNORECASE)
+        except re.error:
+            # Valid for Postgres but not Python (e.g. \y) - no line numbers
+            return []
+        
+        def matches(line):
+            return pattern.search(line) is not None
+    
+    lines = []
+    for number, line in enumerate(code.splitlines(), 1):
+        if matches(line):
+            lines.append(number)
+            if len(lines) == limit:
+                break
+    return lines
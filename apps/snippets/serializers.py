@@ -4,7 +4,10 @@
 
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Snippet, Language, SnippetComment, SnippetLike
+from django.contrib.auth.models import AnonymousUser
+from .comments import line_comment_counts
+from .lineage import lineage
+from .models import Snippet, Language, SnippetComment, SnippetLike, SnippetRevision
 
 User = get_user_model()
 
@@ -46,7 +49,7 @@ class SnippetListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'slug', 'description', 'code_preview',
             'author', 'language', 'visibility', 'tags',
-            'views_count', 'likes_count', 'forks_count',
+            'views_count', 'likes_count', 'forks_count', 'comments_count',
             'created_at', 'updated_at', 'is_liked'
         ]
     
@@ -70,25 +73,47 @@ class SnippetListSerializer(serializers.ModelSerializer):
 
 
 class SnippetDetailSerializer(SnippetListSerializer):
-    comments = SnippetCommentSerializer(many=True, read_only=True)
+    comment_counts = serializers.SerializerMethodField()
     forked_from_snippet = serializers.SerializerMethodField()
+    lineage = serializers.SerializerMethodField()
     
     class Meta(SnippetListSerializer.Meta):
-        fields = SnippetListSerializer.Meta.fields + ['code', 'comments', 'forked_from_snippet']
+        fields = SnippetListSerializer.Meta.fields + ['code', 'comment_counts', 'forked_from_snippet', 'lineage']
+    
+    def _lineage(self, obj):
+        # One recursive query serves both fields
+        if not hasattr(obj, '_lineage'):
+            request = self.context.get('request')
+            user = request.user if request else AnonymousUser()
+            obj._lineage = lineage(obj, user)
+        return obj._lineage
     
     def get_forked_from_snippet(self, obj):
-        if obj.forked_from:
-            return {
-                'id': obj.forked_from.id,
-                'title': obj.forked_from.title,
-                'slug': obj.forked_from.slug,
-                'author': obj.forked_from.author.username
-            }
+        parent = self._lineage(obj)['parent']
+        if parent:
+            return {key: parent[key] for key in ('id', 'title', 'slug', 'author')}
         return None
+    
+    def get_lineage(self, obj):
+        data = self._lineage(obj)
+        return {'root': data['root'], 'depth': data['depth']}
+    
+    def get_comment_counts(self, obj):
+        # Comments themselves are loaded per line range from the line_comments action
+        return line_comment_counts(obj.id)
+
+
+class SnippetRevisionSerializer(serializers.ModelSerializer):
+    is_keyframe = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = SnippetRevision
+        fields = ['number', 'digest', 'size', 'is_keyframe', 'created_at']
 
 
 class SnippetCreateUpdateSerializer(serializers.ModelSerializer):
     language_id = serializers.IntegerField(write_only=True)
+    code = serializers.CharField()  # Model property backed by a code blob
     
     class Meta:
         model = Snippet
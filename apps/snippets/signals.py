@@ -2,26 +2,89 @@
 # apps/snippets/signals.py
 # ============================================================================
 
-from django.db.models.signals import post_save, post_delete
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
+from .blobs import release_blobs
+from .counters import record_snippet_change
+from .lineage import invalidate_fork_tree, root_id, FORK_TREE_CACHE_KEY
 from .models import Snippet, Language, SnippetLike, SnippetComment
 from apps.notifications.utils import create_notification
 
+logger = logging.getLogger(__name__)
+
 
 @receiver(post_save, sender=Snippet)
-def update_language_count_on_create(sender, instance, created, **kwargs):
-    """Update language snippet count when snippet is created"""
-    if created and instance.language:
-        instance.language.snippets_count = instance.language.snippets.count()
-        instance.language.save(update_fields=['snippets_count'])
+def update_language_count_on_save(sender, instance, created, update_fields=None, **kwargs):
+    """Count a new snippet, or one that changed language or visibility, in its language"""
+    old_state = (None, None) if created else instance._saved_language_state
+    if old_state is None:
+        return  # Saved without being loaded; nothing to compare against
+    
+    saved = set(update_fields) if update_fields is not None else None
+    new_state = (
+        instance.language_id if saved is None or {'language', 'language_id'} & saved else old_state[0],
+        instance.visibility if saved is None or 'visibility' in saved else old_state[1],
+    )
+    record_snippet_change(old_state, new_state)
+    instance._saved_language_state = new_state
+
+
+@receiver(post_delete, sender=Snippet)
+def release_code_blob(sender, instance, **kwargs):
+    """Drop the deleted snippet's reference on its code blob"""
+    release_blobs({instance.code_blob_id: 1})
 
 
 @receiver(post_delete, sender=Snippet)
 def update_language_count_on_delete(sender, instance, **kwargs):
-    """Update language snippet count when snippet is deleted"""
-    if instance.language:
-        instance.language.snippets_count = instance.language.snippets.count()
-        instance.language.save(update_fields=['snippets_count'])
+    """Take a deleted snippet out of its language's count"""
+    old_state = instance._saved_language_state or (instance.language_id, instance.visibility)
+    record_snippet_change(old_state, (None, None))
+
+
+@receiver(post_save, sender=Snippet)
+def precompute_highlighting(sender, instance, created, update_fields=None, **kwargs):
+    """Highlight new or edited code in the background, once it is committed"""
+    if update_fields is not None and not {'code_blob', 'language'} & set(update_fields):
+        return
+    
+    def queue():
+        from .tasks import highlight_snippet
+        try:
+            highlight_snippet.delay(instance.id)
+        except Exception as e:
+            # Views render on a cache miss, so this only costs the first viewer
+            logger.warning(f"Failed to queue highlighting for snippet {instance.id}: {e}")
+    
+    transaction.on_commit(queue)
+
+
+@receiver(post_save, sender=Snippet)
+def invalidate_fork_tree_on_save(sender, instance, created, update_fields=None, **kwargs):
+    """Drop the cached fork tree when a fork is added or a node in it changes"""
+    if created:
+        if instance.forked_from_id is None:
+            return
+    elif not (instance.forked_from_id or instance.forks_count):
+        return  # Not part of any fork tree
+    elif update_fields is not None and not {'title', 'slug', 'visibility', 'forks_count'} & set(update_fields):
+        return
+    
+    transaction.on_commit(lambda: invalidate_fork_tree(instance.id))
+
+
+@receiver(pre_delete, sender=Snippet)
+def invalidate_fork_tree_on_delete(sender, instance, **kwargs):
+    """Drop the cached fork tree the snippet is in, while it's still attached"""
+    if not (instance.forked_from_id or instance.forks_count):
+        return
+    
+    cache_key = FORK_TREE_CACHE_KEY.format(root_id(instance.id))
+    transaction.on_commit(lambda: cache.delete(cache_key))
 
 
 @receiver(post_save, sender=SnippetLike)
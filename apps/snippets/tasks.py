@@ -0,0 +1,25 @@
+# ============================================================================
+# apps/snippets/tasks.py (Celery tasks)
+# ============================================================================
+
+from celery import shared_task
+
+
+@shared_task
+def highlight_snippet(snippet_id):
+    """
+    Render and cache a snippet's highlighting in the default style, so the
+    first view doesn't pay for it
+    """
+    from .highlighting import OUTPUTS, highlight
+    from .models import Snippet
+    
+    try:
+        snippet = Snippet.objects.select_related('language', 'code_blob').get(id=snippet_id)
+    except Snippet.DoesNotExist:
+        return f'Snippet {snippet_id} no longer exists'
+    
+    for output in OUTPUTS:
+        highlight(snippet.code, snippet.language, output=output)
+    
+    return f'Highlighted snippet {snippet_id}'
@@ -4,8 +4,12 @@
 
 import pytest
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
-from apps.snippets.models import Snippet, Language
+from apps.snippets.models import Snippet, Language, SnippetComment
+from apps.snippets.filters import SnippetFilter
+from apps.snippets.search import search_snippets
 
 User = get_user_model()
 
@@ -108,4 +112,707 @@ class TestSnippetAPI:
         # Access with authentication as owner
         api_client.force_authenticate(user=user)
         response = api_client.get('/api/snippets/')
-        assert len(response.data['results']) == 1
\ No newline at end of file
+        assert len(response.data['results']) == 1
+
+
+@pytest.mark.django_db
+class TestSnippetQueryPlans:
+    
+    def test_list_uses_public_partial_index(self, api_client, query_plan):
+        """Test the public snippet list is served from the public-only index"""
+        author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        language = Language.objects.create(name='Python', extension='.py')
+        for visibility in ('public', 'public', 'private'):
+            Snippet.objects.create(author=author, title=visibility, code='x = 1', language=language, visibility=visibility)
+        
+        response, plans = query_plan(lambda: api_client.get('/api/snippets/'), 'snippets')
+        assert response.status_code == 200
+        assert response.data['count'] == 2
+        assert any('snippets_public_idx' in plan for plan in plans), plans
+
+
+@pytest.mark.django_db
+class TestSnippetAdminSearch:
+    
+    def test_search_uses_trigram_indexes(self, client, query_plan):
+        """Test admin substring search over code is served by the blob trigram index"""
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='testpass123')
+        client.force_login(admin)
+        language = Language.objects.create(name='Python', extension='.py')
+        match = Snippet.objects.create(author=admin, title='Sorter', code='def quicksort(items): pass', language=language)
+        Snippet.objects.create(author=admin, title='Other', code='print(1)', language=language)
+        
+        response, plans = query_plan(
+            lambda: client.get('/admin/snippets/snippet/', {'q': 'QuickSort'}, HTTP_HOST='localhost'),
+            'code_blobs'
+        )
+        assert response.status_code == 200
+        assert list(response.context['cl'].result_list) == [match]
+        assert any('code_blobs_content_trgm_idx' in plan for plan in plans), plans
+
+
+@pytest.mark.django_db
+class TestCodeSearch:
+    
+    @pytest.fixture
+    def snippets(self):
+        author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        language = Language.objects.create(name='Python', extension='.py')
+        snake = Snippet.objects.create(
+            author=author, title='Loader', language=language,
+            code='import json\n\ndef parse_json(raw):\n    return json.loads(raw)\n'
+        )
+        camel = Snippet.objects.create(
+            author=author, title='Client', language=language,
+            code='class HTTPClient:\n    def parseJSONResponse(self, body):\n        return body\n'
+        )
+        Snippet.objects.create(author=author, title='Other', code='print(1)', language=language)
+        Snippet.objects.create(
+            author=author, title='Hidden', code='def parse_json(): pass', language=language, visibility='private'
+        )
+        return snake, camel
+    
+    def search(self, api_client, q, mode):
+        return api_client.get('/api/snippets/code_search/', {'q': q, 'mode': mode})
+    
+    def plans(self, query_plan, q, mode):
+        # Planned without the visibility filter, which on a tiny table the
+        # public partial index would otherwise serve on its own
+        _, plans = query_plan(lambda: list(search_snippets(Snippet.objects.all(), q, mode)[:20]), 'snippets')
+        return plans
+    
+    def test_text_mode_splits_identifiers(self, api_client, snippets, query_plan):
+        """Test camelCase and snake_case identifiers match the same words"""
+        snake, camel = snippets
+        
+        for q in ('parse json', 'parseJson', 'parse_json'):
+            response = self.search(api_client, q, 'text')
+            assert response.status_code == 200
+            results = {item['id']: item for item in response.data['results']}
+            assert set(results) == {snake.id, camel.id}
+            assert results[snake.id]['matched_lines'] == [3]
+            assert results[camel.id]['matched_lines'] == [2]
+        
+        response = self.search(api_client, 'http cli', 'text')
+        assert [item['id'] for item in response.data['results']] == [camel.id]
+        
+        plans = self.plans(query_plan, 'parse json', 'text')
+        assert any('snippets_search_vector_idx' in plan for plan in plans), plans
+    
+    def test_substring_mode(self, api_client, snippets, query_plan):
+        """Test substring search over code is served by the trigram index"""
+        snake, camel = snippets
+        
+        response = self.search(api_client, 'json.LOADS', 'substring')
+        assert response.status_code == 200
+        assert [item['id'] for item in response.data['results']] == [snake.id]
+        assert response.data['results'][0]['matched_lines'] == [4]
+        plans = self.plans(query_plan, 'json.LOADS', 'substring')
+        assert any('code_blobs_content_trgm_idx' in plan for plan in plans), plans
+        
+        assert self.search(api_client, 'js', 'substring').status_code == 400
+    
+    def test_regex_mode(self, api_client, snippets, query_plan):
+        """Test regex search anchors per line, ranks by matches and rejects bad patterns"""
+        snake, camel = snippets
+        
+        response = self.search(api_client, r'^def \w+_json', 'regex')
+        assert response.status_code == 200
+        assert [item['id'] for item in response.data['results']] == [snake.id]
+        assert response.data['results'][0]['matched_lines'] == [3]
+        plans = self.plans(query_plan, r'^def \w+_json', 'regex')
+        assert any('code_blobs_content_trgm_idx' in plan for plan in plans), plans
+        
+        response = self.search(api_client, 'json', 'regex')
+        assert [item['id'] for item in response.data['results']] == [snake.id, camel.id]
+        assert response.data['results'][0]['rank'] == 3
+        
+        assert self.search(api_client, 'parse(', 'regex').status_code == 400
+
+
+@pytest.mark.django_db
+class TestSnippetTags:
+    
+    @pytest.fixture
+    def snippets(self):
+        author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        python = Language.objects.create(name='Python', extension='.py')
+        rust = Language.objects.create(name='Rust', extension='.rs')
+        both = Snippet.objects.create(author=author, title='A', code='x', language=python, tags=['python', 'django'])
+        flask = Snippet.objects.create(author=author, title='B', code='x', language=python, tags=['python', 'flask'])
+        cargo = Snippet.objects.create(author=author, title='C', code='x', language=rust, tags=['cargo'])
+        Snippet.objects.create(author=author, title='D', code='x', language=rust, tags=['python'], visibility='private')
+        return both, flask, cargo
+    
+    def ids(self, response):
+        return {item['id'] for item in response.data['results']}
+    
+    def test_all_and_any_tag_filters(self, api_client, snippets, query_plan):
+        """Test AND / OR tag filters and that both use the tags GIN index"""
+        both, flask, cargo = snippets
+        
+        assert self.ids(api_client.get('/api/snippets/', {'tags_all': 'python,django'})) == {both.id}
+        assert self.ids(api_client.get('/api/snippets/', {'tags_any': 'django, cargo'})) == {both.id, cargo.id}
+        assert self.ids(api_client.get('/api/snippets/', {'tag': 'python'})) == {both.id, flask.id}
+        
+        for params in ({'tags_all': 'python,django'}, {'tags_any': 'django,cargo'}):
+            # Planned without the visibility filter, as in TestCodeSearch
+            _, plans = query_plan(lambda: list(SnippetFilter(params, Snippet.objects.all()).qs), 'snippets')
+            assert any('snippets_tags_idx' in plan for plan in plans), plans
+    
+    def test_facets(self, api_client, snippets, django_assert_num_queries):
+        """Test facet counts follow the filters and are served from cache on repeat"""
+        response = api_client.get('/api/snippets/facets/')
+        assert response.status_code == 200
+        assert response.data['total'] == 3
+        assert response.data['tags'][0] == {'tag': 'python', 'count': 2}
+        assert {tag['tag'] for tag in response.data['tags']} == {'python', 'django', 'flask', 'cargo'}
+        assert response.data['languages'] == [
+            {'slug': 'python', 'name': 'Python', 'count': 2},
+            {'slug': 'rust', 'name': 'Rust', 'count': 1},
+        ]
+        
+        response = api_client.get('/api/snippets/facets/', {'language': 'python', 'tags_any': 'flask'})
+        assert response.data['total'] == 1
+        assert response.data['tags'] == [{'tag': 'flask', 'count': 1}, {'tag': 'python', 'count': 1}]
+        
+        with django_assert_num_queries(0):
+            cached = api_client.get('/api/snippets/facets/', {'language': 'python', 'tags_any': 'flask'})
+        assert cached.data == response.data
+
+
+@pytest.mark.django_db
+class TestHighlighting:
+    
+    @pytest.fixture
+    def language(self):
+        return Language.objects.create(name='Python', slug='python', extension='.py')
+    
+    @pytest.fixture
+    def author(self):
+        return User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+    
+    def test_highlighting_is_precomputed_on_save(self, author, language, django_capture_on_commit_callbacks):
+        """Test saving a snippet renders both outputs into the cache, shared by identical code"""
+        from django.core.cache import cache
+        from apps.snippets.highlighting import CACHE_KEY, code_hash
+        
+        code = 'def precomputed():\n    return 42\n'
+        keys = [
+            CACHE_KEY.format(digest=code_hash(code), language='python', style='default', output=output)
+            for output in ('html', 'tokens')
+        ]
+        cache.delete_many(keys)
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            Snippet.objects.create(author=author, title='Answer', code=code, language=language)
+        
+        assert all(cache.get(key) is not None for key in keys)
+    
+    def test_highlighted_endpoint(self, api_client, author, language):
+        """Test the endpoint serves HTML with CSS and a per-line token stream"""
+        snippet = Snippet.objects.create(
+            author=author, title='Greeter', language=language,
+            code='def greet(name):\n    return f"Hi {name}"  # hello\n'
+        )
+        url = f'/api/snippets/{snippet.id}/highlighted/'
+        
+        response = api_client.get(url)
+        assert response.status_code == 200
+        assert '<div class="highlight">' in response.data['html']
+        assert '.highlight .k' in response.data['css']
+        
+        response = api_client.get(url, {'output': 'tokens', 'style': 'monokai'})
+        assert response.status_code == 200
+        tokens = response.data['tokens']
+        assert len(tokens) == 2
+        assert tokens[0][:3] == [['k', 'def'], ['w', ' '], ['nf', 'greet']]
+        assert tokens[1][-1] == ['c1', '# hello']
+        assert ''.join(text for _, text in tokens[1]) == '    return f"Hi {name}"  # hello'
+        
+        assert api_client.get(url, {'style': 'no-such-style'}).status_code == 400
+
+
+@pytest.mark.django_db
+class TestCodeBlobs:
+    
+    @pytest.fixture
+    def snippet(self):
+        author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        language = Language.objects.create(name='Python', extension='.py')
+        return Snippet.objects.create(author=author, title='Original', code='def shared(): pass', language=language)
+    
+    def test_forks_share_blob_until_edited(self, api_client, snippet):
+        """Test a fork reuses its original's blob and blobs are freed with their last snippet"""
+        from apps.snippets.blobs import blob_digest
+        from apps.snippets.models import CodeBlob
+        
+        forker = User.objects.create_user(username='forker', email='forker@example.com', password='testpass123')
+        api_client.force_authenticate(user=forker)
+        response = api_client.post(f'/api/snippets/{snippet.id}/fork/')
+        assert response.status_code == 201
+        
+        fork = Snippet.objects.get(id=response.data['id'])
+        assert fork.code_blob_id == snippet.code_blob_id == blob_digest('def shared(): pass')
+        assert fork.code == 'def shared(): pass'
+        assert CodeBlob.objects.get().refcount == 2
+        
+        fork.code = 'def changed(): pass'
+        fork.save()
+        assert CodeBlob.objects.get(digest=snippet.code_blob_id).refcount == 1
+        assert Snippet.objects.get(id=fork.id).code == 'def changed(): pass'
+        
+        snippet.delete()
+        fork.delete()
+        assert not CodeBlob.objects.exists()
+    
+    def test_large_code_is_compressed(self, snippet, settings):
+        """Test code over the threshold is stored compressed and reads back unchanged"""
+        pytest.importorskip('zstandard')
+        settings.CODE_BLOB_COMPRESS_THRESHOLD = 100
+        
+        code = 'print("hello")\n' * 50
+        snippet.code = code
+        snippet.save(update_fields=['code'])
+        
+        snippet = Snippet.objects.get(id=snippet.id)
+        assert snippet.code_blob.data is not None
+        assert snippet.code_blob.size == len(code)
+        assert snippet.code == code
+
+
+@pytest.mark.django_db
+class TestForkLineage:
+    
+    @pytest.fixture
+    def chain(self):
+        """root <- middle <- leaf, with a public and a private sibling of leaf"""
+        from django.core.cache import cache
+        
+        author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        language = Language.objects.create(name='Python', extension='.py')
+        
+        def snippet(title, parent=None, visibility='public'):
+            return Snippet.objects.create(
+                author=author, title=title, code='x = 1', language=language,
+                visibility=visibility, forked_from=parent
+            )
+        
+        root = snippet('Root')
+        middle = snippet('Middle', root)
+        leaf = snippet('Leaf', middle)
+        sibling = snippet('Sibling', middle)
+        snippet('Secret', middle, visibility='private')
+        cache.delete(f'snippet_fork_tree_{root.id}')
+        return root, middle, leaf, sibling
+    
+    def test_detail_lineage_in_constant_queries(self, api_client, chain):
+        """Test detail pages show the original and root without a query per ancestor"""
+        root, middle, leaf, _ = chain
+        
+        response = api_client.get(f'/api/snippets/{leaf.id}/')
+        assert response.data['forked_from_snippet']['id'] == middle.id
+        assert response.data['forked_from_snippet']['author'] == 'author'
+        assert response.data['lineage']['depth'] == 2
+        assert response.data['lineage']['root']['id'] == root.id
+        
+        api_client.get(f'/api/snippets/{middle.id}/')  # Both views counted already
+        with CaptureQueriesContext(connection) as deep:
+            api_client.get(f'/api/snippets/{leaf.id}/')
+        with CaptureQueriesContext(connection) as shallow:
+            api_client.get(f'/api/snippets/{middle.id}/')
+        assert len(deep.captured_queries) == len(shallow.captured_queries)
+        
+        response = api_client.get(f'/api/snippets/{leaf.id}/lineage/')
+        assert [node['id'] for node in response.data['ancestors']] == [root.id, middle.id]
+    
+    def test_fork_tree_is_cached_and_invalidated(
+        self, api_client, chain, django_assert_num_queries, django_capture_on_commit_callbacks
+    ):
+        """Test the tree hides private forks, is served from cache and refreshed by a new fork"""
+        root, middle, leaf, sibling = chain
+        
+        def tree_ids(node):
+            return {node['id']: {k: v for child in node['children'] for k, v in tree_ids(child).items()}}
+        
+        response = api_client.get(f'/api/snippets/{root.id}/fork_tree/')
+        assert tree_ids(response.data) == {root.id: {middle.id: {leaf.id: {}, sibling.id: {}}}}
+        
+        # The snippet and its root; the tree itself comes from cache
+        with django_assert_num_queries(2):
+            response = api_client.get(f'/api/snippets/{middle.id}/fork_tree/', {'depth': 0})
+        assert response.data['children'] == []
+        
+        forker = User.objects.create_user(username='forker', email='forker@example.com', password='testpass123')
+        api_client.force_authenticate(user=forker)
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post(f'/api/snippets/{leaf.id}/fork/')
+        fork_id = response.data['id']
+        assert response.data['lineage']['depth'] == 3
+        
+        response = api_client.get(f'/api/snippets/{root.id}/fork_tree/')
+        assert tree_ids(response.data) == {root.id: {middle.id: {leaf.id: {fork_id: {}}, sibling.id: {}}}}
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            middle.delete()
+        response = api_client.get(f'/api/snippets/{root.id}/fork_tree/')
+        assert response.data['children'] == []
+        response = api_client.get(f'/api/snippets/{fork_id}/lineage/')
+        assert response.data['root']['id'] == leaf.id
+
+
+@pytest.mark.django_db
+class TestLanguageCounts:
+    
+    @pytest.fixture
+    def author(self):
+        return User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+    
+    def counts(self):
+        return dict(Language.objects.values_list('slug', 'snippets_count'))
+    
+    def test_counts_follow_language_and_visibility(self, api_client, author, django_capture_on_commit_callbacks):
+        """Test public snippets are counted through create, edit and delete"""
+        python = Language.objects.create(name='Python', slug='python', extension='.py')
+        rust = Language.objects.create(name='Rust', slug='rust', extension='.rs')
+        api_client.force_authenticate(user=author)
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            snippet = Snippet.objects.create(author=author, title='A', code='x', language=python)
+            Snippet.objects.create(author=author, title='B', code='x', language=python, visibility='private')
+        assert self.counts() == {'python': 1, 'rust': 0}
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.patch(f'/api/snippets/{snippet.id}/', {'language_id': rust.id})
+        assert response.status_code == 200
+        assert self.counts() == {'python': 0, 'rust': 1}
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            api_client.patch(f'/api/snippets/{snippet.id}/', {'visibility': 'unlisted'})
+        assert self.counts() == {'python': 0, 'rust': 0}
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            api_client.patch(f'/api/snippets/{snippet.id}/', {'visibility': 'public'})
+            Snippet.objects.get(id=snippet.id).delete()
+        assert self.counts() == {'python': 0, 'rust': 0}
+    
+    def test_deltas_are_coalesced_per_transaction(self, author, django_capture_on_commit_callbacks):
+        """Test a transaction's changes are applied as one update per language, on commit"""
+        python = Language.objects.create(name='Python', slug='python', extension='.py')
+        
+        def language_updates(queries):
+            return [q for q in queries.captured_queries if q['sql'].startswith('UPDATE "languages"')]
+        
+        with CaptureQueriesContext(connection) as queries:
+            with django_capture_on_commit_callbacks(execute=True):
+                for i in range(5):
+                    Snippet.objects.create(author=author, title=f'S{i}', code='x', language=python)
+                assert self.counts() == {'python': 0}
+        assert len(language_updates(queries)) == 1
+        assert self.counts() == {'python': 5}
+        
+        with CaptureQueriesContext(connection) as queries:
+            with django_capture_on_commit_callbacks(execute=True):
+                author.delete()
+        assert len(language_updates(queries)) == 1
+        assert self.counts() == {'python': 0}
+    
+    def test_rolled_back_savepoints_drop_their_deltas(self, author, django_capture_on_commit_callbacks):
+        """Test deltas recorded in a savepoint that rolls back are never applied"""
+        from django.db import transaction
+        python = Language.objects.create(name='Python', slug='python', extension='.py')
+        rust = Language.objects.create(name='Rust', slug='rust', extension='.rs')
+        
+        with CaptureQueriesContext(connection) as queries:
+            with django_capture_on_commit_callbacks(execute=True):
+                with transaction.atomic():
+                    Snippet.objects.create(author=author, title='Kept', code='x', language=python)
+                    try:
+                        with transaction.atomic():
+                            Snippet.objects.create(author=author, title='Lost', code='x', language=python)
+                            Snippet.objects.create(author=author, title='Lost', code='x', language=rust)
+                            raise ValueError
+                    except ValueError:
+                        pass
+                    with transaction.atomic():
+                        Snippet.objects.create(author=author, title='Nested', code='x', language=rust)
+        
+        assert self.counts() == {'python': 1, 'rust': 1}
+        updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE "languages"')]
+        assert len(updates) == 2
+    
+    @pytest.mark.django_db(transaction=True)
+    def test_real_commit_applies_one_update_per_language(self, author):
+        """Test a committed transaction of several saves and savepoints updates each language once"""
+        from django.db import transaction
+        python = Language.objects.create(name='Python', slug='python', extension='.py')
+        rust = Language.objects.create(name='Rust', slug='rust', extension='.rs')
+        
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                for i in range(3):
+                    Snippet.objects.create(author=author, title=f'P{i}', code='x', language=python)
+                Snippet.objects.create(author=author, title='R', code='x', language=rust)
+                try:
+                    with transaction.atomic():
+                        Snippet.objects.create(author=author, title='Lost', code='x', language=rust)
+                        raise ValueError
+                except ValueError:
+                    pass
+        
+        assert self.counts() == {'python': 3, 'rust': 1}
+        updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE "languages"')]
+        assert len(updates) == 2
+
+
+@pytest.mark.django_db
+class TestSnippetRevisions:
+    
+    @pytest.fixture
+    def snippet(self):
+        author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        language = Language.objects.create(name='Python', extension='.py')
+        return Snippet.objects.create(
+            author=author, title='Counter', language=language,
+            code=''.join(f'line_{i} = {i}\n' for i in range(50))
+        )
+    
+    def versions(self, snippet, edits):
+        """Apply `edits` successive one-line changes, returning every version"""
+        versions = [snippet.code]
+        for i in range(edits):
+            lines = versions[-1].splitlines(True)
+            lines[i % 50] = f'line_{i % 50} = "edit {i}"\n'
+            snippet.code = ''.join(lines)
+            snippet.save()
+            versions.append(snippet.code)
+        return versions
+    
+    def test_edits_store_deltas_between_keyframes(self, snippet, settings):
+        """Test each edit is a small delta, keyframes bound the chain, and every version rebuilds"""
+        from apps.snippets.revisions import revision_code
+        settings.SNIPPET_REVISION_KEYFRAME_INTERVAL = 5
+        
+        assert not snippet.revisions.exists()
+        versions = self.versions(snippet, 11)
+        
+        revisions = list(snippet.revisions.order_by('number'))
+        assert [r.number for r in revisions] == list(range(1, 13))
+        assert [r.number for r in revisions if r.is_keyframe] == [1, 6, 11]
+        assert all(r.content == '' and len(r.delta) == 1 for r in revisions if not r.is_keyframe)
+        
+        for number, code in enumerate(versions, start=1):
+            assert revision_code(snippet, number)[1] == code
+        assert revision_code(snippet, 13) is None
+    
+    def test_revision_endpoints(self, api_client, snippet):
+        """Test listing revisions, fetching one and diffing two"""
+        versions = self.versions(snippet, 2)
+        
+        response = api_client.get(f'/api/snippets/{snippet.id}/revisions/')
+        assert response.status_code == 200
+        assert [r['number'] for r in response.data['results']] == [3, 2, 1]
+        
+        response = api_client.get(f'/api/snippets/{snippet.id}/revisions/2/')
+        assert response.data['code'] == versions[1]
+        assert api_client.get(f'/api/snippets/{snippet.id}/revisions/9/').status_code == 404
+        
+        response = api_client.get(f'/api/snippets/{snippet.id}/revision_diff/', {'from': 1, 'to': 3})
+        assert response.status_code == 200
+        assert (response.data['added'], response.data['removed']) == (2, 2)
+        assert [hunk['lines'][:4] for hunk in response.data['hunks']] == [
+            ['-line_0 = 0', '-line_1 = 1', '+line_0 = "edit 0"', '+line_1 = "edit 1"']
+        ]
+        assert api_client.get(f'/api/snippets/{snippet.id}/revision_diff/', {'from': 1}).status_code == 400
+
+
+@pytest.mark.django_db
+class TestForkDiff:
+    
+    def blob_reads(self, queries):
+        return [q for q in queries.captured_queries if 'FROM "code_blobs"' in q['sql']]
+    
+    def test_fork_diff_is_cached_per_code_pair(self, api_client):
+        """Test identical forks skip diffing, and a diffed pair isn't read again"""
+        from django.core.cache import cache
+        from apps.snippets.diffs import CACHE_KEY
+        
+        author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        forker = User.objects.create_user(username='forker', email='forker@example.com', password='testpass123')
+        language = Language.objects.create(name='Python', extension='.py')
+        original = Snippet.objects.create(
+            author=author, title='Original', language=language,
+            code='def add(a, b):\n    return a + b\n'
+        )
+        api_client.force_authenticate(user=forker)
+        fork = Snippet.objects.get(id=api_client.post(f'/api/snippets/{original.id}/fork/').data['id'])
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(f'/api/snippets/{fork.id}/fork_diff/')
+        assert response.status_code == 200
+        assert response.data['original']['id'] == original.id
+        assert response.data['identical'] is True
+        assert response.data['hunks'] == []
+        assert self.blob_reads(queries) == []
+        
+        fork.code = 'def add(a, b):\n    """Sum"""\n    return a + b\n'
+        fork.save()
+        cache.delete(CACHE_KEY.format(old=original.code_blob_id, new=fork.code_blob_id, context=3))
+        
+        response = api_client.get(f'/api/snippets/{fork.id}/fork_diff/')
+        assert response.data['identical'] is False
+        assert (response.data['added'], response.data['removed']) == (1, 0)
+        assert response.data['hunks'][0]['lines'] == [
+            ' def add(a, b):', '+    """Sum"""', '     return a + b'
+        ]
+        
+        with CaptureQueriesContext(connection) as queries:
+            assert api_client.get(f'/api/snippets/{fork.id}/fork_diff/').data == response.data
+        assert self.blob_reads(queries) == []
+        
+        assert api_client.get(f'/api/snippets/{original.id}/fork_diff/').status_code == 404
+
+
+@pytest.mark.django_db
+class TestNearDuplicates:
+    
+    CODE = (
+        'def merge_sorted(left, right):\n'
+        '    result, i, j = [], 0, 0\n'
+        '    while i < len(left) and j < len(right):\n'
+        '        if left[i] <= right[j]:\n'
+        '            result.append(left[i])\n'
+        '            i += 1\n'
+        '        else:\n'
+        '            result.append(right[j])\n'
+        '            j += 1\n'
+        '    return result + left[i:] + right[j:]\n'
+    )
+    
+    @pytest.fixture
+    def snippets(self):
+        author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        spammer = User.objects.create_user(username='spammer', email='spammer@example.com', password='testpass123')
+        language = Language.objects.create(name='Python', extension='.py')
+        original = Snippet.objects.create(author=author, title='Merge', code=self.CODE, language=language)
+        # Reformatted, with one extra line - still a near-duplicate
+        copy = Snippet.objects.create(
+            author=spammer, title='My merge', language=language,
+            code='# merge two lists\n' + self.CODE.replace('    ', '\t').upper()
+        )
+        other = Snippet.objects.create(
+            author=author, title='Fib', language=language,
+            code='def fib(n):\n    a, b = 0, 1\n    for _ in range(n):\n        a, b = b, a + b\n    return a\n'
+        )
+        Snippet.objects.create(
+            author=spammer, title='Hidden', code=self.CODE, language=language, visibility='private'
+        )
+        return original, copy, other
+    
+    def test_similar_snippets(self, api_client, snippets):
+        """Test a reformatted copy is found through its LSH buckets and unrelated code isn't"""
+        original, copy, other = snippets
+        
+        assert len(original.lsh_buckets) == 16
+        response = api_client.get(f'/api/snippets/{original.id}/similar/')
+        assert response.status_code == 200
+        assert [item['id'] for item in response.data] == [copy.id]
+        assert 0.8 <= response.data[0]['similarity'] < 1
+        
+        assert api_client.get(f'/api/snippets/{other.id}/similar/').data == []
+    
+    def test_duplicate_report_and_backfill(self, api_client, snippets, settings):
+        """Test moderators get duplicate clusters, and the backfill restores signatures"""
+        from django.core.cache import cache
+        from django.core.management import call_command
+        original, copy, other = snippets
+        cache.delete('snippet_duplicate_clusters')
+        
+        user = User.objects.create_user(username='user', email='user@example.com', password='testpass123')
+        api_client.force_authenticate(user=user)
+        assert api_client.get('/api/snippets/duplicates/').status_code == 403
+        
+        # Forks are expected copies, so they aren't reported
+        api_client.post(f'/api/snippets/{original.id}/fork/')
+        
+        expected = {snippet.id: (snippet.minhash, snippet.lsh_buckets) for snippet in (original, copy, other)}
+        Snippet.objects.update(minhash=None, lsh_buckets=[])
+        call_command('backfill_minhash', workers=2, batch_size=2)
+        restored = dict(
+            (snippet_id, (bytes(minhash), buckets))
+            for snippet_id, minhash, buckets in Snippet.objects.values_list('id', 'minhash', 'lsh_buckets')
+        )
+        assert all(restored[snippet_id] == expected[snippet_id] for snippet_id in expected)
+        
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='testpass123')
+        api_client.force_authenticate(user=admin)
+        response = api_client.get('/api/snippets/duplicates/')
+        assert response.status_code == 200
+        assert [[s['id'] for s in cluster['snippets']] for cluster in response.data['results']] == [
+            [original.id, copy.id]
+        ]
+
+
+@pytest.mark.django_db
+class TestLineComments:
+    
+    @pytest.fixture
+    def snippet(self):
+        author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        reviewer = User.objects.create_user(username='reviewer', email='reviewer@example.com', password='testpass123')
+        language = Language.objects.create(name='Python', extension='.py')
+        snippet = Snippet.objects.create(
+            author=author, title='Loop', language=language,
+            code='for i in range(3):\n    print(i)\n'
+        )
+        for line_number, content in [(None, 'Nice'), (1, 'Use enumerate'), (2, 'f-string?'), (1, 'Agreed'), (1, 'Why?')]:
+            SnippetComment.objects.create(snippet=snippet, author=reviewer, content=content, line_number=line_number)
+        return snippet
+    
+    def test_detail_embeds_only_line_counts(self, api_client, snippet):
+        """Test snippet detail carries per-line comment counts instead of the comments"""
+        response = api_client.get(f'/api/snippets/{snippet.id}/')
+        assert response.status_code == 200
+        assert 'comments' not in response.data
+        assert response.data['comment_counts'] == {'total': 5, 'general': 1, 'lines': {1: 3, 2: 1}}
+    
+    def test_line_comments_grouped_in_one_query(self, api_client, snippet, settings):
+        """Test a line range comes back grouped by line, capped per line, with full counts"""
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(f'/api/snippets/{snippet.id}/line_comments/?start=1&end=2&per_line=2')
+        assert response.status_code == 200
+        assert len([q for q in queries.captured_queries if 'snippet_comments' in q['sql']]) == 1
+        
+        lines = response.data['lines']
+        assert [(line['line_number'], line['count']) for line in lines] == [(1, 3), (2, 1)]
+        assert [comment['content'] for comment in lines[0]['comments']] == ['Use enumerate', 'Agreed']
+        assert lines[0]['comments'][0]['author']['username'] == 'reviewer'
+        
+        response = api_client.get(f'/api/snippets/{snippet.id}/line_comments/?start=2')
+        assert [line['line_number'] for line in response.data['lines']] == [2]
+        
+        settings.SNIPPET_COMMENT_LINE_RANGE = 1
+        assert api_client.get(f'/api/snippets/{snippet.id}/line_comments/?end=5').data['end'] == 1
+        assert api_client.get(f'/api/snippets/{snippet.id}/line_comments/?start=x').status_code == 400
+        assert api_client.get(f'/api/snippets/{snippet.id}/line_comments/?start=3&end=2').status_code == 400
+    
+    def test_comment_count_follows_create_and_delete(self, snippet):
+        """Test creating and deleting comments keeps the snippet's comments_count in step"""
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from apps.snippets.views import SnippetCommentViewSet
+        reviewer = User.objects.get(username='reviewer')
+        factory = APIRequestFactory()
+        
+        request = factory.post('/', {'snippet': snippet.id, 'content': 'Hmm', 'line_number': 2}, format='json')
+        force_authenticate(request, user=reviewer)
+        response = SnippetCommentViewSet.as_view({'post': 'create'})(request)
+        assert response.status_code == 201
+        snippet.refresh_from_db()
+        assert snippet.comments_count == 1
+        
+        request = factory.delete('/')
+        force_authenticate(request, user=reviewer)
+        response = SnippetCommentViewSet.as_view({'delete': 'destroy'})(request, pk=response.data['id'])
+        assert response.status_code == 204
+        snippet.refresh_from_db()
+        assert snippet.comments_count == 0
@@ -5,7 +5,9 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticatedOrReadOnly, IsAuthenticated
+from django.conf import settings
+from django.db import DataError, OperationalError, connection, transaction
 from django.db.models import Q, F
 from django.core.cache import cache
 from django_filters.rest_framework import DjangoFilterBackend
@@ -14,20 +16,29 @@ from .models import Snippet, Language, SnippetComment, SnippetLike
 from .serializers import (
     SnippetListSerializer, SnippetDetailSerializer,
     SnippetCreateUpdateSerializer, LanguageSerializer,
-    SnippetCommentSerializer
+    SnippetCommentSerializer, SnippetRevisionSerializer
 )
 from .permissions import IsAuthorOrReadOnly
+from .facets import snippet_facets
 from .filters import SnippetFilter
+from .highlighting import highlight, style_css
+from .comments import comments_by_line
+from .diffs import code_diff, snippet_diff
+from .duplicates import duplicate_clusters, similar_snippets
+from .lineage import fork_tree as get_fork_tree, lineage as get_lineage
+from .revisions import revision_code
+from .search import matched_lines, search_snippets
+from apps.notifications.live import publish_delta
 
 
 class SnippetViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing code snippets
     """
-    queryset = Snippet.objects.select_related('author', 'language').filter(visibility='public')
+    queryset = Snippet.objects.select_related('author', 'language', 'code_blob').filter(visibility='public')
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = SnippetFilter
-    search_fields = ['title', 'description', 'code']
+    search_fields = ['title', 'description', 'code_blob__content']
     ordering_fields = ['created_at', 'views_count', 'likes_count', 'forks_count']
     ordering = ['-created_at']
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -49,7 +60,7 @@ class SnippetViewSet(viewsets.ModelViewSet):
         
         # Show user's own private/unlisted snippets
         if self.request.user.is_authenticated:
-            queryset = Snippet.objects.select_related('author', 'language').filter(
+            queryset = Snippet.objects.select_related('author', 'language', 'code_blob').filter(
                 Q(visibility='public') | Q(author=self.request.user)
             )
         
@@ -66,6 +77,7 @@ class SnippetViewSet(viewsets.ModelViewSet):
             instance.save(update_fields=['views_count'])
             instance.refresh_from_db()
             cache.set(cache_key, True, 300)  # 5 minutes
+            publish_delta('snippet', instance.id, 'views_count')
         
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
@@ -91,6 +103,7 @@ class SnippetViewSet(viewsets.ModelViewSet):
             snippet.likes_count = F('likes_count') + 1
             snippet.save(update_fields=['likes_count'])
             snippet.refresh_from_db()
+            publish_delta('snippet', snippet.id, 'likes_count')
             
             # Give author reputation points
             snippet.author.update_reputation(3)
@@ -117,6 +130,7 @@ class SnippetViewSet(viewsets.ModelViewSet):
             snippet.likes_count = F('likes_count') - 1
             snippet.save(update_fields=['likes_count'])
             snippet.refresh_from_db()
+            publish_delta('snippet', snippet.id, 'likes_count', -1)
             
             # Remove reputation points
             snippet.author.update_reputation(-3)
@@ -141,7 +155,7 @@ class SnippetViewSet(viewsets.ModelViewSet):
             author=request.user,
             title=f"{original_snippet.title} (Fork)",
             description=original_snippet.description,
-            code=original_snippet.code,
+            code_blob_id=original_snippet.code_blob_id,  # Shares the original's stored code
             language=original_snippet.language,
             visibility='public',
             tags=original_snippet.tags,
@@ -151,6 +165,7 @@ class SnippetViewSet(viewsets.ModelViewSet):
         # Update fork count
         original_snippet.forks_count = F('forks_count') + 1
         original_snippet.save(update_fields=['forks_count'])
+        publish_delta('snippet', original_snippet.id, 'forks_count')
         
         # Update user's snippet count
         request.user.snippets_count = F('snippets_count') + 1
@@ -159,6 +174,197 @@ class SnippetViewSet(viewsets.ModelViewSet):
         serializer = SnippetDetailSerializer(forked_snippet, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
+    @action(detail=True, methods=['get'])
+    def lineage(self, request, pk=None):
+        """The snippets this one was forked from, root first, and its depth"""
+        snippet = self.get_object()
+        return Response(get_lineage(snippet, request.user))
+    
+    @action(detail=True, methods=['get'])
+    def fork_tree(self, request, pk=None):
+        """The tree of forks below this snippet: ?depth= limits the levels returned"""
+        snippet = self.get_object()
+        
+        depth = request.query_params.get('depth')
+        try:
+            depth = int(depth) if depth is not None else None
+        except ValueError:
+            return Response({'error': 'depth must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(get_fork_tree(snippet, request.user, max_depth=depth))
+    
+    @action(detail=True, methods=['get'])
+    def revisions(self, request, pk=None):
+        """The snippet's code revisions, newest first"""
+        snippet = self.get_object()
+        revisions = snippet.revisions.defer('content', 'delta')
+        
+        page = self.paginate_queryset(revisions)
+        if page is not None:
+            serializer = SnippetRevisionSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        serializer = SnippetRevisionSerializer(revisions, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'], url_path=r'revisions/(?P<number>[0-9]+)')
+    def revision(self, request, pk=None, number=None):
+        """The code as of one revision"""
+        snippet = self.get_object()
+        result = revision_code(snippet, int(number))
+        if result is None:
+            return Response({'error': 'Revision not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        digest, code = result
+        return Response({'number': int(number), 'digest': digest, 'code': code})
+    
+    @action(detail=True, methods=['get'])
+    def revision_diff(self, request, pk=None):
+        """Line diff between two revisions: ?from=<number>&to=<number>"""
+        snippet = self.get_object()
+        try:
+            numbers = int(request.query_params['from']), int(request.query_params['to'])
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'from and to must be revision numbers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        versions = [revision_code(snippet, number) for number in numbers]
+        if None in versions:
+            return Response({'error': 'Revision not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        (old_digest, old_code), (new_digest, new_code) = versions
+        diff = code_diff(old_code, new_code, old_digest=old_digest, new_digest=new_digest)
+        return Response({'from': numbers[0], 'to': numbers[1], **diff})
+    
+    @action(detail=True, methods=['get'])
+    def fork_diff(self, request, pk=None):
+        """Line diff from the snippet this one was forked from to this fork"""
+        fork = self.get_object()
+        
+        original = None
+        if fork.forked_from_id:
+            # The code is only read if this pair hasn't been diffed before
+            original = (
+                self.get_queryset()
+                .select_related(None)
+                .only('id', 'title', 'slug', 'code_blob')
+                .filter(id=fork.forked_from_id)
+                .first()
+            )
+        if original is None:
+            return Response(
+                {'error': 'Snippet is not a fork of a snippet you can see'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        return Response({
+            'original': {'id': original.id, 'title': original.title, 'slug': original.slug},
+            'identical': original.code_blob_id == fork.code_blob_id,
+            **snippet_diff(original, fork)
+        })
+    
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Snippets with near-identical code, most similar first"""
+        snippet = self.get_object()
+        matches = similar_snippets(snippet, self.get_queryset())
+        
+        serializer = SnippetListSerializer(
+            [match for match, _ in matches], many=True, context={'request': request}
+        )
+        return Response([
+            dict(data, similarity=round(score, 3))
+            for data, (_, score) in zip(serializer.data, matches)
+        ])
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def duplicates(self, request):
+        """Moderation report: clusters of public snippets with near-identical code"""
+        cache_key = 'snippet_duplicate_clusters'
+        report = cache.get(cache_key)
+        
+        if report is None:
+            clusters = duplicate_clusters()
+            snippets = Snippet.objects.select_related('author').in_bulk(
+                [snippet_id for cluster in clusters for snippet_id in cluster]
+            )
+            report = [
+                {
+                    'size': len(cluster),
+                    'snippets': [
+                        {
+                            'id': snippets[snippet_id].id,
+                            'title': snippets[snippet_id].title,
+                            'slug': snippets[snippet_id].slug,
+                            'author': snippets[snippet_id].author.username,
+                            'created_at': snippets[snippet_id].created_at,
+                        }
+                        for snippet_id in cluster if snippet_id in snippets
+                    ],
+                }
+                for cluster in clusters
+            ]
+            cache.set(cache_key, report, settings.SNIPPET_DUPLICATES_CACHE_TTL)
+        
+        page = self.paginate_queryset(report)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(report)
+    
+    @action(detail=True, methods=['get'])
+    def line_comments(self, request, pk=None):
+        """Comments on lines ?start= to ?end=, grouped by line with each line's count"""
+        snippet = self.get_object()
+        try:
+            start = int(request.query_params.get('start', 1))
+            end = int(request.query_params.get('end', start + settings.SNIPPET_COMMENT_LINE_RANGE - 1))
+            per_line = int(request.query_params.get('per_line', settings.SNIPPET_COMMENTS_PER_LINE))
+        except ValueError:
+            return Response(
+                {'error': 'start, end and per_line must be numbers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if start < 1 or end < start or per_line < 1:
+            return Response(
+                {'error': 'Need 1 <= start <= end and per_line >= 1'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        end = min(end, start + settings.SNIPPET_COMMENT_LINE_RANGE - 1)
+        per_line = min(per_line, settings.SNIPPET_COMMENTS_PER_LINE)
+        lines = comments_by_line(snippet.id, start, end, per_line)
+        
+        return Response({
+            'start': start,
+            'end': end,
+            'lines': [
+                {
+                    'line_number': line_number,
+                    'count': count,
+                    'comments': SnippetCommentSerializer(comments, many=True).data,
+                }
+                for line_number, (count, comments) in lines.items()
+            ],
+        })
+    
+    @action(detail=True, methods=['get'])
+    def highlighted(self, request, pk=None):
+        """Syntax-highlighted code: ?output=html|tokens&style=<pygments style>"""
+        snippet = self.get_object()
+        output = request.query_params.get('output', 'html')
+        style = request.query_params.get('style')
+        
+        try:
+            data = highlight(snippet.code, snippet.language, style=style, output=output)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if output == 'html':
+            data = dict(data, css=style_css(data['style']))
+        return Response(data)
+    
     @action(detail=False, methods=['get'])
     def my_snippets(self, request):
         """Get current user's snippets"""
@@ -168,7 +374,7 @@ class SnippetViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_401_UNAUTHORIZED
             )
         
-        snippets = Snippet.objects.filter(author=request.user)
+        snippets = Snippet.objects.filter(author=request.user).select_related('code_blob')
         page = self.paginate_queryset(snippets)
         
         if page is not None:
@@ -178,6 +384,47 @@ class SnippetViewSet(viewsets.ModelViewSet):
         serializer = SnippetListSerializer(snippets, many=True, context={'request': request})
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def code_search(self, request):
+        """Search code: ?q=...&mode=text|substring|regex, with rank and matched lines"""
+        q = request.query_params.get('q', '').strip()
+        mode = request.query_params.get('mode', 'text')
+        
+        try:
+            snippets = search_snippets(self.filter_queryset(self.get_queryset()), q, mode)
+            
+            with transaction.atomic():
+                # An expensive regex gives up instead of tying up the database
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL statement_timeout = %s', [settings.CODE_SEARCH_TIMEOUT_MS])
+                page = self.paginate_queryset(snippets)
+                snippets = list(page if page is not None else snippets)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except DataError as e:
+            return Response({'error': f'Invalid search query: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        except OperationalError:
+            return Response(
+                {'error': 'Search took too long, try a more specific query'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = SnippetListSerializer(snippets, many=True, context={'request': request})
+        results = [
+            dict(data, rank=snippet.rank, matched_lines=matched_lines(snippet.code, q, mode))
+            for data, snippet in zip(serializer.data, snippets)
+        ]
+        
+        if page is not None:
+            return self.get_paginated_response(results)
+        return Response(results)
+    
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Tag and language counts for the current filters"""
+        snippets = self.filter_queryset(self.get_queryset())
+        return Response(snippet_facets(snippets))
+    
     @action(detail=False, methods=['get'])
     def trending(self, request):
         """Get trending snippets"""
@@ -195,7 +442,7 @@ class SnippetViewSet(viewsets.ModelViewSet):
         snippets = Snippet.objects.filter(
             visibility='public',
             created_at__gte=seven_days_ago
-        ).order_by('-likes_count', '-views_count')[:20]
+        ).select_related('code_blob').order_by('-likes_count', '-views_count')[:20]
         
         serializer = SnippetListSerializer(snippets, many=True, context={'request': request})
         cache.set(cache_key, serializer.data, 600)  # Cache for 10 minutes
@@ -221,8 +468,19 @@ class SnippetCommentViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         comment = serializer.save(author=self.request.user)
         
+        # Update snippet comment count
+        Snippet.objects.filter(id=comment.snippet_id).update(comments_count=F('comments_count') + 1)
+        publish_delta('snippet', comment.snippet_id, 'comments_count')
+        
         # Give snippet author reputation points
         comment.snippet.author.update_reputation(1)
+    
+    def perform_destroy(self, instance):
+        # Update snippet comment count
+        Snippet.objects.filter(id=instance.snippet_id).update(comments_count=F('comments_count') - 1)
+        publish_delta('snippet', instance.snippet_id, 'comments_count', -1)
+        
+        instance.delete()
 
 
 class LanguageViewSet(viewsets.ReadOnlyModelViewSet):
@@ -232,13 +490,13 @@ class LanguageViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name']
     ordering_fields = ['snippets_count', 'name']
-    ordering = ['-snippets_count']
+    ordering = ['-snippets_count', 'name']
     
     @action(detail=True, methods=['get'])
     def snippets(self, request, pk=None):
         """Get all snippets for this language"""
         language = self.get_object()
-        snippets = language.snippets.filter(visibility='public')
+        snippets = language.snippets.filter(visibility='public').select_related('code_blob')
         
         page = self.paginate_queryset(snippets)
         if page is not None:
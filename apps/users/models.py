@@ -6,7 +6,9 @@
 # ============================================================================
 
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils.text import slugify
 from django.core.validators import RegexValidator
 
@@ -42,7 +44,7 @@ class User(AbstractUser):
     # Metadata
     email_verified = models.BooleanField(default=False)
     is_online = models.BooleanField(default=False)
-    last_seen = models.DateTimeField(auto_now=True)
+    last_seen = models.DateTimeField(null=True, blank=True)  # Flushed from Redis presence
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -53,6 +55,8 @@ class User(AbstractUser):
             models.Index(fields=['username']),
             models.Index(fields=['email']),
             models.Index(fields=['-reputation']),
+            # Trigram index for case-insensitive substring search (username__icontains)
+            GinIndex(OpClass(Upper('username'), name='gin_trgm_ops'), name='users_username_trgm_idx'),
         ]
     
     def __str__(self):
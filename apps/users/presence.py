@@ -0,0 +1,107 @@
+# ============================================================================
+# apps/users/presence.py
+# ============================================================================
+
+"""
+Online presence kept in Redis.
+
+Each open notifications socket increments a per-user connection counter
+that expires unless refreshed by heartbeats, so a crashed worker can't
+leave a user online forever. last_seen timestamps are buffered in a hash
+and flushed to Postgres in batches by apps.users.tasks.flush_presence.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+LAST_SEEN_KEY = 'presence:last_seen'
+
+
+def connections_key(user_id):
+    return f'presence:conns:{user_id}'
+
+
+def mark_online(user_id):
+    """Register a new connection for the user"""
+    try:
+        conn = get_redis_connection('default')
+        key = connections_key(user_id)
+        pipe = conn.pipeline()
+        pipe.incr(key)
+        pipe.expire(key, settings.PRESENCE_TTL)
+        pipe.hset(LAST_SEEN_KEY, user_id, int(time.time()))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Presence update failed: {e}")
+
+
+def heartbeat(user_id):
+    """Keep the user's presence alive"""
+    try:
+        conn = get_redis_connection('default')
+        key = connections_key(user_id)
+        pipe = conn.pipeline()
+        pipe.expire(key, settings.PRESENCE_TTL)
+        pipe.hset(LAST_SEEN_KEY, user_id, int(time.time()))
+        expired, _ = pipe.execute()
+        
+        # The counter expired between heartbeats - register this connection again
+        if not expired:
+            mark_online(user_id)
+    except Exception as e:
+        logger.warning(f"Presence heartbeat failed: {e}")
+
+
+def mark_offline(user_id):
+    """Drop one connection; the user goes offline with their last socket"""
+    try:
+        conn = get_redis_connection('default')
+        key = connections_key(user_id)
+        pipe = conn.pipeline()
+        pipe.decr(key)
+        pipe.hset(LAST_SEEN_KEY, user_id, int(time.time()))
+        remaining, _ = pipe.execute()
+        
+        if remaining <= 0:
+            conn.delete(key)
+    except Exception as e:
+        logger.warning(f"Presence update failed: {e}")
+
+
+def online_status(user_ids):
+    """Return {user_id: is_online} for a list of users in a single MGET"""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    
+    try:
+        conn = get_redis_connection('default')
+        values = conn.mget([connections_key(user_id) for user_id in user_ids])
+    except Exception as e:
+        logger.warning(f"Presence lookup failed: {e}")
+        values = [None] * len(user_ids)
+    
+    return {
+        user_id: value is not None and int(value) > 0
+        for user_id, value in zip(user_ids, values)
+    }
+
+
+def drain_last_seen():
+    """Atomically take the buffered {user_id: unix timestamp} map"""
+    try:
+        conn = get_redis_connection('default')
+        pipe = conn.pipeline()
+        pipe.hgetall(LAST_SEEN_KEY)
+        pipe.delete(LAST_SEEN_KEY)
+        buffered, _ = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Presence drain failed: {e}")
+        return {}
+    
+    return {int(user_id): int(timestamp) for user_id, timestamp in buffered.items()}
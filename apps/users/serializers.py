@@ -92,14 +92,24 @@ class UserSerializer(serializers.ModelSerializer):
     total_followers = serializers.IntegerField(read_only=True)
     total_following = serializers.IntegerField(read_only=True)
     total_posts = serializers.IntegerField(read_only=True)
+    is_online = serializers.SerializerMethodField()
     
     class Meta:
         model = User
         fields = (
             'id', 'username', 'email', 'avatar', 'bio',
-            'total_followers', 'total_following', 'total_posts'
+            'total_followers', 'total_following', 'total_posts',
+            'is_online', 'last_seen'
         )
-        read_only_fields = ('id', 'date_joined')
+        read_only_fields = ('id', 'date_joined', 'last_seen')
+    
+    def get_is_online(self, obj):
+        # List views pass a precomputed {id: online} map to avoid a lookup per user
+        presence_map = self.context.get('presence')
+        if presence_map is None:
+            from .presence import online_status
+            presence_map = online_status([obj.id])
+        return presence_map.get(obj.id, False)
 
 
 class UserUpdateSerializer(serializers.ModelSerializer):
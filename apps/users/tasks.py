@@ -0,0 +1,39 @@
+# ============================================================================
+# apps/users/tasks.py (Celery tasks)
+# ============================================================================
+
+from celery import shared_task
+from django.contrib.auth import get_user_model
+from datetime import datetime, timezone as dt_timezone
+
+User = get_user_model()
+
+
+@shared_task
+def flush_presence(batch_size=500):
+    """
+    Write buffered last_seen timestamps to Postgres and sync is_online
+    """
+    from .presence import drain_last_seen, online_status
+    
+    last_seen = drain_last_seen()
+    
+    users = [
+        User(id=user_id, last_seen=datetime.fromtimestamp(timestamp, tz=dt_timezone.utc))
+        for user_id, timestamp in last_seen.items()
+    ]
+    User.objects.bulk_update(users, ['last_seen'], batch_size=batch_size)
+    
+    # Users flagged online in the database may have dropped off without a
+    # clean disconnect, so re-check them alongside the ones we just saw
+    candidate_ids = set(last_seen) | set(
+        User.objects.filter(is_online=True).values_list('id', flat=True)
+    )
+    status = online_status(candidate_ids)
+    online_ids = [user_id for user_id, online in status.items() if online]
+    offline_ids = [user_id for user_id, online in status.items() if not online]
+    
+    User.objects.filter(id__in=online_ids, is_online=False).update(is_online=True)
+    User.objects.filter(id__in=offline_ids, is_online=True).update(is_online=False)
+    
+    return f'Flushed last_seen for {len(users)} users, {len(online_ids)} online'
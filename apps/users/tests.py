@@ -199,3 +199,47 @@ class TestFollowSystem:
         assert response.status_code == 200
         assert len(response.data) == 1
 
+
+@pytest.mark.django_db
+class TestPresence:
+    
+    @pytest.fixture
+    def users(self):
+        from django_redis import get_redis_connection
+        from apps.users.presence import LAST_SEEN_KEY, connections_key
+        
+        user1 = User.objects.create_user(username='user1', email='user1@example.com', password='pass123')
+        user2 = User.objects.create_user(username='user2', email='user2@example.com', password='pass123')
+        get_redis_connection('default').delete(
+            LAST_SEEN_KEY, connections_key(user1.id), connections_key(user2.id)
+        )
+        return user1, user2
+    
+    def test_online_until_last_connection_closes(self, users):
+        """Test a user stays online while any socket is open"""
+        from apps.users.presence import mark_online, mark_offline, online_status
+        user1, user2 = users
+        
+        mark_online(user1.id)
+        mark_online(user1.id)
+        mark_offline(user1.id)
+        assert online_status([user1.id, user2.id]) == {user1.id: True, user2.id: False}
+        
+        mark_offline(user1.id)
+        assert online_status([user1.id]) == {user1.id: False}
+    
+    def test_flush_presence(self, users):
+        """Test buffered presence is written to the users table"""
+        from apps.users.presence import mark_online
+        from apps.users.tasks import flush_presence
+        user1, user2 = users
+        User.objects.filter(id=user2.id).update(is_online=True)
+        
+        mark_online(user1.id)
+        flush_presence()
+        
+        user1.refresh_from_db()
+        user2.refresh_from_db()
+        assert user1.is_online
+        assert user1.last_seen is not None
+        assert not user2.is_online
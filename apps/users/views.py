@@ -41,6 +41,22 @@ class UserViewSet(viewsets.ModelViewSet):
             total_posts=Count('posts', filter=Q(posts__status='published'), distinct=True)
         )
     
+    def list(self, request, *args, **kwargs):
+        """List users with online status fetched in one Redis round trip"""
+        from .presence import online_status
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        users = page if page is not None else list(queryset)
+        
+        context = self.get_serializer_context()
+        context['presence'] = online_status([user.id for user in users])
+        serializer = self.get_serializer_class()(users, many=True, context=context)
+        
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+    
     def create(self, request, *args, **kwargs):
         """Register a new user"""
         serializer = self.get_serializer(data=request.data)